@@ -1 +1,15 @@
-from .main import main
+def main(argv=None):
+    # Imported lazily so `import annotamate.core` never pulls in Tk
+    import sys
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["serve"]: # Headless: no Tk on the server
+        from .server import main as _serve
+        return _serve(argv[1:])
+    if argv[:1] == ["bench"]:
+        from .bench import main as _bench
+        return _bench(argv[1:])
+    if argv[:1] == ["soak"]:
+        from .soak import main as _soak
+        return _soak(argv[1:])
+    from .main import main as _main
+    return _main(argv)
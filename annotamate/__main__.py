@@ -1,4 +1,4 @@
-from .main import main
+import annotamate
 
 if __name__ == "__main__":
-    main()
+    annotamate.main()
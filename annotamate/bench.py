@@ -0,0 +1,333 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import statistics
+
+from .core import Dataset, codecs, make_box, BoxStore
+from .core.classes import DEFAULT_CLASSES, ClassRegistry
+from .core.project import user_cache_dir, save_json
+
+# Synthetic datasets are generated once per parameter set and reused, so
+# reruns (and the baseline run they are compared with) time the same files
+DATASET_VERSION = 1
+UNIQUE_IMAGES = 16 # Distinct image files; the rest of the folder links to them
+RESULTS_VERSION = 1
+DEFAULT_TOLERANCE = 0.15 # A median this much slower than the baseline is a regression
+TAXONOMY_SIZE = 10_000 # Classes in the large-taxonomy label benchmark
+
+
+class BenchError(Exception):
+    pass
+
+
+# --- SYNTHETIC DATA ---
+def synthetic_image(w, h, seed):
+    # Noise over a gradient: compresses and decodes like a photo, not like a flat fill
+    from PIL import Image
+    rnd = random.Random(seed)
+    noise = Image.effect_noise((w, h), 40 + rnd.random() * 40)
+    grad = Image.linear_gradient("L").resize((w, h))
+    return Image.merge("RGB", (noise, grad, Image.eval(noise, lambda v: 255 - v)))
+
+
+def synthetic_boxes(n, w, h, n_classes, rnd):
+    boxes = []
+    for _ in range(n):
+        bw, bh = rnd.uniform(0.01, 0.3) * w, rnd.uniform(0.01, 0.3) * h
+        x1, y1 = rnd.uniform(0, w - bw), rnd.uniform(0, h - bh)
+        boxes.append(make_box(rnd.randrange(n_classes), x1, y1, x1 + bw, y1 + bh))
+    return boxes
+
+
+def _link(src, dst):
+    # Hard links cost a directory entry, so a million-file folder fits anywhere
+    try: os.link(src, dst)
+    except OSError:
+        try: os.symlink(src, dst)
+        except OSError: shutil.copyfile(src, dst)
+
+
+def make_dataset(root, files, image_size=(1280, 720), boxes=(1, 20), labelled=0.8, seed=0, progress=None):
+    """Writes (or reuses) a synthetic YOLO dataset under root -> (image dir, label dir).
+
+    `files` images of `image_size` (UNIQUE_IMAGES distinct ones, linked),
+    of which a `labelled` fraction get a label file with a random number
+    of boxes in the `boxes` range.
+    """
+    params = {"version": DATASET_VERSION, "files": files, "image_size": list(image_size),
+              "boxes": list(boxes), "labelled": labelled, "seed": seed}
+    image_dir, label_dir = os.path.join(root, "images"), os.path.join(root, "labels")
+    marker = os.path.join(root, "dataset.json")
+    try:
+        with open(marker, "r") as f:
+            if json.load(f) == params: return image_dir, label_dir
+    except (OSError, ValueError):
+        pass
+    if os.path.isdir(root): shutil.rmtree(root)
+    os.makedirs(image_dir); os.makedirs(label_dir)
+    rnd = random.Random(seed)
+    w, h = image_size
+    sources = []
+    for i in range(min(UNIQUE_IMAGES, files)):
+        p = os.path.join(root, f"source_{i}.jpg")
+        synthetic_image(w, h, seed + i).save(p, quality=90)
+        sources.append(p)
+    n_classes = len(DEFAULT_CLASSES)
+    for i in range(files):
+        name = f"img_{i:07d}"
+        _link(sources[i % len(sources)], os.path.join(image_dir, name + ".jpg"))
+        if rnd.random() < labelled:
+            bx = synthetic_boxes(rnd.randint(*boxes), w, h, n_classes, rnd)
+            codecs.write_yolo(os.path.join(label_dir, name + ".txt"), w, h, bx)
+        if progress and i % 10_000 == 0: progress(i, files)
+    with open(os.path.join(label_dir, "classes.txt"), "w") as f: f.write("\n".join(DEFAULT_CLASSES))
+    save_json(marker, params) # Last: an interrupted generation is redone
+    return image_dir, label_dir
+
+
+# --- MEASUREMENT ---
+def measure(fn, repeat=3, setup=None):
+    """Runs fn `repeat` times (after `setup` each time) -> seconds per run."""
+    runs = []
+    for _ in range(repeat):
+        if setup: setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+class Suite:
+    """Collects named timings into the results document."""
+
+    def __init__(self, repeat=3, echo=True):
+        self.repeat = repeat
+        self.echo = echo
+        self.results = {}
+
+    def run(self, name, fn, items=1, setup=None, repeat=None):
+        runs = measure(fn, repeat or self.repeat, setup)
+        median = statistics.median(runs)
+        self.results[name] = {"median": median, "min": min(runs), "runs": runs, "items": items,
+                              "per_item_us": median / items * 1e6 if items else None}
+        if self.echo:
+            per = f"{median / items * 1e6:12.2f} µs/item" if items > 1 else ""
+            print(f"  {name:<44}{median * 1000:11.2f} ms{per}", flush=True)
+        return median
+
+
+# --- BENCHMARKS ---
+def bench_dataset(suite, image_dir, label_dir, tag):
+    """Directory load, file list/search and label existence over a whole folder."""
+    ds = Dataset(image_dir, label_dir, "YOLO")
+    n = len(ds.image_list)
+    suite.run(f"{tag}/scan", ds.scan, n)
+    # What refresh_file_list does per row, minus the Tk listbox
+    def file_list(search=""):
+        rows = []
+        for p in ds.image_list:
+            name = os.path.basename(p)
+            if search and search not in name.lower(): continue
+            rows.append(("✔ " if ds.has_annotation(p) else "   ") + name)
+        return rows
+    suite.run(f"{tag}/file_list_cold", file_list, n, setup=ds.invalidate)
+    suite.run(f"{tag}/file_list_warm", file_list, n)
+    suite.run(f"{tag}/search", lambda: file_list("img_00012"), n)
+    suite.run(f"{tag}/latest_annotated", ds.latest_annotated_index, n, setup=ds.invalidate)
+
+    from .stats import DatasetStats
+    def drop_cache():
+        try: os.remove(DatasetStats(ds.image_list, image_dir, label_dir, "YOLO").cache_path)
+        except OSError: pass
+    suite.run(f"{tag}/stats_cold", lambda: DatasetStats(ds.image_list, image_dir, label_dir, "YOLO").scan(), n,
+              setup=drop_cache, repeat=1)
+    suite.run(f"{tag}/stats_warm", lambda: DatasetStats(ds.image_list, image_dir, label_dir, "YOLO").scan(), n)
+    return ds
+
+
+def bench_labels(suite, work, box_counts, image_size=(1280, 720)):
+    """Load and save of one label file per format and box count."""
+    w, h = image_size
+    img_path = os.path.join(work, "label_bench.jpg")
+    classes = list(DEFAULT_CLASSES)
+    rnd = random.Random(0)
+    for n in box_counts:
+        boxes = synthetic_boxes(n, w, h, len(classes), rnd)
+        for fmt in codecs.FORMAT_EXTS:
+            path = codecs.annotation_path(img_path, fmt, work)
+            tag = f"labels/{fmt.replace(' ', '_')}/{n}"
+            suite.run(f"{tag}/save", lambda: codecs.write_boxes(path, img_path, w, h, boxes, classes), n)
+            suite.run(f"{tag}/load", lambda: codecs.read_boxes(path, w, h, classes), n)
+    # VOC stores names: with the editor's registry a big taxonomy should load like the 4-class case
+    n = max(box_counts)
+    taxonomy = ClassRegistry(classes + [f"class_{i}" for i in range(TAXONOMY_SIZE - len(classes))])
+    boxes = synthetic_boxes(n, w, h, len(taxonomy), rnd)
+    path = codecs.annotation_path(img_path, "Pascal VOC", work)
+    codecs.write_boxes(path, img_path, w, h, boxes, taxonomy)
+    suite.run(f"labels/Pascal_VOC/{n}/load_{TAXONOMY_SIZE}_classes", lambda: codecs.read_boxes(path, w, h, taxonomy), n)
+
+
+def bench_boxes(suite, box_counts, image_size=(1280, 720)):
+    """Box store operations the canvas runs per mouse event, at each box count."""
+    w, h = image_size
+    rnd = random.Random(1)
+    points = [(rnd.uniform(0, w), rnd.uniform(0, h)) for _ in range(200)]
+    for n in box_counts:
+        store = BoxStore(synthetic_boxes(n, w, h, len(DEFAULT_CLASSES), rnd))
+        suite.run(f"boxes/{n}/hit_test_x200", lambda: [store.hit_test(x, y) for x, y in points], n)
+        suite.run(f"boxes/{n}/move_all", lambda: [store.move(i, 1, 1) for i in range(len(store))], n)
+
+
+def bench_conversion(suite, ds, work, tag, limit=None):
+    """Bulk format conversion: YOLO labels rewritten as VOC, and a COCO split export."""
+    images = [p for p in ds.image_list if ds.has_annotation(p)][:limit]
+    if not images: return
+    classes = list(DEFAULT_CLASSES)
+    w, h = ds.image_size(images[0]) # Synthetic images all share one size
+    out = os.path.join(work, "converted")
+
+    def to_voc():
+        os.makedirs(out, exist_ok=True)
+        for p in images:
+            boxes = codecs.read_boxes(ds.annotation_path(p), w, h, classes)
+            codecs.write_voc(codecs.annotation_path(p, "Pascal VOC", out), p, w, h, boxes, classes)
+    suite.run(f"{tag}/convert_yolo_to_voc", to_voc, len(images), setup=lambda: shutil.rmtree(out, ignore_errors=True), repeat=1)
+
+    from .split import export_split
+    split_out = os.path.join(work, "split")
+    suite.run(f"{tag}/export_split_coco",
+              lambda: export_split(images, ds.image_dir, ds.label_dir, "YOLO", classes, split_out, out_format="COCO"),
+              len(images), setup=lambda: shutil.rmtree(split_out, ignore_errors=True), repeat=1)
+    shutil.rmtree(out, ignore_errors=True); shutil.rmtree(split_out, ignore_errors=True)
+
+
+def bench_gui(suite, image_dir, label_dir, box_counts, tag):
+    """The editor's own hot paths on a real window (needs a display, e.g. Xvfb)."""
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        raise BenchError("No display for --gui: run it under xvfb-run, or leave --gui out.")
+    from .main import UltimateAnnotator
+    app = UltimateAnnotator(image_dir, label_dir, "YOLO")
+    try:
+        deadline = time.time() + 60
+        while app.pil_image is None and time.time() < deadline:
+            app.update(); time.sleep(0.01)
+        if app.pil_image is None: raise BenchError("The first image did not load within a minute.")
+        n = len(app.dataset.image_list)
+        suite.run(f"{tag}/gui/refresh_file_list", app.refresh_file_list, n)
+        app.entry_search.insert(0, "img_00012")
+        suite.run(f"{tag}/gui/search", app.refresh_file_list, n)
+        app.entry_search.delete(0, "end")
+        app.refresh_file_list()
+        suite.run(f"{tag}/gui/render_image", lambda: (app.render_image(), app.update_idletasks()))
+        w, h = app.pil_image.size
+        rnd = random.Random(2)
+        for count in box_counts:
+            app.store.reset(synthetic_boxes(count, w, h, len(app.classes), rnd))
+            suite.run(f"gui/boxes/{count}/redraw_boxes", lambda: (app.redraw_boxes(), app.update_idletasks()), count)
+            # Builds a row of widgets per box: only worth timing at sizes a person scrolls
+            if count <= 1000:
+                suite.run(f"gui/boxes/{count}/update_sidebar_objects", lambda: (app.update_sidebar_objects(), app.update_idletasks()),
+                          count, repeat=1)
+        app.store.reset()
+    finally:
+        app.decoder.shutdown()
+        app.destroy()
+
+
+# --- RESULTS ---
+def environment():
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, file=None):
+    """Prints current vs baseline medians -> names that got slower than tolerance allows."""
+    old = baseline.get("results", {})
+    slower = []
+    print(f"--- Compared with {baseline.get('created', 'baseline')} ---", file=file)
+    for name, r in results.items():
+        if name not in old: continue
+        ratio = r["median"] / old[name]["median"] if old[name]["median"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  SLOWER"
+            slower.append(name)
+        elif ratio < 1 - tolerance: flag = "  faster"
+        print(f"  {name:<44}{old[name]['median'] * 1000:11.2f} ->{r['median'] * 1000:11.2f} ms  x{ratio:5.2f}{flag}", file=file)
+    return slower
+
+
+def _pair(text, sep):
+    a, b = text.lower().split(sep)
+    return int(a), int(b)
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="annotamate bench", description="Time Annotamate's hot paths on synthetic datasets.")
+    parser.add_argument("--files", default="10000", help="comma-separated dataset sizes (default 10000; try 10000,100000,1000000)")
+    parser.add_argument("--image-size", default="1280x720", help="synthetic image size, WxH")
+    parser.add_argument("--boxes", default="1-20", help="boxes per labelled image in the datasets, MIN-MAX")
+    parser.add_argument("--box-counts", default="1,100,1000,5000", help="boxes per file for the label, box and redraw benchmarks")
+    parser.add_argument("--convert-limit", type=int, default=10000, help="labelled images converted per dataset")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the median is kept")
+    parser.add_argument("--work", metavar="DIR", help="where synthetic datasets are kept (default: the user cache)")
+    parser.add_argument("--gui", action="store_true", help="also time the editor's window (needs a display, e.g. xvfb-run)")
+    parser.add_argument("--out", metavar="FILE", help="write results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="baseline results to compare with; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="slowdown allowed before --compare fails")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        sizes = [int(x) for x in args.files.split(",") if x]
+        image_size = _pair(args.image_size, "x")
+        boxes = _pair(args.boxes, "-")
+        box_counts = [int(x) for x in args.box_counts.split(",") if x]
+    except ValueError:
+        print("Sizes are numbers: --files 10000,100000 --image-size 1280x720 --boxes 1-20 --box-counts 1,100")
+        return 2
+    work = args.work or os.path.join(user_cache_dir(), "bench")
+    suite = Suite(args.repeat)
+
+    def progress(i, n): print(f"  generating {i}/{n}", flush=True)
+    try:
+        print("--- Labels ---")
+        os.makedirs(work, exist_ok=True)
+        bench_labels(suite, work, box_counts, image_size)
+        print("--- Boxes ---")
+        bench_boxes(suite, box_counts, image_size)
+        for n in sizes:
+            tag = f"files_{n}"
+            print(f"--- Dataset of {n} files ---", flush=True)
+            root = os.path.join(work, f"{tag}_{image_size[0]}x{image_size[1]}_{boxes[0]}-{boxes[1]}")
+            image_dir, label_dir = make_dataset(root, n, image_size, boxes, progress=progress)
+            ds = bench_dataset(suite, image_dir, label_dir, tag)
+            bench_conversion(suite, ds, work, tag, args.convert_limit)
+            if args.gui: bench_gui(suite, image_dir, label_dir, box_counts, tag)
+    except BenchError as e:
+        print(f"Benchmark failed: {e}")
+        return 1
+
+    doc = {"version": RESULTS_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+           "environment": environment(), "args": vars(args), "results": suite.results}
+    if args.out:
+        save_json(args.out, doc)
+        print(f"Results written to {args.out}")
+    if args.compare:
+        with open(args.compare, "r") as f: baseline = json.load(f)
+        slower = compare(suite.results, baseline, args.tolerance)
+        if slower:
+            print(f"{len(slower)} measurement(s) slower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
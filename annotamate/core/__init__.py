@@ -0,0 +1,6 @@
+# Headless building blocks shared by the editor and the dataset tools.
+# Nothing in this package may import tkinter / customtkinter.
+from . import archive, codecs
+from .boxes import BoxStore, make_box
+from .classes import ClassRegistry, class_color, class_name, read_classes_file, write_classes_file
+from .dataset import Dataset, list_images
@@ -0,0 +1,250 @@
+import io
+import os
+import mmap
+import struct
+import zlib
+import threading
+from collections import namedtuple
+
+from . import codecs
+from .project import user_cache_dir, load_json, save_json
+
+# Images inside an archive are addressed as "<archive path>::<member name>",
+# so the rest of the code keeps passing plain strings around
+SEP = codecs.MEMBER_SEP
+ARCHIVE_EXTS = (".zip", ".tar")
+INDEX_VERSION = 1
+SIDECAR_SUFFIX = "_labels"
+
+# Where a member's bytes live; small and picklable, so worker processes can
+# read a member without loading the archive's index
+MemberRef = namedtuple("MemberRef", "archive offset csize size method")
+
+STORED, DEFLATED = 0, 8
+_LOCAL_HEADER = struct.Struct("<4s22xHH") # Signature, then name/extra lengths at offset 26
+
+
+class ArchiveError(Exception):
+    pass
+
+
+# --- PATHS ---
+def is_archive(path):
+    return bool(path) and path.lower().endswith(ARCHIVE_EXTS) and os.path.isfile(path)
+
+
+def member_path(archive, name):
+    return f"{archive}{SEP}{name}"
+
+
+def split_member(path):
+    """-> (archive path, member name), or None for an ordinary file."""
+    if SEP not in path: return None
+    archive, name = path.split(SEP, 1)
+    return archive, name
+
+
+def sidecar_dir(archive, create=True):
+    # Labels can't be written into the archive; they go next to it
+    d = os.path.splitext(os.path.abspath(archive))[0] + SIDECAR_SUFFIX
+    if create: os.makedirs(d, exist_ok=True)
+    return d
+
+
+def default_label_dir(image_dir):
+    return sidecar_dir(image_dir) if is_archive(image_dir) else None
+
+
+# --- INDEX ---
+def _index_path(archive):
+    key = f"{zlib.crc32(os.path.abspath(archive).encode()):08x}"
+    return os.path.join(user_cache_dir(), "archives", f"{os.path.basename(archive)}.{key}.json")
+
+
+def _scan_zip(path):
+    # The central directory already lists every member; local headers are
+    # only read (from the mapping) when a member is first opened
+    import zipfile
+    try:
+        with zipfile.ZipFile(path) as zf:
+            infos = zf.infolist()
+    except zipfile.BadZipFile as e:
+        raise ArchiveError(f"Not a readable zip file: {e}")
+    return [(i.filename, i.header_offset, i.compress_size, i.file_size, i.compress_type) for i in infos if not i.is_dir()]
+
+
+def _scan_tar(path):
+    import tarfile
+    try:
+        # "r:" and not "r:*": only an uncompressed tar can be read by offset
+        with tarfile.open(path, "r:") as tf:
+            return [(m.name, m.offset_data, m.size, m.size, STORED) for m in tf if m.isfile()]
+    except tarfile.ReadError as e:
+        raise ArchiveError(f"Not an uncompressed tar file ({e}). Compressed tars can't be read without extracting them.")
+
+
+class Archive:
+    """Read-only view of a zip or uncompressed tar file.
+
+    The image members are indexed once (cached per user, keyed by the
+    archive's mtime and size) and read straight from a memory map of the
+    archive, so opening a huge archive costs about as much as listing a
+    folder and nothing is ever extracted.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        st = os.stat(self.path)
+        self.stamp = (st.st_mtime_ns, st.st_size)
+        self.kind = "zip" if self.path.lower().endswith(".zip") else "tar"
+        self.members = self._load_index() # name -> [offset, csize, size, method]
+        self.names = sorted(self.members)
+        self._data_offsets = {} # zip: name -> offset of the data past the local header
+        self._lock = threading.Lock()
+        self._file = open(self.path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, OverflowError):
+            self._map = None # Empty file or no address space for it: plain reads
+
+    def _load_index(self):
+        index_path = _index_path(self.path)
+        cached = load_json(index_path, {})
+        if cached.get("version") == INDEX_VERSION and cached.get("stamp") == list(self.stamp):
+            return dict(zip(cached["names"], cached["entries"]))
+        rows = _scan_zip(self.path) if self.kind == "zip" else _scan_tar(self.path)
+        rows = [r for r in rows if r[0].lower().endswith(codecs.IMAGE_EXTS) and not os.path.basename(r[0]).startswith(".")]
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        save_json(index_path, {"version": INDEX_VERSION, "stamp": list(self.stamp),
+                               "names": [r[0] for r in rows], "entries": [list(r[1:]) for r in rows]})
+        return {r[0]: list(r[1:]) for r in rows}
+
+    def image_paths(self):
+        return [member_path(self.path, n) for n in self.names]
+
+    def _read_at(self, offset, n):
+        if self._map is not None: return self._map[offset:offset + n]
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(n)
+
+    def ref(self, name):
+        """-> MemberRef for `name`; raises KeyError for unknown members."""
+        offset, csize, size, method = self.members[name]
+        if self.kind == "zip":
+            data = self._data_offsets.get(name)
+            if data is None:
+                sig, n, extra = _LOCAL_HEADER.unpack(self._read_at(offset, _LOCAL_HEADER.size))
+                if sig != b"PK\x03\x04": raise ArchiveError(f"Corrupt local header for {name}")
+                data = self._data_offsets[name] = offset + _LOCAL_HEADER.size + n + extra
+            offset = data
+        return MemberRef(self.path, offset, csize, size, method)
+
+    def read(self, name):
+        ref = self.ref(name)
+        if ref.method in (STORED, DEFLATED): return _decompress(ref, self._read_at(ref.offset, ref.csize))
+        import zipfile # bzip2/lzma members: rare enough to take the slow path
+        with zipfile.ZipFile(self.path) as zf: return zf.read(name)
+
+    def close(self):
+        if self._map is not None: self._map.close()
+        self._file.close()
+
+
+def _decompress(ref, raw):
+    if ref.method == DEFLATED: return zlib.decompress(raw, -15)
+    return raw
+
+
+# --- PER-PROCESS REGISTRY ---
+_archives = {}
+_maps = {} # archive path -> mmap, for MemberRefs read in worker processes
+_registry_lock = threading.Lock()
+
+
+def get_archive(path):
+    path = os.path.abspath(path)
+    with _registry_lock:
+        a = _archives.get(path)
+        if a is None: a = _archives[path] = Archive(path)
+        return a
+
+
+def close_archives():
+    with _registry_lock:
+        for a in _archives.values(): a.close()
+        _archives.clear()
+        for m in _maps.values(): m.close()
+        _maps.clear()
+
+
+def read_ref(ref):
+    with _registry_lock:
+        a = _archives.get(ref.archive)
+        m = a._map if a is not None else _maps.get(ref.archive)
+        if m is None:
+            with open(ref.archive, "rb") as f:
+                m = _maps[ref.archive] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _decompress(ref, m[ref.offset:ref.offset + ref.csize])
+
+
+# --- FILE-OR-MEMBER HELPERS ---
+# These also accept image URLs of a dataset served by `annotamate serve`
+
+def _remote(path):
+    if isinstance(path, str) and path.startswith(("http://", "https://")):
+        from . import remote
+        return remote
+    return None
+
+
+def resolve(path):
+    """Archive paths -> MemberRef (when it can be read by offset); anything else unchanged."""
+    parts = split_member(path) if isinstance(path, str) else None
+    if parts is None: return path
+    ref = get_archive(parts[0]).ref(parts[1])
+    return ref if ref.method in (STORED, DEFLATED) else path
+
+
+def read_bytes(src):
+    if isinstance(src, MemberRef): return read_ref(src)
+    if _remote(src): return _remote(src).fetch_image(src)
+    parts = split_member(src)
+    if parts is None:
+        with open(src, "rb") as f: return f.read()
+    try:
+        return get_archive(parts[0]).read(parts[1])
+    except KeyError:
+        raise FileNotFoundError(f"No such member: {src}")
+
+
+def open_image(src):
+    """Image.open for a file path, an archive path or a MemberRef."""
+    from PIL import Image
+    if isinstance(src, str) and SEP not in src and not _remote(src): return Image.open(src)
+    return Image.open(io.BytesIO(read_bytes(src)))
+
+
+def file_stamp(path):
+    """(mtime_ns, size) used to key caches; members take the archive's mtime."""
+    if _remote(path): return _remote(path).image_stamp(path)
+    parts = split_member(path)
+    if parts is None:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    a = get_archive(parts[0])
+    if parts[1] not in a.members: raise FileNotFoundError(f"No such member: {path}")
+    return a.stamp[0], a.members[parts[1]][2]
+
+
+def exists(path):
+    if _remote(path): return True # Asking costs a round trip; a failed fetch says the same
+    parts = split_member(path)
+    if parts is None: return os.path.exists(path)
+    try: return parts[1] in get_archive(parts[0]).members
+    except (OSError, ArchiveError): return False
+
+
+def extract(path, dst):
+    # Copies one member out (split export); ordinary files are not handled here
+    with open(dst, "wb") as f: f.write(read_bytes(path))
@@ -0,0 +1,273 @@
+from .history import ImageHistory
+
+
+def make_box(class_id, x1, y1, x2, y2, visible=True, score=None):
+    # Boxes are plain dicts in image pixel coordinates; `score` marks a model proposal
+    box = {"class_id": class_id, "x1": x1, "y1": y1, "x2": x2, "y2": y2, "visible": visible}
+    if score is not None: box["score"] = score
+    return box
+
+
+def box_to_json(b, classes):
+    # Class *names* travel, so readers with a differently ordered class list agree on meaning
+    cid = b['class_id']
+    return {"class": classes[cid] if 0 <= cid < len(classes) else None,
+            "x1": b['x1'], "y1": b['y1'], "x2": b['x2'], "y2": b['y2'], "visible": b.get('visible', True)}
+
+
+def box_from_json(r, classes):
+    # Unknown names are appended, like VOC/COCO labels on load
+    name = r.get("class")
+    if name is None: cid = -1
+    else:
+        if name not in classes: classes.append(name)
+        cid = classes.index(name)
+    return make_box(cid, float(r["x1"]), float(r["y1"]), float(r["x2"]), float(r["y2"]), visible=r.get("visible", True))
+
+
+# --- BOX STORE ---
+class BoxStore:
+    """The boxes of the image being edited, plus the edit operations on them.
+
+    All mutations go through these methods so the editor, scripts and batch
+    jobs share one implementation (and one place to hook undo/journaling).
+    Each finished edit is passed to `listener` as an operation dict (see
+    `apply`) and recorded in `history` with its inverse; drags report once,
+    from `normalize`. Undo and redo apply recorded operations, so they reach
+    the listener like any other edit.
+    """
+
+    def __init__(self, boxes=None):
+        self.boxes = list(boxes) if boxes else []
+        self.history = ImageHistory()
+        self.listener = None # op dict -> None
+        self.dragging = None # "move"/"resize" until normalize() ends the drag
+        self.drag_from = None # Coordinates of the dragged box before the drag
+
+    def _emit(self, op):
+        if self.listener: self.listener(op)
+
+    def _record(self, op, inverse):
+        # An edit already applied to self.boxes
+        self._emit(op)
+        if self.history is not None: self.history.push([(op, inverse)])
+
+    def _coords(self, idx):
+        b = self.boxes[idx]
+        return {"x1": b['x1'], "y1": b['y1'], "x2": b['x2'], "y2": b['y2']}
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __getitem__(self, idx):
+        return self.boxes[idx]
+
+    def valid(self, idx):
+        return idx is not None and 0 <= idx < len(self.boxes)
+
+    def reset(self, boxes=(), history=None):
+        # New image: fresh box list, and its own history (kept across visits by an UndoHistory)
+        self.boxes = list(boxes)
+        self.history = history if history is not None else ImageHistory()
+        self.dragging = None
+        self.drag_from = None
+
+    def replace(self, boxes):
+        # Boxes from elsewhere (propagation, proposals) as an edit of this image
+        old = self.boxes
+        self.boxes = list(boxes)
+        self._record({"op": "replace", "boxes": [b.copy() for b in self.boxes]}, {"op": "replace", "boxes": old})
+
+    # --- Operations ---
+    def apply(self, op):
+        """Applies one operation dict to the boxes (no history, no listener)."""
+        kind, i = op["op"], op.get("i")
+        if kind == "add": self.boxes.append(op["box"].copy())
+        elif kind == "insert": self.boxes.insert(i, op["box"].copy())
+        elif kind == "delete": self.boxes.pop(i)
+        elif kind in ("move", "resize"):
+            for k in ("x1", "y1", "x2", "y2"): self.boxes[i][k] = op[k]
+        elif kind == "class": self.boxes[i]['class_id'] = op["class_id"]
+        elif kind == "visible": self.boxes[i]['visible'] = op["visible"]
+        elif kind == "visible_all":
+            for b in self.boxes: b['visible'] = op["visible"]
+        elif kind == "visibility":
+            targets = [self.boxes[j] for j in op["items"]] if "items" in op else self.boxes
+            for b, v in zip(targets, op["visible"]): b['visible'] = v
+        elif kind == "replace": self.boxes = [b.copy() for b in op["boxes"]]
+        # Selections: one op for any number of boxes, `items` ascending
+        elif kind == "add_many": self.boxes.extend(b.copy() for b in op["boxes"])
+        elif kind == "insert_many":
+            for j, b in zip(op["items"], op["boxes"]): self.boxes.insert(j, b.copy())
+        elif kind == "delete_many":
+            gone = set(op["items"])
+            self.boxes = [b for j, b in enumerate(self.boxes) if j not in gone]
+        elif kind == "geometry":
+            for j, (x1, y1, x2, y2) in zip(op["items"], op["coords"]):
+                b = self.boxes[j]; b['x1'] = x1; b['y1'] = y1; b['x2'] = x2; b['y2'] = y2
+        elif kind == "class_many":
+            for j in op["items"]: self.boxes[j]['class_id'] = op["class_id"]
+        elif kind == "classes":
+            for j, c in zip(op["items"], op["class_ids"]): self.boxes[j]['class_id'] = c
+
+    def undo(self):
+        # Reverts the most recent edit of any kind
+        step = self.history.pop_undo() if self.history is not None else None
+        if not step: return False
+        for _, inverse in reversed(step):
+            self.apply(inverse); self._emit(inverse)
+        return True
+
+    def redo(self):
+        step = self.history.pop_redo() if self.history is not None else None
+        if not step: return False
+        for op, _ in step:
+            self.apply(op); self._emit(op)
+        return True
+
+    # --- Add / Remove ---
+    def add(self, box):
+        self.boxes.append(box)
+        self._record({"op": "add", "box": box.copy()}, {"op": "delete", "i": len(self.boxes) - 1})
+        return len(self.boxes) - 1
+
+    def delete(self, idx):
+        box = self.boxes.pop(idx)
+        self._record({"op": "delete", "i": idx}, {"op": "insert", "i": idx, "box": box.copy()})
+        return box
+
+    def duplicate(self, idx, offset, w, h):
+        box = self.boxes[idx].copy()
+        # Offset slightly, staying inside the image
+        box['x1'] = min(box['x1'] + offset, w - 5); box['x2'] = min(box['x2'] + offset, w)
+        box['y1'] = min(box['y1'] + offset, h - 5); box['y2'] = min(box['y2'] + offset, h)
+        return self.add(box)
+
+    def delete_many(self, indices):
+        items = sorted(set(indices))
+        if not items: return
+        removed = [self.boxes[j].copy() for j in items]
+        self.apply({"op": "delete_many", "items": items})
+        self._record({"op": "delete_many", "items": items}, {"op": "insert_many", "items": items, "boxes": removed})
+
+    def duplicate_many(self, indices, offset, w, h):
+        """Copies of the boxes, offset like `duplicate` -> indices of the copies."""
+        copies = []
+        for j in sorted(set(indices)):
+            box = self.boxes[j].copy()
+            box['x1'] = min(box['x1'] + offset, w - 5); box['x2'] = min(box['x2'] + offset, w)
+            box['y1'] = min(box['y1'] + offset, h - 5); box['y2'] = min(box['y2'] + offset, h)
+            copies.append(box)
+        if not copies: return []
+        start = len(self.boxes)
+        self.apply({"op": "add_many", "boxes": copies})
+        new = list(range(start, len(self.boxes)))
+        self._record({"op": "add_many", "boxes": copies}, {"op": "delete_many", "items": new})
+        return new
+
+    # --- Geometry ---
+    def _start_drag(self, idx, kind):
+        if self.dragging is None: self.drag_from = {}
+        if idx not in self.drag_from: self.drag_from[idx] = self._coords(idx)
+        if kind == "resize" or self.dragging is None: self.dragging = kind
+
+    def move(self, idx, dx, dy):
+        self._start_drag(idx, "move")
+        b = self.boxes[idx]
+        b['x1'] += dx; b['x2'] += dx; b['y1'] += dy; b['y2'] += dy
+
+    def move_many(self, indices, dx, dy):
+        # Dragging a selection; normalize_many() records it as one edit
+        for j in indices:
+            self._start_drag(j, "move")
+            b = self.boxes[j]
+            b['x1'] += dx; b['x2'] += dx; b['y1'] += dy; b['y2'] += dy
+
+    def resize(self, idx, handle, dx, dy):
+        self._start_drag(idx, "resize")
+        b = self.boxes[idx]
+        if handle == "tl": b['x1'] += dx; b['y1'] += dy
+        elif handle == "tr": b['x2'] += dx; b['y1'] += dy
+        elif handle == "bl": b['x1'] += dx; b['y2'] += dy
+        elif handle == "br": b['x2'] += dx; b['y2'] += dy
+
+    def normalize(self, idx):
+        self.normalize_many([idx])
+
+    def normalize_many(self, indices):
+        # Dragging a corner past its opposite flips the box; straighten it out
+        for j in indices:
+            b = self.boxes[j]
+            b['x1'], b['x2'] = min(b['x1'], b['x2']), max(b['x1'], b['x2'])
+            b['y1'], b['y2'] = min(b['y1'], b['y2']), max(b['y1'], b['y2'])
+        if not self.dragging: return
+        # The drag ends: one edit for everything it changed (a click without a drag is none)
+        moved = sorted(j for j, before in self.drag_from.items() if self.valid(j) and before != self._coords(j))
+        if len(moved) == 1:
+            j = moved[0]
+            self._record(dict(self._coords(j), op=self.dragging, i=j), dict(self.drag_from[j], op=self.dragging, i=j))
+        elif moved:
+            coords = lambda c: [c['x1'], c['y1'], c['x2'], c['y2']]
+            self._record({"op": "geometry", "items": moved, "coords": [coords(self.boxes[j]) for j in moved]},
+                         {"op": "geometry", "items": moved, "coords": [coords(self.drag_from[j]) for j in moved]})
+        self.dragging = None
+        self.drag_from = None
+
+    # --- Attributes ---
+    def set_class(self, idx, class_id):
+        old = self.boxes[idx]['class_id']
+        self.boxes[idx]['class_id'] = class_id
+        self._record({"op": "class", "i": idx, "class_id": class_id}, {"op": "class", "i": idx, "class_id": old})
+
+    def toggle_visible(self, idx):
+        old = self.boxes[idx].get('visible', True)
+        self.boxes[idx]['visible'] = not old
+        self._record({"op": "visible", "i": idx, "visible": not old}, {"op": "visible", "i": idx, "visible": old})
+
+    def set_class_many(self, indices, class_id):
+        items = sorted(set(indices))
+        if not items: return
+        old = [self.boxes[j]['class_id'] for j in items]
+        for j in items: self.boxes[j]['class_id'] = class_id
+        self._record({"op": "class_many", "items": items, "class_id": class_id}, {"op": "classes", "items": items, "class_ids": old})
+
+    def toggle_visible_many(self, indices):
+        # All shown if any is hidden, else all hidden
+        items = sorted(set(indices))
+        if not items: return
+        old = [self.boxes[j].get('visible', True) for j in items]
+        state = not all(old)
+        for j in items: self.boxes[j]['visible'] = state
+        self._record({"op": "visibility", "items": items, "visible": [state] * len(items)},
+                     {"op": "visibility", "items": items, "visible": old})
+
+    def set_all_visible(self, state):
+        old = [b.get('visible', True) for b in self.boxes]
+        for b in self.boxes: b['visible'] = state
+        self._record({"op": "visible_all", "visible": state}, {"op": "visibility", "visible": old})
+
+    # --- Hit Testing (image coordinates) ---
+    def hit_test(self, x, y):
+        # Topmost visible box under the point
+        for i in range(len(self.boxes)-1, -1, -1):
+            b = self.boxes[i]
+            if not b.get('visible', True): continue
+            if b['x1'] <= x <= b['x2'] and b['y1'] <= y <= b['y2']: return i
+        return None
+
+    def boxes_in(self, x1, y1, x2, y2):
+        # Visible boxes lying wholly inside the rectangle (a rubber band)
+        x1, x2 = min(x1, x2), max(x1, x2); y1, y2 = min(y1, y2), max(y1, y2)
+        return [i for i, b in enumerate(self.boxes)
+                if b.get('visible', True) and x1 <= b['x1'] and b['x2'] <= x2 and y1 <= b['y1'] and b['y2'] <= y2]
+
+    def of_class(self, class_id):
+        return [i for i, b in enumerate(self.boxes) if b['class_id'] == class_id]
+
+    def handle_at(self, idx, x, y, radius):
+        if not self.valid(idx): return None
+        b = self.boxes[idx]
+        coords = {'tl': (b['x1'], b['y1']), 'tr': (b['x2'], b['y1']), 'bl': (b['x1'], b['y2']), 'br': (b['x2'], b['y2'])}
+        for k, v in coords.items():
+            if abs(x-v[0]) < radius and abs(y-v[1]) < radius: return k
+        return None
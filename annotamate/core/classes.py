@@ -0,0 +1,287 @@
+from bisect import bisect_left
+
+# Fixed Colors for Classes
+COLORS = ["#e74c3c", "#3498db", "#f1c40f", "#9b59b6", "#2ecc71",
+          "#1abc9c", "#34495e", "#d35400", "#7f8c8d", "#c0392b"]
+
+UNKNOWN_COLOR = "#999999"
+
+DEFAULT_CLASSES = ["person", "car", "bicycle", "dog"]
+
+
+def name_color(name):
+    # Simple hash to keep color consistent per name
+    return COLORS[sum(map(ord, name)) % len(COLORS)]
+
+
+def hex_rgb(color):
+    return tuple(int(color[i:i+2], 16) for i in (1, 3, 5))
+
+
+def class_color(classes, class_id):
+    if isinstance(classes, ClassRegistry): return classes.color(class_id)
+    if 0 <= class_id < len(classes): return name_color(classes[class_id])
+    return UNKNOWN_COLOR
+
+
+def class_name(classes, class_id, unknown="Unknown"):
+    return classes[class_id] if 0 <= class_id < len(classes) else unknown
+
+
+def read_classes_file(path):
+    # -> list of names, or None if the file is missing/empty/unreadable
+    try:
+        with open(path, "r") as f:
+            lc = [x.strip() for x in f.readlines() if x.strip()]
+            return lc or None
+    except OSError:
+        return None
+
+
+def write_classes_file(path, classes):
+    with open(path, "w") as f:
+        for cls in classes: f.write(f"{cls}\n")
+
+
+# --- REGISTRY ---
+def _reindexing(method):
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._rebuild()
+        return result
+    return wrapper
+
+
+class ClassRegistry(list):
+    """Class names by ID (a list, as everywhere else) with the lookups a
+    large taxonomy needs.
+
+    - `index(name)` and `name in registry` use a hash index, and also
+      resolve aliases ("human" -> the ID of "person").
+    - IDs never move: `retire()` hides a class but keeps its slot (and its
+      line in classes.txt), so label files written before keep their meaning.
+      Adding a retired name again brings the old ID back.
+    - `parents` gives a hierarchy by name ("dog" -> "animal").
+    - Colours are computed once per name: `color(cid)`, `rgb(cid)`.
+
+    Aliases, parents and retired names are saved next to classes.txt by
+    Dataset.save_classes (see `meta()`).
+    """
+
+    def __init__(self, names=(), aliases=None, parents=None, retired=()):
+        super().__init__(names)
+        self.aliases = dict(aliases or {}) # alias -> class name
+        self.parents = dict(parents or {}) # class name -> parent class name
+        self.retired = set(retired)
+        self.version = 0 # Bumped on every change, for caches built from the registry
+        self._rebuild()
+
+    def _rebuild(self):
+        self.ids = {}
+        for cid, name in enumerate(self): self.ids.setdefault(name, cid) # Duplicate lines: the first ID wins
+        self.colors = [name_color(n) for n in self]
+        self.rgbs = [hex_rgb(c) for c in self.colors]
+        self.version += 1
+
+    def __reduce__(self):
+        # Pickled for worker processes: rebuild the index there instead of shipping it
+        return (self.__class__, (list(self), self.aliases, self.parents, sorted(self.retired)))
+
+    def copy(self):
+        # The loader gets a private copy per image; copy the index instead of rebuilding it
+        other = ClassRegistry.__new__(ClassRegistry)
+        list.extend(other, self)
+        other.aliases, other.parents, other.retired = dict(self.aliases), dict(self.parents), set(self.retired)
+        other.ids, other.colors, other.rgbs = dict(self.ids), list(self.colors), list(self.rgbs)
+        other.version = self.version
+        return other
+
+    # --- Lookups ---
+    def lookup(self, name):
+        """-> ID of a name or alias, or None."""
+        cid = self.ids.get(name)
+        if cid is None and name in self.aliases: cid = self.ids.get(self.aliases[name])
+        return cid
+
+    def index(self, name, *args):
+        cid = self.lookup(name)
+        if cid is None: raise ValueError(f"{name!r} is not a class")
+        return cid
+
+    def __contains__(self, name):
+        return self.lookup(name) is not None
+
+    def color(self, cid):
+        return self.colors[cid] if 0 <= cid < len(self.colors) else UNKNOWN_COLOR
+
+    def rgb(self, cid):
+        return self.rgbs[cid] if 0 <= cid < len(self.rgbs) else hex_rgb(UNKNOWN_COLOR)
+
+    def active(self):
+        """-> IDs of the classes that are not retired."""
+        return [cid for cid, name in enumerate(self) if name not in self.retired and self.ids.get(name) == cid]
+
+    def is_retired(self, cid):
+        return 0 <= cid < len(self) and self[cid] in self.retired
+
+    # --- Changes ---
+    def append(self, name):
+        super().append(name)
+        self.ids.setdefault(name, len(self) - 1)
+        self.colors.append(name_color(name))
+        self.rgbs.append(hex_rgb(self.colors[-1]))
+        self.version += 1
+
+    def add(self, name):
+        """-> ID of `name`: an existing (or retired, now restored) class, else a new one."""
+        cid = self.lookup(name)
+        if cid is None:
+            self.append(name)
+            return len(self) - 1
+        if self[cid] in self.retired:
+            self.retired.discard(self[cid]); self.version += 1
+        return cid
+
+    def retire(self, cid):
+        if 0 <= cid < len(self):
+            self.retired.add(self[cid]); self.version += 1
+
+    def add_alias(self, alias, cid):
+        if alias in self.ids: raise ValueError(f"{alias!r} is already a class")
+        self.aliases[alias] = self[cid]; self.version += 1
+
+    def set_parent(self, cid, parent_cid):
+        if parent_cid is None: self.parents.pop(self[cid], None)
+        elif cid in self.lineage(parent_cid): raise ValueError(f"{self[parent_cid]!r} is below {self[cid]!r}")
+        else: self.parents[self[cid]] = self[parent_cid]
+        self.version += 1
+
+    # --- Hierarchy ---
+    def lineage(self, cid):
+        """-> [cid, parent, grandparent, ...]."""
+        out = [cid]
+        name = self[cid]
+        while name in self.parents and len(out) <= len(self):
+            name = self.parents[name]
+            pid = self.ids.get(name)
+            if pid is None or pid in out: break
+            out.append(pid)
+        return out
+
+    def family(self, cid):
+        """-> cid and every class below it."""
+        return [c for c in range(len(self)) if cid in self.lineage(c)]
+
+    def meta(self):
+        return {"aliases": self.aliases, "parents": self.parents, "retired": sorted(self.retired)}
+
+    def extend(self, names):
+        for n in names: self.append(n)
+
+    # Anything else that changes the list keeps the index right, but moves IDs: retire() instead
+    insert = _reindexing(list.insert)
+    pop = _reindexing(list.pop)
+    remove = _reindexing(list.remove)
+    clear = _reindexing(list.clear)
+    sort = _reindexing(list.sort)
+    reverse = _reindexing(list.reverse)
+    __setitem__ = _reindexing(list.__setitem__)
+    __delitem__ = _reindexing(list.__delitem__)
+    __iadd__ = _reindexing(list.__iadd__)
+
+
+def as_registry(classes):
+    """-> a private ClassRegistry of `classes` (a registry, keeping its aliases, or a plain list of names)."""
+    return classes.copy() if isinstance(classes, ClassRegistry) else ClassRegistry(classes)
+
+
+# --- SEARCH ---
+def _words(name):
+    # "traffic_light" / "Traffic Light" / "traffic-light" -> ["traffic", "light"]
+    return [w for w in name.lower().replace("_", " ").replace("-", " ").replace("/", " ").split() if w]
+
+
+class ClassIndex:
+    """Prefix index over class names for the keyboard class picker.
+
+    Every name is indexed under its whole lower-cased name and under each of
+    its words, in one sorted list, so a prefix lookup is a binary search plus
+    the matches. Digits look up a class ID. When prefixes find too little,
+    names containing the query's letters in order ("tl" -> traffic light)
+    fill up the rest. For a ClassRegistry, aliases and parent names find a
+    class too, and retired classes are left out.
+    """
+
+    def __init__(self, classes):
+        self.names = list(classes)
+        self.source = classes
+        self.version = getattr(classes, "version", None)
+        registry = classes if isinstance(classes, ClassRegistry) else None
+        self.active = registry.active() if registry else list(range(len(self.names)))
+        active = set(self.active)
+        keys = []
+        for cid in self.active:
+            name = self.names[cid]
+            full = name.lower()
+            keys.append((full, 0, cid))
+            keys.extend((w, 1, cid) for w in _words(name) if w != full)
+        if registry:
+            for alias, target in registry.aliases.items():
+                cid = registry.lookup(target)
+                if cid in active: keys.extend((w, 1, cid) for w in [alias.lower()] + _words(alias))
+            for name, parent in registry.parents.items():
+                cid = registry.lookup(name)
+                if cid in active: keys.extend((w, 2, cid) for w in [parent.lower()] + _words(parent))
+        keys.sort()
+        self.keys = [k for k, _, _ in keys]
+        self.entries = [(rank, cid) for _, rank, cid in keys]
+        self.active_set = active
+
+    def __len__(self):
+        return len(self.names)
+
+    def stale(self, classes):
+        """Whether `classes` changed since this index was built from it."""
+        if isinstance(classes, ClassRegistry): return classes is not self.source or classes.version != self.version
+        return self.names != classes
+
+    def prefix(self, query, limit=None):
+        """-> class IDs with a name or word starting with `query`, whole names first."""
+        q = query.lower()
+        lo, hi = bisect_left(self.keys, q), bisect_left(self.keys, q + "\uffff")
+        seen, out = set(), []
+        for rank in (0, 1, 2): # A pass per rank stops as soon as `limit` is reached
+            for i in range(lo, hi):
+                r, cid = self.entries[i]
+                if r != rank or cid in seen: continue
+                seen.add(cid); out.append(cid)
+                if limit and len(out) >= limit: return out
+        return out
+
+    def search(self, query, limit=10):
+        """-> up to `limit` class IDs for what was typed: an ID, then prefix matches, then fuzzy ones."""
+        q = query.strip().lower()
+        if not q: return self.active[:limit]
+        out = [int(q)] if q.isdigit() and int(q) in self.active_set else []
+        for cid in self.prefix(q, limit + 1):
+            if cid not in out: out.append(cid)
+        if len(out) < limit and not q.isdigit():
+            # Fuzzy: the letters in order, among names with a word starting like the query
+            letters = q.replace(" ", "")
+            for cid in self.prefix(letters[0]):
+                if cid in out or not _in_order(letters, self.names[cid].lower()): continue
+                out.append(cid)
+                if len(out) >= limit: break
+        return out[:limit]
+
+    def complete_id(self, digits):
+        """The class ID `digits` can only mean (no longer ID starts with them), else None."""
+        if not digits.isdigit(): return None
+        cid = int(digits)
+        if cid not in self.active_set or (cid and cid * 10 < len(self.names)): return None
+        return cid
+
+
+def _in_order(letters, text):
+    it = iter(text)
+    return all(c in it for c in letters)
@@ -0,0 +1,263 @@
+import os
+import json
+
+# --- FORMATS ---
+# Display name (as used by the format selector) -> annotation file extension
+FORMAT_EXTS = {
+    "YOLO": ".txt",
+    "Pascal VOC": ".xml",
+    "COCO": ".json",
+}
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+MEMBER_SEP = "::" # Images inside an archive are "<archive>::<member>" (see core.archive)
+
+
+def annotation_ext(fmt):
+    return FORMAT_EXTS.get(fmt, ".txt") # YOLO default
+
+
+def label_stem(img_path):
+    """An image's label file name without extension, relative to the label dir.
+
+    For an archive member it is the member's path ("a.zip::x/1.jpg" -> "x/1"),
+    so same-named members in different folders get their own label file.
+    """
+    if MEMBER_SEP not in img_path: return os.path.splitext(os.path.basename(img_path))[0]
+    name = img_path.split(MEMBER_SEP, 1)[1].replace("\\", "/")
+    parts = [p for p in name.split("/") if p not in ("", ".", "..")] # Never outside the label dir
+    return os.path.splitext("/".join(parts))[0]
+
+
+def annotation_path(img_path, fmt, label_dir=None):
+    """Returns the expected annotation path for an image in the given format."""
+    name = label_stem(img_path) + annotation_ext(fmt)
+    if label_dir: return os.path.join(label_dir, *name.split("/"))
+    else: return os.path.join(os.path.dirname(img_path), os.path.basename(name))
+
+
+def clip_box(b, w, h):
+    # Clamp a box to the image; returns None for zero-area boxes
+    x1, y1 = max(0, min(b['x1'], w)), max(0, min(b['y1'], h))
+    x2, y2 = max(0, min(b['x2'], w)), max(0, min(b['y2'], h))
+    if x2 <= x1 or y2 <= y1: return None
+    return x1, y1, x2, y2
+
+
+# --- RAW PARSERS (no class resolution, safe to run in worker processes) ---
+def parse_yolo(path):
+    # -> [(class_id, ncx, ncy, nw, nh), ...]
+    rows = []
+    with open(path, 'r') as f:
+        for line in f:
+            p = line.split()
+            if len(p) >= 5:
+                rows.append((int(p[0]), float(p[1]), float(p[2]), float(p[3]), float(p[4])))
+    return rows
+
+
+def parse_voc(path):
+    # -> ((width, height) or None, [(name, xmin, ymin, xmax, ymax), ...])
+    import xml.etree.ElementTree as ET # XML is only loaded for VOC datasets
+    root = ET.parse(path).getroot()
+    size = None
+    size_el = root.find("size")
+    if size_el is not None:
+        try: size = (int(float(size_el.find("width").text)), int(float(size_el.find("height").text)))
+        except: size = None
+    objects = []
+    for obj in root.findall("object"):
+        name = obj.find("name").text
+        bndbox = obj.find("bndbox")
+        objects.append((
+            name,
+            float(bndbox.find("xmin").text),
+            float(bndbox.find("ymin").text),
+            float(bndbox.find("xmax").text),
+            float(bndbox.find("ymax").text),
+        ))
+    return size, objects
+
+
+def parse_coco(path):
+    # -> ((width, height) or None, [(name, x, y, w, h), ...])
+    with open(path, 'r') as f:
+        data = json.load(f)
+    size = None
+    images = data.get("images", [])
+    if images:
+        try: size = (int(images[0]["width"]), int(images[0]["height"]))
+        except: size = None
+    cat_map = {c['id']: c['name'] for c in data.get("categories", [])}
+    objects = []
+    for ann in data.get("annotations", []):
+        x, y, w, h = ann['bbox']
+        objects.append((cat_map.get(ann['category_id'], "unknown"), x, y, w, h))
+    return size, objects
+
+
+# --- BOX READERS (dicts as used by the editor) ---
+def _class_id(classes, name, add_unknown):
+    # Unknown names are appended when asked (so they stay editable, as in the
+    # editor); otherwise they read as -1 and `classes` is left alone
+    try: return classes.index(name)
+    except ValueError:
+        if not add_unknown: return -1
+        classes.append(name)
+        return len(classes) - 1
+
+
+def read_yolo(path, w_img, h_img):
+    boxes = []
+    for cid, ncx, ncy, nw, nh in parse_yolo(path):
+        w, h = nw*w_img, nh*h_img
+        cx, cy = ncx*w_img, ncy*h_img
+        boxes.append({"class_id": cid, "x1": cx-w/2, "y1": cy-h/2, "x2": cx+w/2, "y2": cy+h/2, "visible": True})
+    return boxes
+
+
+def read_voc(path, classes, add_unknown=False):
+    boxes = []
+    for name, xmin, ymin, xmax, ymax in parse_voc(path)[1]:
+        cid = _class_id(classes, name, add_unknown)
+        boxes.append({"class_id": cid, "x1": xmin, "y1": ymin, "x2": xmax, "y2": ymax, "visible": True})
+    return boxes
+
+
+def read_coco(path, classes, add_unknown=False):
+    boxes = []
+    for name, x, y, w, h in parse_coco(path)[1]:
+        cid = _class_id(classes, name, add_unknown)
+        boxes.append({"class_id": cid, "x1": x, "y1": y, "x2": x+w, "y2": y+h, "visible": True})
+    return boxes
+
+
+def read_boxes(annot_path, w_img, h_img, classes, add_unknown=False):
+    # Dispatch on extension. VOC/COCO names missing from `classes` get class -1,
+    # or are appended to it with add_unknown (the caller's list must be private then)
+    ext = os.path.splitext(annot_path)[1].lower()
+    if ext == ".txt": return read_yolo(annot_path, w_img, h_img)
+    elif ext == ".xml": return read_voc(annot_path, classes, add_unknown)
+    elif ext == ".json": return read_coco(annot_path, classes, add_unknown)
+    return []
+
+
+# --- WRITERS ---
+def write_yolo(annot_path, w, h, boxes):
+    with open(annot_path, 'w') as f:
+        for b in boxes:
+            # Basic validation
+            clipped = clip_box(b, w, h)
+            if not clipped: continue
+            x1, y1, x2, y2 = clipped
+
+            bw, bh = x2 - x1, y2 - y1
+            cx, cy = x1 + bw/2, y1 + bh/2
+
+            # Normalize
+            n_cx, n_cy = min(cx/w, 1.0), min(cy/h, 1.0)
+            n_w, n_h = min(bw/w, 1.0), min(bh/h, 1.0)
+
+            f.write(f"{b['class_id']} {n_cx:.6f} {n_cy:.6f} {n_w:.6f} {n_h:.6f}\n")
+
+
+def write_voc(annot_path, img_path, w, h, boxes, classes):
+    import xml.etree.ElementTree as ET
+    from xml.dom import minidom
+
+    # Pascal VOC XML
+    root = ET.Element("annotation")
+    ET.SubElement(root, "folder").text = os.path.basename(os.path.dirname(img_path))
+    ET.SubElement(root, "filename").text = os.path.basename(img_path)
+    ET.SubElement(root, "path").text = img_path
+
+    source = ET.SubElement(root, "source")
+    ET.SubElement(source, "database").text = "Unknown"
+
+    size = ET.SubElement(root, "size")
+    ET.SubElement(size, "width").text = str(w)
+    ET.SubElement(size, "height").text = str(h)
+    ET.SubElement(size, "depth").text = "3"
+
+    ET.SubElement(root, "segmented").text = "0"
+
+    for b in boxes:
+        clipped = clip_box(b, w, h)
+        if not clipped: continue
+        x1, y1, x2, y2 = clipped
+
+        obj = ET.SubElement(root, "object")
+        cid = b['class_id']
+        cname = classes[cid] if cid < len(classes) else "unknown"
+
+        ET.SubElement(obj, "name").text = cname
+        ET.SubElement(obj, "pose").text = "Unspecified"
+        ET.SubElement(obj, "truncated").text = "0"
+        ET.SubElement(obj, "difficult").text = "0"
+
+        bndbox = ET.SubElement(obj, "bndbox")
+        ET.SubElement(bndbox, "xmin").text = str(int(x1))
+        ET.SubElement(bndbox, "ymin").text = str(int(y1))
+        ET.SubElement(bndbox, "xmax").text = str(int(x2))
+        ET.SubElement(bndbox, "ymax").text = str(int(y2))
+
+    # Pretty print XML
+    xmlstr = minidom.parseString(ET.tostring(root)).toprettyxml(indent="   ")
+    with open(annot_path, "w") as f:
+        f.write(xmlstr)
+
+
+def write_coco(annot_path, img_path, w, h, boxes, classes):
+    # COCO JSON (Per-image standard structure)
+    # Structure: { "images": [...], "annotations": [...], "categories": [...] }
+    images = [{
+        "id": 1, # Arbitrary ID for single-image mode
+        "width": w,
+        "height": h,
+        "file_name": os.path.basename(img_path)
+    }]
+
+    categories = []
+    for i, cls_name in enumerate(classes):
+        categories.append({
+            "id": i + 1, # 1-based index is standard for COCO
+            "name": cls_name,
+            "supercategory": "none"
+        })
+
+    annotations = []
+    for i, b in enumerate(boxes):
+        clipped = clip_box(b, w, h)
+        if not clipped: continue
+        x1, y1, x2, y2 = clipped
+
+        width = x2 - x1
+        height = y2 - y1
+
+        # COCO bbox is [x_min, y_min, width, height]
+        annotations.append({
+            "id": i + 1,
+            "image_id": 1,
+            "category_id": b['class_id'] + 1, # Map to 1-based
+            "segmentation": [], # BBox only
+            "area": width * height,
+            "bbox": [x1, y1, width, height],
+            "iscrowd": 0
+        })
+
+    data = {
+        "images": images,
+        "annotations": annotations,
+        "categories": categories
+    }
+
+    with open(annot_path, "w") as f:
+        json.dump(data, f, indent=4)
+
+
+def write_boxes(annot_path, img_path, w, h, boxes, classes):
+    if MEMBER_SEP in img_path: os.makedirs(os.path.dirname(annot_path), exist_ok=True) # Member folders mirrored in the sidecar
+    ext = os.path.splitext(annot_path)[1].lower()
+    if ext == ".xml": write_voc(annot_path, img_path, w, h, boxes, classes)
+    elif ext == ".json": write_coco(annot_path, img_path, w, h, boxes, classes)
+    else: write_yolo(annot_path, w, h, boxes)
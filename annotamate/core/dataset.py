@@ -0,0 +1,171 @@
+import os
+
+from . import archive, codecs
+from .classes import ClassRegistry, read_classes_file, write_classes_file
+from .project import project_dir, load_json, save_json
+
+
+def list_images(d):
+    # Sorted image paths in d (non-recursive, hidden files skipped)
+    try:
+        with os.scandir(d) as it:
+            names = [de.name for de in it if not de.name.startswith(".") and de.name.lower().endswith(codecs.IMAGE_EXTS)]
+    except OSError:
+        return []
+    return [os.path.join(d, n) for n in sorted(names)]
+
+
+# --- DATASET ---
+class Dataset:
+    """An image folder (or zip/tar archive), its label folder and the
+    annotation format in use.
+
+    Owns path resolution and label I/O so that scripts can work on a dataset
+    exactly the way the editor does, without a display.
+    """
+    is_remote = False
+
+    def __init__(self, image_dir=None, label_dir=None, fmt="YOLO"):
+        self.image_dir = image_dir
+        self.label_dir = label_dir or (archive.default_label_dir(image_dir) if image_dir else None)
+        self.fmt = fmt
+        self.image_list = []
+        self.annot_cache = {} # Caches annotation existence: path -> bool
+        self.label_stamps = {} # img path -> label (mtime_ns, size) or None, as last read/written here
+        if image_dir: self.scan()
+
+    def __len__(self):
+        return len(self.image_list)
+
+    @property
+    def read_only(self):
+        # Images inside an archive can be labelled but not renamed or deleted
+        return bool(self.image_dir) and archive.is_archive(self.image_dir)
+
+    @property
+    def project_root(self):
+        # Where image-keyed caches go; an archive's live in its sidecar label dir
+        return self.label_dir if self.read_only else self.image_dir
+
+    def scan(self):
+        if not self.image_dir: self.image_list = []
+        elif self.read_only: self.image_list = archive.get_archive(self.image_dir).image_paths()
+        else: self.image_list = list_images(self.image_dir)
+        self.annot_cache = {}
+        return self.image_list
+
+    def set_label_dir(self, label_dir):
+        self.label_dir = label_dir
+        self.annot_cache = {}
+
+    def set_format(self, fmt):
+        if fmt != self.fmt:
+            self.fmt = fmt
+            self.annot_cache = {}
+
+    # --- Path Helpers ---
+    def annotation_path(self, img_path):
+        """Returns the expected annotation path based on current format."""
+        return codecs.annotation_path(img_path, self.fmt, self.label_dir)
+
+    def classes_file_path(self):
+        if self.label_dir: return os.path.join(self.label_dir, "classes.txt")
+        elif self.image_dir: return os.path.join(self.image_dir, "classes.txt")
+        return None
+
+    def has_annotation(self, img_path):
+        if img_path in self.annot_cache: return self.annot_cache[img_path]
+        exists = os.path.exists(self.annotation_path(img_path))
+        self.annot_cache[img_path] = exists
+        return exists
+
+    def label_stamp(self, img_path):
+        try:
+            st = os.stat(self.annotation_path(img_path))
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def remember_label(self, img_path):
+        # After writing through codecs directly, so our own save is not taken for someone else's
+        self.label_stamps[img_path] = self.label_stamp(img_path)
+
+    def label_changed(self, img_path):
+        """True if the label file changed on disk since we last read or wrote it
+        (e.g. another annotator saved it); unknown images count as unchanged."""
+        if img_path not in self.label_stamps: return False
+        return self.label_stamps[img_path] != self.label_stamp(img_path)
+
+    def invalidate(self, img_path=None):
+        if img_path is None: self.annot_cache = {}
+        else: self.annot_cache.pop(img_path, None)
+
+    def latest_annotated_index(self, search_dir=None):
+        # Index of the image whose annotation was written last (resume point)
+        search_dir = search_dir or self.label_dir or self.image_dir
+        if not search_dir or not os.path.exists(search_dir): return None
+        exts = tuple(codecs.FORMAT_EXTS.values())
+        latest, latest_m = None, -1
+        # An archive's sidecar mirrors the member folders; a plain folder is flat
+        dirs = [search_dir]
+        while dirs:
+            d = dirs.pop()
+            try:
+                with os.scandir(d) as it:
+                    for de in it:
+                        if self.read_only and de.is_dir() and not de.name.startswith("."): dirs.append(de.path)
+                        if not de.name.endswith(exts) or de.name == "classes.txt": continue
+                        m = de.stat().st_mtime
+                        if m > latest_m: latest, latest_m = de.path, m
+            except OSError:
+                continue
+        if latest is None: return None
+        latest_base = os.path.splitext(os.path.relpath(latest, search_dir))[0].replace(os.sep, "/")
+        for i, img_path in enumerate(self.image_list):
+            if codecs.label_stem(img_path) == latest_base: return i
+        return None
+
+    # --- Classes ---
+    def class_meta_path(self, create=False):
+        # Aliases, parents and retired names, kept beside classes.txt
+        cp = self.classes_file_path()
+        return os.path.join(project_dir(os.path.dirname(cp), create), "classes.json") if cp else None
+
+    def load_classes(self):
+        """-> ClassRegistry from classes.txt (plus its aliases etc.), or None."""
+        cp = self.classes_file_path()
+        names = read_classes_file(cp) if cp else None
+        if not names: return None
+        meta = load_json(self.class_meta_path(), {})
+        return ClassRegistry(names, meta.get("aliases"), meta.get("parents"), meta.get("retired", ()))
+
+    def save_classes(self, classes):
+        cp = self.classes_file_path()
+        if not cp: return
+        write_classes_file(cp, classes) # Retired names too: a line per ID keeps YOLO IDs in place
+        if isinstance(classes, ClassRegistry):
+            meta = classes.meta()
+            if meta != load_json(self.class_meta_path(), {"aliases": {}, "parents": {}, "retired": []}): # Called on every save
+                save_json(self.class_meta_path(create=True), meta)
+
+    # --- Labels ---
+    def load_boxes(self, img_path, size, classes):
+        """-> (boxes, annot_path) or ([], None) if there is no label file.
+
+        VOC/COCO class names missing from `classes` are appended to it.
+        """
+        annot_path = self.annotation_path(img_path)
+        stamp = self.label_stamp(img_path)
+        self.label_stamps[img_path] = stamp # Taken before reading: a write in between shows up as a change
+        if stamp is None: return [], None
+        return codecs.read_boxes(annot_path, size[0], size[1], classes, add_unknown=True), annot_path
+
+    def save_boxes(self, img_path, size, boxes, classes):
+        annot_path = self.annotation_path(img_path)
+        codecs.write_boxes(annot_path, img_path, size[0], size[1], boxes, classes)
+        self.annot_cache[img_path] = True
+        self.remember_label(img_path)
+        return annot_path
+
+    def image_size(self, img_path):
+        with archive.open_image(img_path) as im: return im.size
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+
+# Undo/redo as operation deltas. A step is a list of (op, inverse) pairs in
+# BoxStore's operation format (see BoxStore.apply): undoing applies the
+# inverses last to first, redoing the ops first to last. Only what an edit
+# changed is kept (a move is two sets of coordinates, a delete one box), so
+# the history of many images fits in a small budget.
+HISTORY_BYTES = 16 * 1024 * 1024 # All images together; least recently visited images go first
+MAX_STEPS = 1000 # Per image
+OP_BYTES = 400 # Rough cost of one op dict, or of one box inside a list of boxes
+ITEM_BYTES = 64 # Rough cost of one entry in any other list (indices, coordinates, flags)
+
+
+def op_cost(op):
+    n = OP_BYTES
+    for k, v in op.items():
+        if isinstance(v, list): n += len(v) * (OP_BYTES if k == "boxes" else ITEM_BYTES)
+    return n
+
+
+def step_cost(step):
+    return sum(op_cost(op) + op_cost(inv) for op, inv in step)
+
+
+def fingerprint(boxes):
+    # What the label file should hold when the image is opened again. Visibility
+    # is not saved and coordinates pass through the label format, so compare
+    # whole pixels only; a mismatch (edits discarded, file changed elsewhere)
+    # just drops that image's history.
+    return hash(tuple((b['class_id'], round(b['x1']), round(b['y1']), round(b['x2']), round(b['y2'])) for b in boxes))
+
+
+class ImageHistory:
+    """Undo and redo steps of one image."""
+
+    def __init__(self, key=None, owner=None):
+        self.key = key
+        self.owner = owner # UndoHistory keeping the memory budget, or None
+        self.undo = []
+        self.redo = []
+        self.bytes = 0
+        self.fingerprint = None # Set when the image is left
+
+    def _charge(self, n):
+        self.bytes += n
+        if self.owner: self.owner.charge(self, n)
+
+    def push(self, step):
+        """A new edit: the redo steps no longer apply."""
+        if not step: return
+        if self.redo:
+            self._charge(-sum(step_cost(s) for s in self.redo))
+            self.redo = []
+        self.undo.append(step)
+        n = step_cost(step)
+        if len(self.undo) > MAX_STEPS: n -= step_cost(self.undo.pop(0))
+        self._charge(n)
+
+    def pop_undo(self):
+        if not self.undo: return None
+        step = self.undo.pop()
+        self.redo.append(step)
+        return step
+
+    def pop_redo(self):
+        if not self.redo: return None
+        step = self.redo.pop()
+        self.undo.append(step)
+        return step
+
+    def drop_oldest(self):
+        # -> bytes freed; the oldest undo step first, then the furthest redo step
+        stack = self.undo if self.undo else self.redo
+        if not stack: return 0
+        n = step_cost(stack.pop(0))
+        self.bytes -= n
+        return n
+
+    def __len__(self):
+        return len(self.undo) + len(self.redo)
+
+
+class UndoHistory:
+    """Per-image undo histories under one memory budget.
+
+    `open(key, boxes)` returns the history to edit an image with: the one
+    kept from the last visit if the boxes loaded now are the ones it ended
+    on, else a fresh one. `close(history, boxes)` records where it ended.
+    When the budget is exceeded whole histories are dropped, least recently
+    opened first, and then the oldest steps of the image being edited.
+    """
+
+    def __init__(self, max_bytes=HISTORY_BYTES):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict() # key -> ImageHistory, least recently opened first
+        self.bytes = 0
+
+    def open(self, key, boxes):
+        h = self.images.get(key)
+        if h is not None and h.fingerprint == fingerprint(boxes):
+            self.images.move_to_end(key)
+            h.fingerprint = None
+            return h
+        self.forget(key)
+        h = self.images[key] = ImageHistory(key, self)
+        return h
+
+    def close(self, history, boxes):
+        if history is None or history.owner is not self or self.images.get(history.key) is not history: return
+        if not len(history): self.forget(history.key) # Nothing to keep
+        else: history.fingerprint = fingerprint(boxes)
+
+    def forget(self, key):
+        h = self.images.pop(key, None)
+        if h is not None:
+            self.bytes -= h.bytes
+            h.owner = None
+
+    def clear(self):
+        for key in list(self.images): self.forget(key)
+
+    def charge(self, history, n):
+        self.bytes += n
+        while self.bytes > self.max_bytes and self.images:
+            key = next((k for k, h in self.images.items() if h is not history), None)
+            if key is not None: self.forget(key)
+            else:
+                freed = history.drop_oldest()
+                if not freed: break
+                self.bytes -= freed
@@ -0,0 +1,364 @@
+import os
+import json
+import time
+import threading
+
+from . import codecs
+from .boxes import box_to_json, box_from_json
+from .project import project_dir
+
+# Append-only log of box edits, one JSON record per line, in the project
+# directory. Records:
+#   {"t": "open", "img", "size", "stamp", "fmt", "label_dir"}  first edit of an image
+#   {"t": "op", "img", "op": {...}}                            one edit (BoxStore operation)
+#   {"t": "close", "img"}                                      handed off: write it to the label file
+#   {"t": "saved" | "discard", "img"}                          session over
+# A session that is open without a saved/discard record after a crash holds
+# edits that never reached the label file; they can be replayed on top of it.
+JOURNAL_NAME = "edits.journal"
+FSYNC_INTERVAL = 0.2 # Seconds; edits are flushed at once and fsynced at most this often
+COMPACT_INTERVAL = 2.0 # Seconds between background passes over handed-off sessions
+REWRITE_BYTES = 1 << 20 # Rewrite the journal without finished sessions once it is this big
+
+
+# --- REPLAY ---
+def apply_op(boxes, op, classes):
+    """Applies one BoxStore operation (as recorded, with class names) to a box list in place."""
+    kind = op["op"]
+    i = op.get("i")
+    if i is not None and not 0 <= i < len(boxes) + (kind == "insert"): return # Stale index (e.g. base changed); skip rather than guess
+    if kind == "add": boxes.append(box_from_json(op["box"], classes))
+    elif kind == "insert": boxes.insert(i, box_from_json(op["box"], classes))
+    elif kind == "delete": boxes.pop(i)
+    elif kind in ("move", "resize"):
+        for k in ("x1", "y1", "x2", "y2"): boxes[i][k] = op[k]
+    elif kind == "class": boxes[i]['class_id'] = _class_id(op["class"], classes)
+    elif kind == "visible": boxes[i]['visible'] = op["visible"]
+    elif kind == "visible_all":
+        for b in boxes: b['visible'] = op["visible"]
+    elif kind == "replace": boxes[:] = [box_from_json(r, classes) for r in op["boxes"]]
+    elif kind == "add_many": boxes.extend(box_from_json(r, classes) for r in op["boxes"])
+    elif kind == "insert_many":
+        for j, r in zip(op["items"], op["boxes"]):
+            if j > len(boxes): return
+            boxes.insert(j, box_from_json(r, classes))
+    else:
+        items = op.get("items")
+        if items is not None and items and not 0 <= max(items) < len(boxes): return
+        targets = [boxes[j] for j in items] if items is not None else boxes
+        if kind == "visibility":
+            for b, v in zip(targets, op["visible"]): b['visible'] = v
+        elif kind == "delete_many":
+            gone = set(items)
+            boxes[:] = [b for j, b in enumerate(boxes) if j not in gone]
+        elif kind == "geometry":
+            for b, c in zip(targets, op["coords"]): b['x1'], b['y1'], b['x2'], b['y2'] = c
+        elif kind == "class_many":
+            for b in targets: b['class_id'] = _class_id(op["class"], classes)
+        elif kind == "classes":
+            for b, name in zip(targets, op["classes"]): b['class_id'] = _class_id(name, classes)
+
+
+def _class_id(name, classes):
+    if name is None: return -1
+    if name not in classes: classes.append(name)
+    return classes.index(name)
+
+
+def _op_names(ops):
+    # Class names recorded in ops
+    for op in ops:
+        if op.get("class") is not None: yield op["class"]
+        for name in op.get("classes", ()):
+            if name is not None: yield name
+        for r in ([op["box"]] if "box" in op else op.get("boxes", ())):
+            if r.get("class") is not None: yield r["class"]
+
+
+def replay(boxes, ops, classes):
+    boxes = [b.copy() for b in boxes]
+    for op in ops: apply_op(boxes, op, classes)
+    return boxes
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+        return [st.st_mtime_ns, st.st_size]
+    except OSError:
+        return None
+
+
+# --- JOURNAL ---
+class EditJournal:
+    """Crash-safe record of the edits made to each image, and their write-back.
+
+    `begin()` starts a session for the image on screen (nothing is written
+    until its first edit), `record()` appends an operation, and a session
+    ends as `saved()`, `discard()`ed or `hand_off()`: handed-off sessions
+    are replayed onto their label file by a background thread, so an
+    autosave costs one appended line on the editor's thread. Sessions left
+    open by a crash are listed by `recovered()`; handed-off sessions whose
+    label file changed meanwhile are reported once by `take_conflicts()`
+    and kept until `resolve()`d.
+
+    `classes()` returns the editor's class list; `on_written(img)` is called
+    (from the background thread) after a label file was rewritten here.
+    """
+
+    def __init__(self, root, classes, on_written=None, background=True):
+        self.path = os.path.join(project_dir(root), JOURNAL_NAME)
+        self.classes = classes
+        self.on_written = on_written
+        self.lock = threading.Condition() # Sessions and the file
+        self.compact_lock = threading.Lock() # One label write at a time
+        self.sessions = self._read() # img -> session dict, as left by the previous run
+        self.leftover = set(self.sessions) # Unfinished sessions from before this run
+        self.current = None # Session of the image on screen, written on its first edit
+        self.conflicts = {} # img -> reason its edits could not be written
+        self.reported = set() # Conflicts already handed to the editor by take_conflicts()
+        self.file = open(self.path, "ab")
+        self.unsynced = False
+        self.closed = False
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self._run, name="edit-journal", daemon=True)
+            self.thread.start()
+
+    # --- File ---
+    def _read(self):
+        sessions = {}
+        try:
+            with open(self.path, "rb") as f: lines = f.read().splitlines()
+        except OSError:
+            return sessions
+        for line in lines:
+            try: r = json.loads(line)
+            except ValueError: continue # A line torn by the crash; everything before it is intact
+            img, t = r.get("img"), r.get("t")
+            if t == "open": sessions[img] = {"img": img, "size": r["size"], "stamp": r["stamp"], "fmt": r["fmt"],
+                                             "label_dir": r["label_dir"], "ops": [], "closed": False, "written": True}
+            elif img not in sessions: continue
+            elif t == "op": sessions[img]["ops"].append(r["op"])
+            elif t == "close": sessions[img]["closed"] = True
+            elif t in ("saved", "discard"): del sessions[img]
+        return {img: s for img, s in sessions.items() if s["ops"]}
+
+    def _write(self, record):
+        # Caller holds self.lock
+        self.file.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+        self.file.flush() # In the OS now: survives the app crashing; fsync covers the machine
+        self.unsynced = True # The background thread fsyncs on its own schedule
+
+    def _sync(self):
+        with self.lock:
+            if not self.unsynced or self.closed: return
+            self.unsynced = False
+            fd = self.file.fileno()
+        try: (getattr(os, "fdatasync", None) or os.fsync)(fd)
+        except (OSError, ValueError): pass
+
+    def _rewrite(self):
+        # Caller holds self.lock: keep only live sessions
+        records = []
+        for s in self.sessions.values():
+            if not s["written"]: continue
+            records.append({"t": "open", "img": s["img"], "size": s["size"], "stamp": s["stamp"], "fmt": s["fmt"], "label_dir": s["label_dir"]})
+            records.extend({"t": "op", "img": s["img"], "op": op} for op in s["ops"])
+            if s["closed"]: records.append({"t": "close", "img": s["img"]})
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            for r in records: f.write(json.dumps(r, separators=(",", ":")).encode() + b"\n")
+            f.flush(); os.fsync(f.fileno())
+        self.file.close()
+        os.replace(tmp, self.path)
+        self.file = open(self.path, "ab")
+
+    # --- Sessions ---
+    def begin(self, img, size, stamp, fmt, label_dir):
+        """The editor now shows `img`, loaded from a label file with `stamp` (None: no file)."""
+        with self.lock:
+            self.current = {"img": img, "size": list(size), "stamp": list(stamp) if stamp else None, "fmt": fmt,
+                            "label_dir": label_dir, "ops": [], "closed": False, "written": False}
+
+    def record(self, op):
+        """Appends one BoxStore operation for the current image; class IDs are stored as names."""
+        with self.lock:
+            s = self.current
+            if s is None or self.closed: return
+            classes = self.classes() # Read in place: this runs on every edit
+            op = dict(op)
+            if "box" in op: op["box"] = box_to_json(op["box"], classes)
+            if "boxes" in op: op["boxes"] = [box_to_json(b, classes) for b in op["boxes"]]
+            if "class_id" in op:
+                cid = op.pop("class_id")
+                op["class"] = classes[cid] if 0 <= cid < len(classes) else None
+            if "class_ids" in op: op["classes"] = [classes[c] if 0 <= c < len(classes) else None for c in op.pop("class_ids")]
+            if not s["written"]:
+                s["written"] = True
+                if self.sessions.get(s["img"]) is not None: self._forget_conflict(s["img"]) # Replaced by this session
+                self.sessions[s["img"]] = s
+                self.leftover.discard(s["img"])
+                self._write({"t": "open", "img": s["img"], "size": s["size"], "stamp": s["stamp"], "fmt": s["fmt"], "label_dir": s["label_dir"]})
+            s["ops"].append(op)
+            self._write({"t": "op", "img": s["img"], "op": op})
+
+    def _end(self, img, t, current=True, stamp=False):
+        # stamp: the label file's new stamp when the image stays open (a fresh session continues on it)
+        with self.lock:
+            if current and self.current and self.current["img"] == img:
+                s = self.current
+                self.current = None
+                if stamp is not False:
+                    self.current = dict(s, stamp=list(stamp) if stamp else None, ops=[], closed=False, written=False)
+            s = self.sessions.pop(img, None)
+            self.leftover.discard(img)
+            self._forget_conflict(img)
+            if s is not None and s["written"] and not self.closed: self._write({"t": t, "img": img})
+
+    def _forget_conflict(self, img):
+        # Caller holds self.lock
+        self.conflicts.pop(img, None)
+        self.reported.discard(img)
+
+    def saved(self, img, stamp=None):
+        """The editor wrote `img`'s label file itself, which now has `stamp`; later edits are journalled on top of it."""
+        self._end(img, "saved", stamp=stamp)
+
+    def discard(self, img):
+        """The edits to `img` are thrown away."""
+        self._end(img, "discard")
+
+    def abandon(self):
+        """The edits to the image on screen are thrown away; handed-off sessions are still written."""
+        with self.lock:
+            s, self.current = self.current, None
+            if s is None or self.sessions.get(s["img"]) is not s: return # Nothing recorded
+            del self.sessions[s["img"]]
+            if not self.closed: self._write({"t": "discard", "img": s["img"]})
+
+    def hand_off(self, img):
+        """Leave `img`'s edits to the background writer -> False if it has none."""
+        with self.lock:
+            s = self.current if self.current and self.current["img"] == img else None
+            self.current = None
+            if s is None or not s["written"]: return False
+            s["closed"] = True
+            self._write({"t": "close", "img": img})
+            return True
+
+    def has_edits(self, img):
+        with self.lock: return img in self.sessions
+
+    # --- Write-back ---
+    def _compact(self, img):
+        """Replays a closed (or leftover) session onto its label file -> True if written."""
+        with self.compact_lock:
+            with self.lock:
+                s = self.sessions.get(img)
+                if s is None or s is self.current: return False
+                s = dict(s, ops=list(s["ops"]))
+            w, h = s["size"]
+            annot = self._annotation_path(s)
+            if _stamp(annot) != s["stamp"]:
+                # Written by someone else after these edits began: their indices may not fit it
+                with self.lock: self.conflicts[img] = "label file changed since the edits were made"
+                return False
+            classes = self.classes() # The editor's list, read in place
+            base = codecs.read_boxes(annot, w, h, classes) if s["stamp"] else []
+            if any(b['class_id'] < 0 for b in base) or any(n not in classes for n in _op_names(s["ops"])):
+                # Names the editor lacks (a file written elsewhere, an older run):
+                # a private copy takes them, the editor's list is never added to here
+                classes = classes.copy()
+                base = codecs.read_boxes(annot, w, h, classes, add_unknown=True) if s["stamp"] else []
+            boxes = replay(base, s["ops"], classes)
+            codecs.write_boxes(annot, img, w, h, boxes, classes)
+            self._end(img, "saved", current=False) # The image may already be open again
+            if self.on_written: self.on_written(img)
+            return True
+
+    def _annotation_path(self, s):
+        return codecs.annotation_path(s["img"], s["fmt"], s["label_dir"] or os.path.dirname(s["img"]))
+
+    def take_conflicts(self):
+        """-> [(img, reason)] of edits the background writer could not write, each reported once."""
+        with self.lock:
+            new = [(img, reason) for img, reason in sorted(self.conflicts.items()) if img not in self.reported and img in self.sessions]
+            self.reported.update(img for img, _ in new)
+            return new
+
+    def resolve(self, img, write):
+        """Ends a conflicting session: `write` replays its edits onto the label file as it is now, else drops them."""
+        with self.lock:
+            s = self.sessions.get(img)
+            if s is None or s is self.current: return False
+            if write:
+                s["stamp"] = _stamp(self._annotation_path(s)) # Accept the file as the base; edits that no longer fit are skipped
+                self._forget_conflict(img)
+        if write: return self._compact(img)
+        self._end(img, "discard", current=False)
+        return True
+
+    def flush_all(self):
+        """Writes every handed-off session now (before label files are moved)."""
+        self._compact_closed()
+
+    def flush(self, img):
+        """Writes a handed-off session for `img` now (before its label file is read again)."""
+        with self.lock:
+            s = self.sessions.get(img)
+            if s is None or not s["closed"]: return False
+        return self._compact(img)
+
+    def recovered(self):
+        """-> sessions an earlier run left unfinished: [(img, number of edits)]."""
+        with self.lock: return [(img, len(self.sessions[img]["ops"])) for img in sorted(self.leftover) if img in self.sessions]
+
+    def apply_recovered(self):
+        """Writes every leftover session to its label file -> (written, [(img, reason) not written])."""
+        written, failed = 0, []
+        for img, _ in self.recovered():
+            try:
+                if self._compact(img): written += 1
+                else: failed.append((img, self.conflicts.get(img, "not written")))
+            except Exception as e:
+                failed.append((img, str(e)))
+        return written, failed
+
+    def discard_recovered(self):
+        for img, _ in self.recovered(): self.discard(img)
+
+    def _compact_closed(self):
+        with self.lock: closed = [img for img, s in self.sessions.items() if s["closed"] and img not in self.conflicts]
+        for img in closed:
+            try: self._compact(img)
+            except Exception as e:
+                with self.lock: self.conflicts[img] = str(e)
+                print(f"Could not write journalled edits for {os.path.basename(img)}: {e}")
+        with self.lock:
+            if self.closed: return
+            try: size = os.fstat(self.file.fileno()).st_size
+            except OSError: return
+            if size and (not self.sessions or size > REWRITE_BYTES): self._rewrite()
+
+    def _run(self):
+        next_compact = time.monotonic() + COMPACT_INTERVAL
+        while True:
+            with self.lock:
+                if self.closed: return
+                self.lock.wait(FSYNC_INTERVAL) # Only close() wakes it early: at most one fsync per interval
+                if self.closed: return
+            self._sync()
+            if time.monotonic() >= next_compact:
+                self._compact_closed()
+                next_compact = time.monotonic() + COMPACT_INTERVAL
+
+    def close(self):
+        """Writes handed-off sessions, syncs and stops; open sessions stay for recovery."""
+        self._compact_closed()
+        self._sync()
+        with self.lock:
+            self.closed = True
+            self.lock.notify()
+            self.file.close()
+        if self.thread: self.thread.join(timeout=2)
@@ -0,0 +1,57 @@
+import os
+import json
+import sys
+import zlib
+
+# Per-project scratch data (caches, indexes) lives next to the labels
+PROJECT_DIR_NAME = ".annotamate"
+
+
+def project_dir(root, create=True):
+    d = os.path.join(root, PROJECT_DIR_NAME)
+    if create: os.makedirs(d, exist_ok=True)
+    return d
+
+
+def load_json(path, default=None):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    # Write to a temp file and swap it in so a crash never leaves half a cache
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def rel_key(path, root):
+    """Key for an image in caches and manifests: its path under `root` with "/"
+    separators, so same-named images in subfolders or archives ("a.zip::x/1.jpg")
+    stay apart. Without a root, or on another drive, the path itself."""
+    if root is None: return path
+    try: return os.path.relpath(path, root).replace(os.sep, "/")
+    except ValueError: return path
+
+
+def output_stem(path, root):
+    # Stem for files derived from an image (tiles, crops): the image's own stem
+    # plus a tag of its key, so "a.jpg" and "a.png", or "x/1.jpg" and "y/1.jpg",
+    # never write to the same file
+    key = rel_key(path, root)
+    stem = os.path.splitext(key.replace("::", "/").rsplit("/", 1)[-1])[0]
+    return f"{stem}_{zlib.crc32(key.encode()) & 0xffffff:06x}"
+
+
+def user_cache_dir(app="annotamate"):
+    # Per-user cache that survives across projects (no platformdirs dependency)
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, app, "Cache")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~/Library/Caches"), app)
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), app)
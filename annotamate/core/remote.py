@@ -0,0 +1,234 @@
+import json
+import threading
+from urllib.parse import urlsplit, quote, unquote
+
+from .boxes import box_to_json, box_from_json
+from .dataset import Dataset
+
+# A dataset served by `annotamate serve`; its images are addressed by URL
+# (<server>/api/images/<name>), so they travel through the same code paths
+# as file and archive paths
+LABEL_BATCH = 32 # Labels fetched per round trip, starting at the requested image
+TIMEOUT = 30
+
+
+class RemoteError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def is_remote(path):
+    return isinstance(path, str) and path.startswith(("http://", "https://"))
+
+
+def split_url(url):
+    """Image URL -> (server base URL, image name)."""
+    base, _, name = url.partition("/api/images/")
+    return base, unquote(name.split("?", 1)[0])
+
+
+# --- CLIENT ---
+class Client:
+    """JSON/bytes over one keep-alive connection per thread."""
+
+    def __init__(self, base):
+        import http.client # Only loaded once a server is actually used
+        self.http = http.client
+        u = urlsplit(base)
+        self.base = f"{u.scheme}://{u.netloc}"
+        self.https = u.scheme == "https"
+        self.netloc = u.netloc
+        self.local = threading.local()
+
+    def _conn(self):
+        c = getattr(self.local, "conn", None)
+        if c is None:
+            cls = self.http.HTTPSConnection if self.https else self.http.HTTPConnection
+            c = self.local.conn = cls(self.netloc, timeout=TIMEOUT)
+        return c
+
+    def request(self, method, path, body=None, headers=None):
+        """-> (status, headers, bytes); reconnects once if the server dropped the idle connection."""
+        data = json.dumps(body).encode() if body is not None else None
+        hdrs = {"Content-Type": "application/json"} if data is not None else {}
+        hdrs.update(headers or {})
+        for attempt in (0, 1):
+            c = self._conn()
+            try:
+                c.request(method, path, body=data, headers=hdrs)
+                r = c.getresponse()
+                return r.status, r.headers, r.read()
+            except (self.http.RemoteDisconnected, self.http.CannotSendRequest, ConnectionError):
+                c.close()
+                self.local.conn = None
+                if attempt: raise
+
+    def json(self, method, path, body=None):
+        status, _, data = self.request(method, path, body)
+        payload = json.loads(data) if data else {}
+        if status >= 400: raise RemoteError(status, payload.get("error", f"HTTP {status}"))
+        return payload
+
+    def fetch(self, path):
+        status, _, data = self.request("GET", path)
+        if status == 404: raise FileNotFoundError(path)
+        if status >= 400: raise RemoteError(status, f"HTTP {status} for {path}")
+        return data
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_for(url):
+    base = split_url(url)[0] if "/api/images/" in url else url.rstrip("/")
+    with _clients_lock:
+        c = _clients.get(base)
+        if c is None: c = _clients[base] = Client(base)
+        return c
+
+
+def image_stamp(url):
+    # The server's ETag is "<mtime_ns hex>-<size hex>-<scale>"
+    status, headers, _ = client_for(url).request("HEAD", urlsplit(url).path)
+    if status == 404: raise FileNotFoundError(url)
+    if status >= 400: raise RemoteError(status, f"HTTP {status} for {url}")
+    mtime, size, _ = headers.get("ETag", "").strip('"').split("-")
+    return int(mtime, 16), int(size, 16)
+
+
+def fetch_image(url, max_side=None):
+    """Bytes of a served image; with max_side the server sends a scaled JPEG."""
+    path = urlsplit(url).path
+    if max_side: path += f"?max={int(max_side)}"
+    return client_for(url).fetch(path)
+
+
+# --- DATASET ---
+class RemoteDataset(Dataset):
+    """The Dataset interface backed by an annotation server.
+
+    Labels are fetched in batches of LABEL_BATCH and kept until used, saves
+    send the label stamp last seen so the server refuses to overwrite a
+    concurrent save, and the server owns the class list and format.
+    """
+    is_remote = True
+
+    def __init__(self, url):
+        self.client = client_for(url)
+        self.stamps = {} # image url -> image stamp from the listing
+        self.prefetched = {} # image url -> label payload from a batch fetch
+        self.lock = threading.Lock()
+        self.known_classes = None
+        super().__init__(None, None, "YOLO")
+        self.image_dir = self.client.base
+        self.scan()
+
+    @property
+    def read_only(self):
+        return True # Nothing on the server is renamed or deleted from here
+
+    @property
+    def project_root(self):
+        return None
+
+    def name(self, img_path):
+        return split_url(img_path)[1]
+
+    def scan(self):
+        listing = self.client.json("GET", "/api/images")
+        self.fmt = listing["format"]
+        self.known_classes = list(listing["classes"])
+        prefix = f"{self.client.base}/api/images/"
+        self.image_list, self.annot_cache, self.stamps = [], {}, {}
+        for name, labelled, stamp in listing["images"]:
+            url = prefix + quote(name, safe='')
+            self.image_list.append(url)
+            self.annot_cache[url] = labelled
+            self.stamps[url] = tuple(stamp)
+        with self.lock: self.prefetched = {}
+        return self.image_list
+
+    def set_label_dir(self, label_dir):
+        pass # The server decides where labels live
+
+    def set_format(self, fmt):
+        pass # ... and in which format
+
+    def annotation_path(self, img_path):
+        return f"{self.client.base}/api/labels/{quote(self.name(img_path), safe='')}"
+
+    def classes_file_path(self):
+        return None
+
+    def has_annotation(self, img_path):
+        return self.annot_cache.get(img_path, False)
+
+    def invalidate(self, img_path=None):
+        with self.lock:
+            if img_path is None: self.prefetched = {}
+            else: self.prefetched.pop(img_path, None)
+
+    def latest_annotated_index(self, search_dir=None):
+        return None
+
+    # --- Classes ---
+    def load_classes(self):
+        self.known_classes = self.client.json("GET", "/api/classes")["classes"]
+        return list(self.known_classes)
+
+    def save_classes(self, classes):
+        if list(classes) == self.known_classes: return # Called on every save; usually nothing new
+        self.known_classes = self.client.json("PUT", "/api/classes", {"classes": list(classes)})["classes"]
+
+    # --- Labels ---
+    def _fetch(self, img_path):
+        with self.lock: hit = self.prefetched.pop(img_path, None)
+        if hit is not None: return hit
+        # One round trip for this image and the next ones the user is likely to open
+        try: i = self.image_list.index(img_path)
+        except ValueError: i = None
+        batch = [img_path] if i is None else self.image_list[i:i + LABEL_BATCH]
+        got = self.client.json("POST", "/api/labels", {"names": [self.name(u) for u in batch]})["labels"]
+        by_name = {self.name(u): u for u in batch}
+        with self.lock:
+            for name, payload in got.items():
+                if name in by_name and by_name[name] != img_path: self.prefetched[by_name[name]] = payload
+        payload = got.get(self.name(img_path))
+        if payload is None or "error" in payload:
+            raise RemoteError(404, (payload or {}).get("error", f"No labels for {img_path}"))
+        return payload
+
+    def label_stamp(self, img_path):
+        # A HEAD: the server answers with the label file's stamp as the ETag, without reading the labels
+        status, headers, _ = self.client.request("HEAD", f"/api/labels/{quote(self.name(img_path), safe='')}")
+        if status >= 400: raise RemoteError(status, f"HTTP {status} for labels of {self.name(img_path)}")
+        etag = headers.get("ETag")
+        if not etag: return None
+        mtime, size = etag.strip('"').split("-")
+        return int(mtime, 16), int(size, 16)
+
+    def load_boxes(self, img_path, size, classes):
+        payload = self._fetch(img_path)
+        stamp = tuple(payload["stamp"]) if payload["stamp"] else None
+        self.label_stamps[img_path] = stamp
+        if stamp is None: return [], None
+        return [box_from_json(r, classes) for r in payload["boxes"]], self.annotation_path(img_path)
+
+    def save_boxes(self, img_path, size, boxes, classes):
+        body = {"size": list(size), "boxes": [box_to_json(b, classes) for b in boxes]}
+        if img_path in self.label_stamps:
+            stamp = self.label_stamps[img_path]
+            body["expect"] = list(stamp) if stamp else None
+        r = self.client.json("PUT", f"/api/labels/{quote(self.name(img_path), safe='')}", body)
+        self.annot_cache[img_path] = True
+        self.label_stamps[img_path] = tuple(r["stamp"]) if r["stamp"] else None
+        self.invalidate(img_path)
+        return self.annotation_path(img_path)
+
+    def remember_label(self, img_path):
+        self.label_stamps[img_path] = self.label_stamp(img_path)
+
+    def stats(self):
+        return self.client.json("GET", "/api/stats")
@@ -0,0 +1,158 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .core import codecs
+from .core.archive import open_image, file_stamp
+from .core.classes import as_registry
+from .core.project import load_json, save_json, rel_key, output_stem
+
+MANIFEST_NAME = "crops_manifest.json"
+PARALLEL_THRESHOLD = 8 # Images; below this the pool start-up costs more than it saves
+SAVE_EVERY = 200 # Flush the manifest after this many images, so an interrupted run can resume
+JPEG_QUALITY = 95
+
+
+class CropError(Exception):
+    pass
+
+
+def class_folder(name):
+    # Class names are free text; keep them to one safe path component
+    name = "".join("_" if c in '<>:"/\\|?*' or ord(c) < 32 else c for c in name).strip(" .")
+    return name or "_"
+
+
+def crop_rect(box, w, h, padding=0.0, square=False):
+    """Pixel rectangle for `box`, grown by `padding` (fraction of the box
+    size) on every side and optionally to a square, then kept inside the image."""
+    x1, y1, x2, y2 = box['x1'], box['y1'], box['x2'], box['y2']
+    bw, bh = x2 - x1, y2 - y1
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    bw, bh = bw * (1 + 2 * padding), bh * (1 + 2 * padding)
+    if square: bw = bh = max(bw, bh)
+    bw, bh = min(bw, w), min(bh, h)
+    # Shift rather than cut at the border, so squares stay square
+    x1 = min(max(0, cx - bw / 2), w - bw)
+    y1 = min(max(0, cy - bh / 2), h - bh)
+    return int(round(x1)), int(round(y1)), int(round(x1 + bw)), int(round(y1 + bh))
+
+
+def _stamp(path):
+    try:
+        return list(file_stamp(path))
+    except OSError:
+        return None
+
+
+# --- WORKER ---
+def crop_image(job):
+    """Writes every box of one image as a crop; the image is decoded once.
+
+    -> (image key, manifest entry or None, {"crops", "unknown", "error"})
+    """
+    img_path, image_root, label_path, classes, out_dir, padding, square, min_size, old_crops = job
+    key = rel_key(img_path, image_root)
+    res = {"crops": 0, "unknown": 0, "error": None}
+    try:
+        # Crops from an earlier run of a since-changed image must not linger
+        for rel in old_crops:
+            try: os.remove(os.path.join(out_dir, rel))
+            except OSError: pass
+        stamps = [_stamp(img_path), _stamp(label_path)]
+        crops = []
+        with open_image(img_path) as im:
+            w, h = im.size
+            boxes = codecs.read_boxes(label_path, w, h, classes) # Unknown names read as -1
+            boxes = [b for b in boxes if b['x2'] - b['x1'] >= min_size and b['y2'] - b['y1'] >= min_size]
+            if boxes: im.load() # Header only for label-less images
+            stem = output_stem(img_path, image_root)
+            ext = ".png" if os.path.splitext(img_path)[1].lower() == ".png" else ".jpg"
+            for i, b in enumerate(boxes):
+                if not 0 <= b['class_id'] < len(classes):
+                    res["unknown"] += 1
+                    continue
+                rel = os.path.join(class_folder(classes[b['class_id']]), f"{stem}_{i}{ext}")
+                path = os.path.join(out_dir, rel)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                crop = im.crop(crop_rect(b, w, h, padding, square))
+                if ext == ".jpg": crop.convert("RGB").save(path, quality=JPEG_QUALITY)
+                else: crop.save(path)
+                crops.append(rel)
+        res["crops"] = len(crops)
+        return key, {"stamps": stamps, "crops": crops}, res
+    except Exception as e:
+        res["error"] = f"{key}: {e}"
+        return key, None, res
+
+
+# --- EXPORT ---
+def export_crops(image_list, label_dir, fmt, classes, out_dir, padding=0.1, square=False,
+                 min_size=4, workers=None, progress=None, image_root=None):
+    """Writes one crop per box into out_dir/<class name>/ across a process pool.
+
+    A manifest in out_dir records, per image, the image/label stamps and
+    the crops written for it; a rerun with the same settings skips images
+    whose files are unchanged and whose crops are all still on disk. Images
+    are keyed, and crops named, by their path under `image_root`.
+    Returns a summary dict.
+    """
+    if padding < 0: raise CropError("Padding cannot be negative.")
+    classes = as_registry(classes)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    settings = {"padding": padding, "square": bool(square), "min_size": min_size, "classes": list(classes)}
+    manifest = load_json(manifest_path, {})
+    entries = manifest.get("images", {}) if manifest.get("settings") == settings else {}
+
+    jobs, skipped = [], 0
+    for p in image_list:
+        lp = codecs.annotation_path(p, fmt, label_dir)
+        if not os.path.exists(lp): continue
+        e = entries.get(rel_key(p, image_root))
+        if e and e["stamps"] == [_stamp(p), _stamp(lp)] and all(os.path.exists(os.path.join(out_dir, r)) for r in e["crops"]):
+            skipped += 1
+            continue
+        jobs.append((p, image_root, lp, classes, out_dir, padding, square, min_size, e["crops"] if e else []))
+
+    total = {"images": 0, "skipped": skipped, "crops": 0, "unknown": 0}
+    errors = []
+    unsaved = [0]
+
+    def flush():
+        save_json(manifest_path, {"settings": settings, "images": entries})
+        unsaved[0] = 0
+
+    def collect(r):
+        key, entry, res = r
+        total["images"] += 1
+        total["crops"] += res["crops"]
+        total["unknown"] += res["unknown"]
+        if res["error"]:
+            errors.append(res["error"])
+            entries.pop(key, None)
+        else:
+            entries[key] = entry
+        unsaved[0] += 1
+        if unsaved[0] >= SAVE_EVERY: flush()
+        if progress and total["images"] % 20 == 0: progress(total["images"], len(jobs))
+
+    try:
+        if len(jobs) < PARALLEL_THRESHOLD:
+            for job in jobs: collect(crop_image(job))
+        else:
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = set()
+                for job in jobs:
+                    pending.add(pool.submit(crop_image, job))
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for f in done: collect(f.result())
+                for f in pending: collect(f.result())
+    finally:
+        flush() # Keep what finished, even if the run was cut short
+
+    if progress: progress(len(jobs), len(jobs))
+    total["errors"] = errors
+    total["out_dir"] = out_dir
+    return total
@@ -0,0 +1,145 @@
+import os
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+from .core.archive import open_image, file_stamp, resolve, exists
+from .core.remote import is_remote
+from .loader import decode_full
+from .perf import tracer
+
+# Below this many pixels the process hop costs more than the decode itself
+INLINE_PIXELS = 1_000_000
+FRAME_MODE = "RGBA" # 4 bytes/pixel: one of the modes Pillow can wrap without copying
+PREFETCH_SLOTS = 2
+
+
+class Segment(shared_memory.SharedMemory):
+    # An image wrapping the buffer may outlive release(); the mapping is then
+    # freed with the image instead of raising from __del__
+    def __del__(self):
+        try: self.close()
+        except BufferError: pass
+
+
+def decode_into(src, shm_name, size):
+    # Worker side: decode and write the pixels straight into the parent's buffer.
+    # Pool workers share the parent's resource tracker, so attaching is safe.
+    # `src` is a path or an archive MemberRef (read by offset, no index needed).
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        with open_image(src) as im:
+            if im.size != tuple(size): raise ValueError(f"size changed while decoding {src}")
+            shm.buf[:size[0] * size[1] * 4] = im.convert(FRAME_MODE).tobytes()
+    finally:
+        shm.close()
+
+
+# --- DECODE SERVICE ---
+class DecodeService:
+    """Decodes large images in worker processes into shared memory.
+
+    The parent reads the header (cheap), allocates a segment of the exact
+    frame size and hands its name to a worker; the finished frame is wrapped
+    with `Image.frombuffer`, so the pixels are never copied across the
+    process boundary and the Tk thread never runs a decoder. Segments are
+    freed by `release()` once the editor is done with the image.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.pool = None
+        self.lock = threading.Lock()
+        self.frames = {} # id(image) -> SharedMemory backing it
+        self.prefetched = OrderedDict() # path -> (future, shm, size, stamp)
+
+    def _pool(self):
+        # Spawned, not forked: the parent has Tk and a loader thread running
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.pool
+
+    def _submit(self, path):
+        if is_remote(path): return None # Network-bound; a decode worker would only add a hop
+        stamp = file_stamp(path)
+        with open_image(path) as im: size = im.size
+        if size[0] * size[1] < INLINE_PIXELS: return None
+        shm = Segment(create=True, size=size[0] * size[1] * 4)
+        try:
+            fut = self._pool().submit(decode_into, resolve(path), shm.name, size)
+        except Exception:
+            self._free(shm)
+            raise
+        return fut, shm, size, stamp
+
+    def _discard(self, job):
+        fut, shm = job[0], job[1]
+        if fut.cancel(): self._free(shm)
+        else: fut.add_done_callback(lambda f: self._free(shm))
+
+    def _wrap(self, shm, size):
+        im = Image.frombuffer(FRAME_MODE, size, shm.buf, "raw", FRAME_MODE, 0, 1)
+        with self.lock: self.frames[id(im)] = shm
+        return im
+
+    def _free(self, shm):
+        try: shm.close()
+        except BufferError: pass # Still wrapped by an image; the mapping goes with it
+        try: shm.unlink()
+        except FileNotFoundError: pass
+
+    def decode(self, path):
+        """Full decode of `path`; small images and pool failures decode inline."""
+        with self.lock: job = self.prefetched.pop(path, None)
+        try:
+            if job is not None:
+                if job[3] != file_stamp(path): # Replaced since the prefetch (e.g. renamed over)
+                    self._discard(job); job = None
+            tracer.count("decode.prefetch_hit" if job is not None else "decode.prefetch_miss")
+            if job is None: job = self._submit(path)
+            if job is None: return decode_full(path)
+            fut, shm, size, _ = job
+            try:
+                fut.result()
+            except Exception:
+                self._free(shm)
+                raise
+            return self._wrap(shm, size)
+        except Exception as e:
+            if isinstance(e, OSError) and not exists(path): raise
+            if isinstance(e, BrokenProcessPool): self.pool = None # Start a fresh pool next time
+            print(f"Decode worker failed for {os.path.basename(path)}, decoding inline: {e}")
+            return decode_full(path)
+
+    def prefetch(self, paths):
+        # Start decoding likely next images on idle workers
+        for path in paths:
+            with self.lock:
+                if path in self.prefetched: continue
+            try: job = self._submit(path)
+            except Exception: continue
+            if job is None: continue
+            with self.lock:
+                self.prefetched[path] = job
+                while len(self.prefetched) > PREFETCH_SLOTS:
+                    self._discard(self.prefetched.popitem(last=False)[1])
+
+    def release(self, im):
+        """Close `im` and free its shared segment (no-op for inline decodes)."""
+        with self.lock: shm = self.frames.pop(id(im), None)
+        im.close()
+        if shm is not None: self._free(shm)
+
+    def shutdown(self):
+        with self.lock:
+            jobs = list(self.prefetched.values()); self.prefetched.clear()
+            frames = list(self.frames.values()); self.frames.clear()
+        for fut, shm, _, _ in jobs:
+            fut.cancel(); self._free(shm)
+        for shm in frames: self._free(shm)
+        if self.pool: self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,188 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from .core import codecs
+from .core.archive import open_image, file_stamp
+from .core.project import project_dir, load_json, save_json, rel_key
+
+HASH_SIZE = 8 # 8x8 difference hash -> 64 bits
+CACHE_VERSION = 1
+
+# Below this many images a process pool costs more than it saves
+PARALLEL_THRESHOLD = 200
+
+
+# --- HASHING ---
+def dhash(img_path):
+    """64-bit difference hash: robust to re-encoding, scaling and small shifts."""
+    with open_image(img_path) as im:
+        # JPEG can decode straight to a tiny grayscale image (DCT scaling)
+        im.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+        small = im.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+        px = small.tobytes()
+    h = 0
+    row = HASH_SIZE + 1
+    for y in range(HASH_SIZE):
+        for x in range(HASH_SIZE):
+            h = (h << 1) | (px[y * row + x] > px[y * row + x + 1])
+    return h
+
+
+def _hash_job(job):
+    img_path, mtime_ns, size_bytes = job
+    try: return img_path, mtime_ns, size_bytes, dhash(img_path)
+    except Exception: return img_path, mtime_ns, size_bytes, None
+
+
+def hash_images(image_list, cache_root, workers=None, progress=None, image_root=None):
+    """Returns {img_path: hash}. Hashes are cached in the project, keyed by the
+    path under `image_root` (default: cache_root) and checked against mtime."""
+    image_root = image_root or cache_root
+    cache_path = os.path.join(project_dir(cache_root), "phash.json")
+    cached = load_json(cache_path, {})
+    entries = cached.get("files", {}) if cached.get("version") == CACHE_VERSION else {}
+
+    hashes = {}
+    jobs = []
+    for p in image_list:
+        try: mtime_ns, size_bytes = file_stamp(p)
+        except OSError: continue
+        e = entries.get(rel_key(p, image_root))
+        if e and e[0] == mtime_ns and e[1] == size_bytes:
+            if e[2] is not None: hashes[p] = e[2]
+        else:
+            jobs.append((p, mtime_ns, size_bytes))
+
+    if len(jobs) < PARALLEL_THRESHOLD:
+        results = map(_hash_job, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_hash_job, jobs, chunksize=64)
+
+    try:
+        for i, (p, mtime_ns, size_bytes, h) in enumerate(results):
+            entries[rel_key(p, image_root)] = [mtime_ns, size_bytes, h]
+            if h is not None: hashes[p] = h
+            if progress and i % 200 == 0: progress(i, len(jobs))
+    finally:
+        if pool: pool.shutdown()
+    if progress: progress(len(jobs), len(jobs))
+
+    if jobs:
+        try: save_json(cache_path, {"version": CACHE_VERSION, "files": entries})
+        except OSError as e: print(f"Could not write hash cache: {e}")
+    return hashes
+
+
+# --- NEAR-DUPLICATE INDEX ---
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance.
+
+    A radius-r query only descends into children whose edge distance lies in
+    [d - r, d + r], so lookups touch a small fraction of the tree.
+    """
+
+    def __init__(self):
+        self.root = None # [hash, items, {distance: child}]
+
+    def add(self, h, item):
+        if self.root is None:
+            self.root = [h, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [item], {}]
+                return
+            node = child
+
+    def search(self, h, radius):
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius: found.extend(node[1])
+            for cd, child in node[2].items():
+                if d - radius <= cd <= d + radius: stack.append(child)
+        return found
+
+
+def find_duplicate_groups(image_list, hashes, threshold=4):
+    """Groups images whose hashes are within `threshold` bits (transitively).
+
+    Returns lists of paths in image_list order; the first path of each group
+    is the one to keep.
+    """
+    order = {p: i for i, p in enumerate(image_list)}
+    tree = BKTree()
+    for p in image_list:
+        h = hashes.get(p)
+        if h is not None: tree.add(h, p)
+
+    # Union-find over query hits
+    parent = {}
+    def find(x):
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    for p in image_list:
+        h = hashes.get(p)
+        if h is None: continue
+        for q in tree.search(h, threshold):
+            if q == p: continue
+            rp, rq = find(p), find(q)
+            if rp != rq:
+                if order[rp] < order[rq]: parent[rq] = rp
+                else: parent[rp] = rq
+
+    groups = {}
+    for p in image_list:
+        if p in hashes: groups.setdefault(find(p), []).append(p)
+    return sorted((g for g in groups.values() if len(g) > 1), key=lambda g: order[g[0]])
+
+
+# --- GROUP ACTIONS ---
+def copy_labels(src_img, dst_imgs, fmt, label_dir, classes):
+    """Writes src_img's boxes as the labels of every image in dst_imgs."""
+    src_annot = codecs.annotation_path(src_img, fmt, label_dir)
+    if not os.path.exists(src_annot): return 0
+    with open_image(src_img) as im: sw, sh = im.size
+    boxes = codecs.read_boxes(src_annot, sw, sh, classes, add_unknown=True) # Written back with the same names
+    written = 0
+    for dst in dst_imgs:
+        with open_image(dst) as im: dw, dh = im.size
+        # Near-duplicates may differ in resolution; scale boxes to match
+        fx, fy = dw / float(sw), dh / float(sh)
+        scaled = [dict(b, x1=b['x1']*fx, x2=b['x2']*fx, y1=b['y1']*fy, y2=b['y2']*fy) for b in boxes]
+        codecs.write_boxes(codecs.annotation_path(dst, fmt, label_dir), dst, dw, dh, scaled, classes)
+        written += 1
+    return written
+
+
+def delete_images(paths, label_dir):
+    """Deletes images and their label files (in every format), next to them and in label_dir."""
+    deleted = []
+    for p in paths:
+        try: os.remove(p)
+        except OSError: continue
+        deleted.append(p)
+        for d in dict.fromkeys([label_dir, None]): # None: beside the image
+            for fmt in codecs.FORMAT_EXTS:
+                lp = codecs.annotation_path(p, fmt, d)
+                if os.path.exists(lp): os.remove(lp)
+    return deleted
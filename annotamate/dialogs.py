@@ -0,0 +1,981 @@
+# Secondary windows. Imported on first use so that neither these classes nor
+# the dataset tools they drive are loaded before the first image is shown.
+import customtkinter as ctk
+import tkinter as tk
+from tkinter import filedialog, messagebox
+import os
+import threading
+
+from .theme import PS_GRAY_DARK, PS_GRAY_MED, PS_GRAY_LIGHT, PS_GRAY_LIGHTER, PS_TEXT_COLOR, PS_ACTIVE
+from .validate import ISSUE_TYPES, validate_dataset, write_report
+from .dedup import hash_images, find_duplicate_groups, copy_labels, delete_images
+from .split import export_split, LINK_MODES as SPLIT_LINK_MODES
+from .tiles import export_tiles
+from .crops import export_crops
+from .preannotate import BACKENDS as PREANNOTATE_BACKENDS
+
+# --- BATCH RENAME DIALOG ---
+class BatchRenameDialog(ctk.CTkToplevel):
+    def __init__(self, parent, callback):
+        super().__init__(parent)
+        self.title("Batch Rename")
+        self.geometry("320x350")
+        self.resizable(False, False)
+        self.callback = callback
+        self.transient(parent)
+        self.configure(fg_color=PS_GRAY_MED)
+        self.grab_set()
+        
+        if hasattr(parent, 'icon_path') and parent.icon_path:
+            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
+            except: pass
+        
+        ctk.CTkLabel(self, text="Batch Rename Settings", font=("Arial", 16, "bold"), text_color=PS_TEXT_COLOR).pack(pady=15)
+        
+        # Base Name
+        self.frame1 = ctk.CTkFrame(self, fg_color="transparent")
+        self.frame1.pack(fill="x", padx=20, pady=5)
+        ctk.CTkLabel(self.frame1, text="Base Name:", width=80, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
+        self.entry_base = ctk.CTkEntry(self.frame1, placeholder_text="e.g. apple", fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+        self.entry_base.pack(side="left", fill="x", expand=True)
+        
+        # Start Number
+        self.frame2 = ctk.CTkFrame(self, fg_color="transparent")
+        self.frame2.pack(fill="x", padx=20, pady=5)
+        ctk.CTkLabel(self.frame2, text="Start #:", width=80, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
+        self.entry_start = ctk.CTkEntry(self.frame2, fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+        self.entry_start.insert(0, "1")
+        self.entry_start.pack(side="left", fill="x", expand=True)
+        
+        # Digits
+        self.frame3 = ctk.CTkFrame(self, fg_color="transparent")
+        self.frame3.pack(fill="x", padx=20, pady=5)
+        ctk.CTkLabel(self.frame3, text="Digits:", width=80, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
+        self.entry_digits = ctk.CTkEntry(self.frame3, fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+        self.entry_digits.insert(0, "4")
+        self.entry_digits.pack(side="left", fill="x", expand=True)
+        
+        # Preview
+        self.lbl_preview = ctk.CTkLabel(self, text="Preview: apple_0001.jpg", text_color="gray")
+        self.lbl_preview.pack(pady=10)
+        
+        # Bind updates for preview
+        self.entry_base.bind("<KeyRelease>", self.update_preview)
+        self.entry_start.bind("<KeyRelease>", self.update_preview)
+        self.entry_digits.bind("<KeyRelease>", self.update_preview)
+
+        ctk.CTkButton(self, text="Rename All", fg_color=PS_ACTIVE, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_confirm).pack(pady=15, fill="x", padx=20)
+
+        self.center_window()
+        self.focus_force()
+
+    def center_window(self):
+        self.update_idletasks()
+        try:
+            x = self.master.winfo_x() + (self.master.winfo_width() // 2) - 160
+            y = self.master.winfo_y() + (self.master.winfo_height() // 2) - 175
+            self.geometry(f"+{x}+{y}")
+        except: pass
+
+    def update_preview(self, event=None):
+        base = self.entry_base.get().strip()
+        try: start = int(self.entry_start.get())
+        except: start = 1
+        try: digits = int(self.entry_digits.get())
+        except: digits = 4
+        
+        example = f"{base}_{str(start).zfill(digits)}.jpg"
+        self.lbl_preview.configure(text=f"Preview: {example}")
+
+    def on_confirm(self):
+        base = self.entry_base.get().strip()
+        if not base:
+            messagebox.showerror("Error", "Base name cannot be empty.")
+            return
+            
+        try:
+            start = int(self.entry_start.get())
+            digits = int(self.entry_digits.get())
+        except ValueError:
+            messagebox.showerror("Error", "Start and Digits must be numbers.")
+            return
+            
+        self.callback(base, start, digits)
+        self.destroy()
+
+# --- USAGE GUIDE DIALOG ---
+class UsageGuideDialog(ctk.CTkToplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("How to Use")
+        self.geometry("500x600")
+        self.resizable(False, True)
+        self.transient(parent)
+        self.configure(fg_color=PS_GRAY_MED)
+        self.grab_set()
+
+        if hasattr(parent, 'icon_path') and parent.icon_path:
+            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
+            except: pass
+
+        # Title
+        ctk.CTkLabel(self, text="User Guide & Shortcuts", font=("Arial", 20, "bold"), text_color=PS_TEXT_COLOR).pack(pady=15)
+
+        # Scrollable Content
+        scroll_frame = ctk.CTkScrollableFrame(self, label_text="Instructions", label_text_color=PS_TEXT_COLOR, fg_color=PS_GRAY_DARK)
+        scroll_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+
+        # Instructions Text
+        instructions = (
+            "1. Setup:\n"
+            "   - Click 'Open Directory' to load images.\n"
+            "   - (Optional) 'Set Label Directory' if different from images.\n\n"
+            "2. Classes:\n"
+            "   - Click 'Classes' in the top bar to Manage/Select active class.\n"
+            "   - The Sidebar shows objects drawn on the CURRENT image.\n\n"
+            "3. Drawing:\n"
+            "   - Press 'W' to activate Rect Tool.\n"
+            "   - Click and drag to draw a box.\n"
+            "   - Mode automatically switches to Edit after drawing.\n\n"
+            "4. Editing:\n"
+            "   - Edit Mode (X) allows moving/resizing.\n"
+            "   - Press 'X' again with a box selected to change its class.\n"
+            "   - Drag center to move, drag corners to resize.\n\n"
+            "5. Saving:\n"
+            "   - Select Format (YOLO/VOC/COCO) in toolbar.\n"
+            "   - Press Ctrl+S to save."
+        )
+
+        lbl_instr = ctk.CTkLabel(
+            scroll_frame, 
+            text=instructions, 
+            justify="left", 
+            anchor="w",
+            font=("Arial", 12),
+            text_color="#cccccc",
+            wraplength=420
+        )
+        lbl_instr.pack(fill="x", padx=10, pady=10)
+
+        # Shortcuts Section
+        ctk.CTkLabel(scroll_frame, text="Keyboard Shortcuts", font=("Arial", 14, "bold"), text_color=PS_TEXT_COLOR).pack(pady=(15, 5), anchor="w", padx=10)
+
+        shortcuts = [
+            ("A", "Previous Image"),
+            ("D", "Next Image"),
+            ("W", "Draw Rectangle"),
+            ("X", "Edit Mode / Change Class"),
+            ("Ctrl + S", "Save Annotation"),
+            ("F", "Fit Image to Screen"),
+            ("Ctrl + Z", "Undo Last Action"),
+            ("Ctrl + Y", "Redo Action"),
+            ("Ctrl + Scroll", "Zoom In/Out"),
+            ("Right Click", "Undo Box"),
+            ("Scroll", "Vertical Pan"),
+            ("Shift + Scroll", "Horizontal Pan")
+        ]
+
+        # Grid for shortcuts
+        sc_container = ctk.CTkFrame(scroll_frame, fg_color="transparent")
+        sc_container.pack(fill="x", padx=10, pady=5)
+
+        for i, (key, desc) in enumerate(shortcuts):
+            k_lbl = ctk.CTkLabel(sc_container, text=key, font=("Courier", 12, "bold"), text_color=PS_ACTIVE, anchor="w")
+            k_lbl.grid(row=i, column=0, sticky="w", pady=2, padx=(0, 20))
+            
+            d_lbl = ctk.CTkLabel(sc_container, text=desc, font=("Arial", 12), text_color="#cccccc", anchor="w")
+            d_lbl.grid(row=i, column=1, sticky="w", pady=2)
+
+        # Close Button
+        ctk.CTkButton(self, text="Close", command=self.destroy, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR).pack(pady=15)
+
+        self.center_window()
+        self.focus_force()
+
+    def center_window(self):
+        self.update_idletasks()
+        try:
+            x = self.master.winfo_x() + (self.master.winfo_width() // 2) - 250
+            y = self.master.winfo_y() + (self.master.winfo_height() // 2) - 300
+            self.geometry(f"+{x}+{y}")
+        except: pass
+
+# --- DATASET STATISTICS DIALOG ---
+class StatsDialog(ctk.CTkToplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Dataset Statistics")
+        self.geometry("460x640")
+        self.parent = parent
+        self.transient(parent)
+        self.configure(fg_color=PS_GRAY_MED)
+
+        if hasattr(parent, 'icon_path') and parent.icon_path:
+            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
+            except: pass
+
+        ctk.CTkLabel(self, text="Dataset Statistics", font=("Arial", 16, "bold"), text_color=PS_TEXT_COLOR).pack(pady=(15, 5))
+
+        self.lbl_summary = ctk.CTkLabel(self, text="Scanning...", font=("Arial", 12), text_color=PS_TEXT_COLOR, justify="left")
+        self.lbl_summary.pack(pady=5, padx=20, anchor="w")
+
+        self.scroll = ctk.CTkScrollableFrame(self, fg_color=PS_GRAY_DARK)
+        self.scroll.pack(fill="both", expand=True, padx=10, pady=5)
+
+        self.btn_rescan = ctk.CTkButton(self, text="Rescan", fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.start_scan)
+        self.btn_rescan.pack(pady=10)
+
+        self.progress = (0, 0)
+        self.scan_thread = None
+        self.start_scan()
+
+    def start_scan(self):
+        if self.scan_thread and self.scan_thread.is_alive(): return
+        self.engine = self.parent.get_stats_engine()
+        if self.engine is None:
+            self.lbl_summary.configure(text="Open a directory first.")
+            return
+        self.btn_rescan.configure(state="disabled")
+        # Parse in the background; the pool does the heavy lifting
+        self.scan_thread = threading.Thread(target=self.engine.scan, kwargs={"progress": self.on_progress}, daemon=True)
+        self.scan_thread.start()
+        self.poll_scan()
+
+    def on_progress(self, done, total):
+        self.progress = (done, total) # Called from the scan thread, read by poll_scan
+
+    def poll_scan(self):
+        if not self.winfo_exists(): return
+        if self.scan_thread.is_alive():
+            done, total = self.progress
+            self.lbl_summary.configure(text=f"Scanning changed labels... {done}/{total}")
+            self.after(100, self.poll_scan)
+            return
+        self.btn_rescan.configure(state="normal")
+        self.show_summary()
+
+    def show_summary(self):
+        s = self.engine.summary(self.parent.classes)
+        text = (f"Images: {s['images']}    Labelled: {s['labelled']}    Boxes: {s['boxes']}\n"
+                f"Format: {self.engine.fmt}")
+        if s["errors"]: text += f"    Unreadable labels: {len(s['errors'])}"
+        self.lbl_summary.configure(text=text)
+
+        for w in self.scroll.winfo_children(): w.destroy()
+        self.add_chart("Objects per Class", s["classes"])
+        self.add_chart("Boxes per Image", s["boxes_per_image"])
+        self.add_chart("Box Area (% of image)", s["area"])
+        self.add_chart("Box Aspect (w:h)", s["aspect"])
+
+    def add_chart(self, title, rows):
+        ctk.CTkLabel(self.scroll, text=title, font=("Arial", 13, "bold"), text_color=PS_TEXT_COLOR).pack(anchor="w", padx=5, pady=(10, 2))
+        if not rows:
+            ctk.CTkLabel(self.scroll, text="No data", text_color="gray").pack(anchor="w", padx=10)
+            return
+
+        # Plain Canvas bars: one widget per chart regardless of row count
+        t_idx = 0 if self.parent.theme_mode == "Light" else 1
+        row_h = 18; label_w = 130; width = 400
+        cv = tk.Canvas(self.scroll, width=width, height=row_h * len(rows) + 4, bg=PS_GRAY_DARK[t_idx], highlightthickness=0)
+        cv.pack(anchor="w", padx=5)
+
+        max_v = max(v for _, v in rows) or 1
+        bar_w = width - label_w - 60
+        for i, (label, v) in enumerate(rows):
+            y = i * row_h + 2
+            color = self.parent.get_class_color(self.parent.classes.index(label)) if label in self.parent.classes else PS_ACTIVE[t_idx]
+            cv.create_text(label_w - 5, y + row_h / 2, text=str(label), anchor="e", fill=PS_TEXT_COLOR[t_idx], font=("Arial", 9))
+            cv.create_rectangle(label_w, y + 2, label_w + max(1, bar_w * v / max_v), y + row_h - 2, fill=color, outline="")
+            cv.create_text(label_w + bar_w + 5, y + row_h / 2, text=str(v), anchor="w", fill=PS_TEXT_COLOR[t_idx], font=("Arial", 9))
+
+# --- VALIDATION PANEL ---
+class ValidationDialog(ctk.CTkToplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Validate Dataset")
+        self.geometry("560x600")
+        self.parent = parent
+        self.transient(parent)
+        self.configure(fg_color=PS_GRAY_MED)
+
+        if hasattr(parent, 'icon_path') and parent.icon_path:
+            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
+            except: pass
+
+        ctk.CTkLabel(self, text="Dataset Validation", font=("Arial", 16, "bold"), text_color=PS_TEXT_COLOR).pack(pady=(15, 5))
+
+        self.lbl_summary = ctk.CTkLabel(self, text="", font=("Arial", 12), text_color=PS_TEXT_COLOR, justify="left")
+        self.lbl_summary.pack(pady=5, padx=20, anchor="w")
+
+        # Filter + options row
+        top = ctk.CTkFrame(self, fg_color="transparent")
+        top.pack(fill="x", padx=10)
+        self.filter_var = ctk.StringVar(value="All")
+        self.opt_filter = ctk.CTkOptionMenu(top, variable=self.filter_var, values=["All"] + list(ISSUE_TYPES.keys()), width=150, height=24,
+                                            fg_color=PS_GRAY_LIGHT, button_color=PS_GRAY_LIGHTER, button_hover_color=PS_ACTIVE,
+                                            dropdown_fg_color=PS_GRAY_MED, text_color=PS_TEXT_COLOR, corner_radius=2,
+                                            command=lambda _: self.refresh_issues())
+        self.opt_filter.pack(side="left", padx=5)
+        self.deep_var = ctk.BooleanVar(value=False)
+        ctk.CTkSwitch(top, text="Full decode", variable=self.deep_var, progress_color=PS_ACTIVE, fg_color=PS_GRAY_LIGHT,
+                      text_color=PS_TEXT_COLOR, font=("Arial", 11)).pack(side="left", padx=10)
+
+        # Issue list (plain Listbox handles tens of thousands of rows)
+        t_idx = 0 if parent.theme_mode == "Light" else 1
+        list_frame = ctk.CTkFrame(self, fg_color="transparent")
+        list_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        sb = ctk.CTkScrollbar(list_frame, button_color=PS_GRAY_LIGHT, button_hover_color=PS_GRAY_LIGHTER)
+        sb.pack(side="right", fill="y")
+        self.listbox = tk.Listbox(list_frame, bg=PS_GRAY_DARK[t_idx], fg=PS_TEXT_COLOR[t_idx], selectbackground=PS_ACTIVE[t_idx],
+                                  selectforeground="white", highlightthickness=0, borderwidth=0, activestyle="none",
+                                  font=("Arial", 10), yscrollcommand=sb.set)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        sb.configure(command=self.listbox.yview)
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+
+        btns = ctk.CTkFrame(self, fg_color="transparent")
+        btns.pack(fill="x", padx=10, pady=10)
+        self.btn_run = ctk.CTkButton(btns, text="Run", width=100, fg_color=PS_ACTIVE, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.start_run)
+        self.btn_run.pack(side="left", padx=5)
+        ctk.CTkButton(btns, text="Export Report...", width=120, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.export_report).pack(side="left", padx=5)
+
+        self.report = None
+        self.shown = [] # Listbox index -> issue
+        self.progress = (0, 0)
+        self.run_thread = None
+        self.start_run()
+
+    def start_run(self):
+        if self.run_thread and self.run_thread.is_alive(): return
+        p = self.parent
+        if not p.dataset.image_dir or not p.dataset.image_list:
+            self.lbl_summary.configure(text="Open a directory first.")
+            return
+        self.btn_run.configure(state="disabled")
+        self.result_box = []
+        args = (list(p.dataset.image_list), p.dataset.image_dir, p.dataset.label_dir, p.format_var.get(), list(p.classes))
+        kwargs = {"deep": self.deep_var.get(), "progress": self.on_progress}
+        self.run_thread = threading.Thread(target=lambda: self.result_box.append(validate_dataset(*args, **kwargs)), daemon=True)
+        self.run_thread.start()
+        self.poll_run()
+
+    def on_progress(self, done, total):
+        self.progress = (done, total) # Called from the worker thread, read by poll_run
+
+    def poll_run(self):
+        if not self.winfo_exists(): return
+        if self.run_thread.is_alive():
+            done, total = self.progress
+            self.lbl_summary.configure(text=f"Checking images... {done}/{total}")
+            self.after(100, self.poll_run)
+            return
+        self.btn_run.configure(state="normal")
+        if not self.result_box:
+            self.lbl_summary.configure(text="Validation failed, see console.")
+            return
+        self.report = self.result_box[0]
+        # Path -> index so selecting an issue is a dict lookup
+        self.index_of = {path: i for i, path in enumerate(self.parent.dataset.image_list)}
+        self.refresh_issues()
+
+    def refresh_issues(self):
+        if not self.report: return
+        r = self.report
+        counts = ", ".join(f"{k}: {v}" for k, v in sorted(r["counts"].items())) or "no issues"
+        self.lbl_summary.configure(text=f"Checked {r['images_checked']} images in {r['elapsed_sec']}s\n{counts}")
+
+        code = self.filter_var.get()
+        self.shown = [i for i in r["issues"] if code == "All" or i["code"] == code]
+        self.listbox.delete(0, tk.END)
+        for issue in self.shown:
+            tag = "E" if issue["severity"] == "error" else "W"
+            name = os.path.basename(issue["image"] or issue["label"])
+            self.listbox.insert(tk.END, f"[{tag}] {name}  -  {issue['message']}")
+
+    def on_select(self, event=None):
+        sel = self.listbox.curselection()
+        if not sel: return
+        issue = self.shown[sel[0]]
+        idx = self.index_of.get(issue["image"])
+        if idx is None: return # Orphan labels have no image to show
+        if idx != self.parent.current_index:
+            self.parent.jump_to_image(idx)
+        if issue["box"] is not None and issue["box"] < len(self.parent.store.boxes):
+            self.parent.select_object_from_sidebar(issue["box"])
+
+    def export_report(self):
+        if not self.report: return
+        path = filedialog.asksaveasfilename(parent=self, title="Save Validation Report", defaultextension=".json",
+                                            initialfile="validation_report.json", filetypes=[("JSON", "*.json")])
+        if path:
+            write_report(self.report, path)
+
+# --- DUPLICATE FINDER ---
+class DedupDialog(ctk.CTkToplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Find Duplicates")
+        self.geometry("520x600")
+        self.parent = parent
+        self.transient(parent)
+        self.configure(fg_color=PS_GRAY_MED)
+
+        if hasattr(parent, 'icon_path') and parent.icon_path:
+            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
+            except: pass
+
+        ctk.CTkLabel(self, text="Duplicate & Near-Duplicate Images", font=("Arial", 16, "bold"), text_color=PS_TEXT_COLOR).pack(pady=(15, 5))
+
+        # Threshold row
+        top = ctk.CTkFrame(self, fg_color="transparent")
+        top.pack(fill="x", padx=20, pady=5)
+        ctk.CTkLabel(top, text="Max bit difference:", text_color=PS_TEXT_COLOR).pack(side="left")
+        self.entry_thresh = ctk.CTkEntry(top, width=50, fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+        self.entry_thresh.insert(0, "4")
+        self.entry_thresh.pack(side="left", padx=5)
+        self.btn_find = ctk.CTkButton(top, text="Find", width=80, fg_color=PS_ACTIVE, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.start_find)
+        self.btn_find.pack(side="left", padx=10)
+
+        self.lbl_summary = ctk.CTkLabel(self, text="", font=("Arial", 12), text_color=PS_TEXT_COLOR, justify="left")
+        self.lbl_summary.pack(pady=5, padx=20, anchor="w")
+
+        t_idx = 0 if parent.theme_mode == "Light" else 1
+        list_frame = ctk.CTkFrame(self, fg_color="transparent")
+        list_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        sb = ctk.CTkScrollbar(list_frame, button_color=PS_GRAY_LIGHT, button_hover_color=PS_GRAY_LIGHTER)
+        sb.pack(side="right", fill="y")
+        self.listbox = tk.Listbox(list_frame, bg=PS_GRAY_DARK[t_idx], fg=PS_TEXT_COLOR[t_idx], selectbackground=PS_ACTIVE[t_idx],
+                                  selectforeground="white", highlightthickness=0, borderwidth=0, activestyle="none",
+                                  selectmode=tk.EXTENDED, font=("Arial", 10), yscrollcommand=sb.set)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        sb.configure(command=self.listbox.yview)
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+
+        # Actions apply to the selected groups (or all groups if none selected)
+        btns = ctk.CTkFrame(self, fg_color="transparent")
+        btns.pack(fill="x", padx=10, pady=10)
+        ctk.CTkButton(btns, text="Skip Duplicates", width=110, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_skip).pack(side="left", padx=5)
+        ctk.CTkButton(btns, text="Copy Labels", width=110, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_copy_labels).pack(side="left", padx=5)
+        ctk.CTkButton(btns, text="Delete Duplicates", width=120, fg_color=PS_GRAY_LIGHT, hover_color="#C0392B", text_color=PS_TEXT_COLOR, command=self.on_delete).pack(side="left", padx=5)
+
+        self.groups = []
+        self.progress = (0, 0)
+        self.find_thread = None
+
+    def start_find(self):
+        if self.find_thread and self.find_thread.is_alive(): return
+        p = self.parent
+        if not p.dataset.image_dir or not p.dataset.image_list:
+            self.lbl_summary.configure(text="Open a directory first.")
+            return
+        try: thresh = max(0, int(self.entry_thresh.get()))
+        except ValueError:
+            messagebox.showerror("Error", "Threshold must be a number.", parent=self)
+            return
+
+        images = list(p.dataset.image_list)
+        self.result_box = []
+        def work():
+            hashes = hash_images(images, p.dataset.project_root, progress=self.on_progress, image_root=p.dataset.image_dir)
+            self.result_box.append(find_duplicate_groups(images, hashes, thresh))
+
+        self.btn_find.configure(state="disabled")
+        self.find_thread = threading.Thread(target=work, daemon=True)
+        self.find_thread.start()
+        self.poll_find()
+
+    def on_progress(self, done, total):
+        self.progress = (done, total) # Called from the worker thread, read by poll_find
+
+    def poll_find(self):
+        if not self.winfo_exists(): return
+        if self.find_thread.is_alive():
+            done, total = self.progress
+            self.lbl_summary.configure(text=f"Hashing images... {done}/{total}")
+            self.after(100, self.poll_find)
+            return
+        self.btn_find.configure(state="normal")
+        if not self.result_box:
+            self.lbl_summary.configure(text="Duplicate search failed, see console.")
+            return
+        self.groups = self.result_box[0]
+        self.refresh_groups()
+
+    def refresh_groups(self):
+        dups = sum(len(g) - 1 for g in self.groups)
+        self.lbl_summary.configure(text=f"{len(self.groups)} groups, {dups} redundant images")
+        self.listbox.delete(0, tk.END)
+        for g in self.groups:
+            self.listbox.insert(tk.END, f"{os.path.basename(g[0])}  +{len(g) - 1}:  " + ", ".join(os.path.basename(x) for x in g[1:4]) + (" ..." if len(g) > 4 else ""))
+
+    def selected_groups(self):
+        sel = self.listbox.curselection()
+        return [self.groups[i] for i in sel] if sel else list(self.groups)
+
+    def on_select(self, event=None):
+        sel = self.listbox.curselection()
+        if len(sel) != 1: return
+        try: idx = self.parent.dataset.image_list.index(self.groups[sel[0]][0])
+        except ValueError: return
+        if idx != self.parent.current_index: self.parent.jump_to_image(idx)
+
+    def on_skip(self):
+        for g in self.selected_groups(): self.parent.skipped_images.update(g[1:])
+        self.lbl_summary.configure(text=f"Skipping {len(self.parent.skipped_images)} images during navigation")
+
+    def on_copy_labels(self):
+        p = self.parent
+        groups = self.selected_groups()
+        if not groups: return
+        if not messagebox.askyesno("Copy Labels", f"Overwrite labels of duplicates in {len(groups)} group(s) with the first image's labels?", parent=self): return
+        n = 0
+        for g in groups:
+            try: n += copy_labels(g[0], g[1:], p.format_var.get(), p.dataset.label_dir, p.classes)
+            except Exception as e: print(f"Could not copy labels from {g[0]}: {e}")
+            for x in g[1:]: p.dataset.invalidate(x)
+        p.refresh_file_list()
+        self.lbl_summary.configure(text=f"Copied labels to {n} images")
+
+    def on_delete(self):
+        p = self.parent
+        groups = self.selected_groups()
+        doomed = [x for g in groups for x in g[1:]]
+        if not doomed or p.refuse_read_only("deleted"): return
+        if not messagebox.askyesno("Delete", f"Delete {len(doomed)} duplicate images and their labels?", parent=self): return
+        deleted = set(delete_images(doomed, p.dataset.label_dir))
+        p.remove_images_from_list(deleted)
+        self.groups = [g for g in self.groups if g not in groups]
+        self.refresh_groups()
+
+# --- SPLIT EXPORT DIALOG ---
+class SplitDialog(ctk.CTkToplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Export Train/Val/Test Split")
+        self.geometry("380x470")
+        self.resizable(False, False)
+        self.parent = parent
+        self.transient(parent)
+        self.configure(fg_color=PS_GRAY_MED)
+
+        if hasattr(parent, 'icon_path') and parent.icon_path:
+            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
+            except: pass
+
+        ctk.CTkLabel(self, text="Split Export Settings", font=("Arial", 16, "bold"), text_color=PS_TEXT_COLOR).pack(pady=15)
+
+        def row(label):
+            f = ctk.CTkFrame(self, fg_color="transparent")
+            f.pack(fill="x", padx=20, pady=4)
+            ctk.CTkLabel(f, text=label, width=110, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
+            return f
+
+        def entry(parent_frame, value, width=60):
+            e = ctk.CTkEntry(parent_frame, width=width, fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+            e.insert(0, value)
+            e.pack(side="left", padx=(0, 5))
+            return e
+
+        f = row("Train/Val/Test %:")
+        self.entry_train = entry(f, "80", 45); self.entry_val = entry(f, "10", 45); self.entry_test = entry(f, "10", 45)
+
+        self.entry_seed = entry(row("Seed:"), "0")
+
+        self.out_format_var = ctk.StringVar(value="YOLO")
+        ctk.CTkOptionMenu(row("Output format:"), variable=self.out_format_var, values=["YOLO", "COCO"], width=140,
+                          fg_color=PS_GRAY_LIGHT, button_color=PS_GRAY_LIGHTER, button_hover_color=PS_ACTIVE,
+                          dropdown_fg_color=PS_GRAY_MED, text_color=PS_TEXT_COLOR, corner_radius=2).pack(side="left")
+
+        self.link_var = ctk.StringVar(value="hardlink")
+        ctk.CTkOptionMenu(row("Files:"), variable=self.link_var, values=list(SPLIT_LINK_MODES), width=140,
+                          fg_color=PS_GRAY_LIGHT, button_color=PS_GRAY_LIGHTER, button_hover_color=PS_ACTIVE,
+                          dropdown_fg_color=PS_GRAY_MED, text_color=PS_TEXT_COLOR, corner_radius=2).pack(side="left")
+
+        self.unlabelled_var = ctk.BooleanVar(value=False)
+        ctk.CTkSwitch(self, text="Include unlabelled images", variable=self.unlabelled_var, progress_color=PS_ACTIVE,
+                      fg_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR).pack(padx=20, pady=8, anchor="w")
+
+        f = row("Output folder:")
+        self.out_dir = None
+        self.lbl_out = ctk.CTkLabel(f, text="(choose)", text_color="gray", anchor="w", width=120)
+        self.lbl_out.pack(side="left", fill="x", expand=True)
+        ctk.CTkButton(f, text="...", width=30, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.choose_out).pack(side="left")
+
+        self.lbl_status = ctk.CTkLabel(self, text="", text_color="gray", wraplength=340, justify="left")
+        self.lbl_status.pack(pady=10, padx=20)
+
+        self.btn_export = ctk.CTkButton(self, text="Export", fg_color=PS_ACTIVE, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_export)
+        self.btn_export.pack(pady=10, fill="x", padx=20)
+
+        self.progress = (0, 0)
+        self.export_thread = None
+
+    def choose_out(self):
+        d = filedialog.askdirectory(parent=self, title="Select Output Folder")
+        if d:
+            self.out_dir = d
+            self.lbl_out.configure(text=os.path.basename(d) or d, text_color=PS_TEXT_COLOR)
+
+    def on_export(self):
+        p = self.parent
+        if not p.dataset.image_dir or not p.dataset.image_list:
+            messagebox.showinfo("Info", "Open a directory first.", parent=self)
+            return
+        if not self.out_dir:
+            messagebox.showerror("Error", "Choose an output folder.", parent=self)
+            return
+        try:
+            ratios = (float(self.entry_train.get()), float(self.entry_val.get()), float(self.entry_test.get()))
+            seed = int(self.entry_seed.get())
+        except ValueError:
+            messagebox.showerror("Error", "Ratios and seed must be numbers.", parent=self)
+            return
+        if ratios[2] <= 0: ratios = ratios[:2] # No test split requested
+
+        args = (list(p.dataset.image_list), p.dataset.image_dir, p.dataset.label_dir, p.format_var.get(), list(p.classes), self.out_dir)
+        kwargs = {"ratios": ratios, "seed": seed, "out_format": self.out_format_var.get(), "link": self.link_var.get(),
+                  "include_unlabelled": self.unlabelled_var.get(), "progress": self.on_progress}
+        self.result_box = []
+        def work():
+            try: self.result_box.append(export_split(*args, **kwargs))
+            except Exception as e: self.result_box.append(e)
+
+        self.btn_export.configure(state="disabled")
+        self.export_thread = threading.Thread(target=work, daemon=True)
+        self.export_thread.start()
+        self.poll_export()
+
+    def on_progress(self, done, total):
+        self.progress = (done, total) # Called from the worker thread, read by poll_export
+
+    def poll_export(self):
+        if not self.winfo_exists(): return
+        if self.export_thread.is_alive():
+            done, total = self.progress
+            self.lbl_status.configure(text=f"Exporting... {done}/{total}")
+            self.after(100, self.poll_export)
+            return
+        self.btn_export.configure(state="normal")
+        r = self.result_box[0] if self.result_box else None
+        if isinstance(r, dict):
+            counts = ", ".join(f"{k}: {v}" for k, v in r["counts"].items())
+            self.lbl_status.configure(text=f"Done ({counts}) using {', '.join(r['link_modes']) or 'no files'}.")
+        else:
+            self.lbl_status.configure(text=f"Export failed: {r}")
+
+# --- TILE EXPORT DIALOG ---
+class TileDialog(ctk.CTkToplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Export Tiles")
+        self.geometry("380x470")
+        self.resizable(False, False)
+        self.parent = parent
+        self.transient(parent)
+        self.configure(fg_color=PS_GRAY_MED)
+
+        if hasattr(parent, 'icon_path') and parent.icon_path:
+            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
+            except: pass
+
+        ctk.CTkLabel(self, text="Tile Export Settings", font=("Arial", 16, "bold"), text_color=PS_TEXT_COLOR).pack(pady=15)
+
+        def row(label):
+            f = ctk.CTkFrame(self, fg_color="transparent")
+            f.pack(fill="x", padx=20, pady=4)
+            ctk.CTkLabel(f, text=label, width=110, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
+            return f
+
+        def entry(parent_frame, value, width=60):
+            e = ctk.CTkEntry(parent_frame, width=width, fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+            e.insert(0, value)
+            e.pack(side="left", padx=(0, 5))
+            return e
+
+        self.entry_tile = entry(row("Tile size (px):"), "640")
+        self.entry_overlap = entry(row("Overlap (px):"), "128")
+        self.entry_visibility = entry(row("Min. visible %:"), "50")
+
+        self.out_format_var = ctk.StringVar(value="YOLO")
+        ctk.CTkOptionMenu(row("Output format:"), variable=self.out_format_var, values=["YOLO", "Pascal VOC", "COCO"], width=140,
+                          fg_color=PS_GRAY_LIGHT, button_color=PS_GRAY_LIGHTER, button_hover_color=PS_ACTIVE,
+                          dropdown_fg_color=PS_GRAY_MED, text_color=PS_TEXT_COLOR, corner_radius=2).pack(side="left")
+
+        self.empty_var = ctk.BooleanVar(value=False)
+        ctk.CTkSwitch(self, text="Keep tiles without boxes", variable=self.empty_var, progress_color=PS_ACTIVE,
+                      fg_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR).pack(padx=20, pady=8, anchor="w")
+
+        f = row("Output folder:")
+        self.out_dir = None
+        self.lbl_out = ctk.CTkLabel(f, text="(choose)", text_color="gray", anchor="w", width=120)
+        self.lbl_out.pack(side="left", fill="x", expand=True)
+        ctk.CTkButton(f, text="...", width=30, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.choose_out).pack(side="left")
+
+        self.lbl_status = ctk.CTkLabel(self, text="", text_color="gray", wraplength=340, justify="left")
+        self.lbl_status.pack(pady=10, padx=20)
+
+        self.btn_export = ctk.CTkButton(self, text="Export", fg_color=PS_ACTIVE, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_export)
+        self.btn_export.pack(pady=10, fill="x", padx=20)
+
+        self.progress = (0, 0)
+        self.export_thread = None
+
+    def choose_out(self):
+        d = filedialog.askdirectory(parent=self, title="Select Output Folder")
+        if d:
+            self.out_dir = d
+            self.lbl_out.configure(text=os.path.basename(d) or d, text_color=PS_TEXT_COLOR)
+
+    def on_export(self):
+        p = self.parent
+        if not p.dataset.image_dir or not p.dataset.image_list:
+            messagebox.showinfo("Info", "Open a directory first.", parent=self)
+            return
+        if not self.out_dir:
+            messagebox.showerror("Error", "Choose an output folder.", parent=self)
+            return
+        try:
+            tile, overlap = int(self.entry_tile.get()), int(self.entry_overlap.get())
+            visibility = float(self.entry_visibility.get()) / 100
+        except ValueError:
+            messagebox.showerror("Error", "Tile size, overlap and visibility must be numbers.", parent=self)
+            return
+        if tile <= 0 or not 0 <= overlap < tile:
+            messagebox.showerror("Error", "Overlap must be at least 0 and smaller than the tile size.", parent=self)
+            return
+
+        args = (list(p.dataset.image_list), p.dataset.label_dir, p.format_var.get(), list(p.classes), self.out_dir)
+        kwargs = {"tile": tile, "overlap": overlap, "min_visibility": visibility, "out_format": self.out_format_var.get(),
+                  "keep_empty": self.empty_var.get(), "progress": self.on_progress, "image_root": p.dataset.image_dir}
+        self.result_box = []
+        def work():
+            try: self.result_box.append(export_tiles(*args, **kwargs))
+            except Exception as e: self.result_box.append(e)
+
+        self.btn_export.configure(state="disabled")
+        self.export_thread = threading.Thread(target=work, daemon=True)
+        self.export_thread.start()
+        self.poll_export()
+
+    def on_progress(self, done, total):
+        self.progress = (done, total) # Called from the worker thread, read by poll_export
+
+    def poll_export(self):
+        if not self.winfo_exists(): return
+        if self.export_thread.is_alive():
+            done, total = self.progress
+            self.lbl_status.configure(text=f"Slicing... {done}/{total}")
+            self.after(100, self.poll_export)
+            return
+        self.btn_export.configure(state="normal")
+        r = self.result_box[0] if self.result_box else None
+        if isinstance(r, dict):
+            text = f"Done: {r['tiles']} tiles, {r['boxes']} boxes from {r['images']} images ({r['dropped']} box cuts below visibility)."
+            if r["unknown"]: text += f" {r['unknown']} boxes with unknown classes skipped."
+            if r["errors"]: text += f" {len(r['errors'])} images failed, e.g. {r['errors'][0]}"
+            self.lbl_status.configure(text=text)
+        else:
+            self.lbl_status.configure(text=f"Export failed: {r}")
+
+# --- CROP EXPORT DIALOG ---
+class CropDialog(ctk.CTkToplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Export Object Crops")
+        self.geometry("380x430")
+        self.resizable(False, False)
+        self.parent = parent
+        self.transient(parent)
+        self.configure(fg_color=PS_GRAY_MED)
+
+        if hasattr(parent, 'icon_path') and parent.icon_path:
+            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
+            except: pass
+
+        ctk.CTkLabel(self, text="Crop Export Settings", font=("Arial", 16, "bold"), text_color=PS_TEXT_COLOR).pack(pady=15)
+
+        def row(label):
+            f = ctk.CTkFrame(self, fg_color="transparent")
+            f.pack(fill="x", padx=20, pady=4)
+            ctk.CTkLabel(f, text=label, width=110, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
+            return f
+
+        def entry(parent_frame, value, width=60):
+            e = ctk.CTkEntry(parent_frame, width=width, fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+            e.insert(0, value)
+            e.pack(side="left", padx=(0, 5))
+            return e
+
+        self.entry_padding = entry(row("Padding %:"), "10")
+        self.entry_min = entry(row("Min. size (px):"), "4")
+
+        self.square_var = ctk.BooleanVar(value=False)
+        ctk.CTkSwitch(self, text="Square crops", variable=self.square_var, progress_color=PS_ACTIVE,
+                      fg_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR).pack(padx=20, pady=8, anchor="w")
+
+        f = row("Output folder:")
+        self.out_dir = None
+        self.lbl_out = ctk.CTkLabel(f, text="(choose)", text_color="gray", anchor="w", width=120)
+        self.lbl_out.pack(side="left", fill="x", expand=True)
+        ctk.CTkButton(f, text="...", width=30, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.choose_out).pack(side="left")
+
+        self.lbl_status = ctk.CTkLabel(self, text="Reruns into the same folder only write what changed.", text_color="gray", wraplength=340, justify="left")
+        self.lbl_status.pack(pady=10, padx=20)
+
+        self.btn_export = ctk.CTkButton(self, text="Export", fg_color=PS_ACTIVE, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_export)
+        self.btn_export.pack(pady=10, fill="x", padx=20)
+
+        self.progress = (0, 0)
+        self.export_thread = None
+
+    def choose_out(self):
+        d = filedialog.askdirectory(parent=self, title="Select Output Folder")
+        if d:
+            self.out_dir = d
+            self.lbl_out.configure(text=os.path.basename(d) or d, text_color=PS_TEXT_COLOR)
+
+    def on_export(self):
+        p = self.parent
+        if not p.dataset.image_dir or not p.dataset.image_list:
+            messagebox.showinfo("Info", "Open a directory first.", parent=self)
+            return
+        if not self.out_dir:
+            messagebox.showerror("Error", "Choose an output folder.", parent=self)
+            return
+        try:
+            padding = float(self.entry_padding.get()) / 100
+            min_size = int(self.entry_min.get())
+        except ValueError:
+            messagebox.showerror("Error", "Padding and minimum size must be numbers.", parent=self)
+            return
+
+        args = (list(p.dataset.image_list), p.dataset.label_dir, p.format_var.get(), list(p.classes), self.out_dir)
+        kwargs = {"padding": padding, "square": self.square_var.get(), "min_size": min_size, "progress": self.on_progress,
+                  "image_root": p.dataset.image_dir}
+        self.result_box = []
+        def work():
+            try: self.result_box.append(export_crops(*args, **kwargs))
+            except Exception as e: self.result_box.append(e)
+
+        self.btn_export.configure(state="disabled")
+        self.export_thread = threading.Thread(target=work, daemon=True)
+        self.export_thread.start()
+        self.poll_export()
+
+    def on_progress(self, done, total):
+        self.progress = (done, total) # Called from the worker thread, read by poll_export
+
+    def poll_export(self):
+        if not self.winfo_exists(): return
+        if self.export_thread.is_alive():
+            done, total = self.progress
+            self.lbl_status.configure(text=f"Cropping... {done}/{total}")
+            self.after(100, self.poll_export)
+            return
+        self.btn_export.configure(state="normal")
+        r = self.result_box[0] if self.result_box else None
+        if isinstance(r, dict):
+            text = f"Done: {r['crops']} crops from {r['images']} images, {r['skipped']} unchanged images skipped."
+            if r["unknown"]: text += f" {r['unknown']} boxes with unknown classes skipped."
+            if r["errors"]: text += f" {len(r['errors'])} images failed, e.g. {r['errors'][0]}"
+            self.lbl_status.configure(text=text)
+        else:
+            self.lbl_status.configure(text=f"Export failed: {r}")
+
+# --- PRE-ANNOTATION DIALOG ---
+class PreannotateDialog(ctk.CTkToplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Pre-annotate with Model")
+        self.geometry("400x470")
+        self.resizable(False, False)
+        self.parent = parent
+        self.transient(parent)
+        self.configure(fg_color=PS_GRAY_MED)
+
+        if hasattr(parent, 'icon_path') and parent.icon_path:
+            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
+            except: pass
+
+        ctk.CTkLabel(self, text="Pre-annotation", font=("Arial", 16, "bold"), text_color=PS_TEXT_COLOR).pack(pady=15)
+
+        def row(label):
+            f = ctk.CTkFrame(self, fg_color="transparent")
+            f.pack(fill="x", padx=20, pady=4)
+            ctk.CTkLabel(f, text=label, width=110, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
+            return f
+
+        def entry(parent_frame, value, width=60):
+            e = ctk.CTkEntry(parent_frame, width=width, fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+            e.insert(0, value)
+            e.pack(side="left", padx=(0, 5))
+            return e
+
+        self.backend_var = ctk.StringVar(value="onnx")
+        ctk.CTkOptionMenu(row("Backend:"), variable=self.backend_var, values=list(PREANNOTATE_BACKENDS), width=140,
+                          fg_color=PS_GRAY_LIGHT, button_color=PS_GRAY_LIGHTER, button_hover_color=PS_ACTIVE,
+                          dropdown_fg_color=PS_GRAY_MED, text_color=PS_TEXT_COLOR, corner_radius=2).pack(side="left")
+
+        f = row("Model / callable:")
+        self.entry_target = entry(f, "", 190)
+        ctk.CTkButton(f, text="...", width=30, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.choose_model).pack(side="left")
+        ctk.CTkLabel(self, text="ONNX: model file.  Python: package.module:function", text_color="gray").pack(padx=20, anchor="w")
+
+        self.entry_score = entry(row("Min confidence:"), f"{parent.preannotate_min_score:g}")
+        self.entry_workers = entry(row("Workers:"), str(min(4, os.cpu_count() or 1)))
+        self.entry_lookahead = entry(row("Look-ahead:"), "16")
+
+        self.lbl_status = ctk.CTkLabel(self, text="", text_color="gray", wraplength=360, justify="left")
+        self.lbl_status.pack(pady=10, padx=20)
+
+        self.btn_start = ctk.CTkButton(self, text="Start", fg_color=PS_ACTIVE, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_start)
+        self.btn_start.pack(pady=(10, 5), fill="x", padx=20)
+        ctk.CTkButton(self, text="Stop", fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_stop).pack(pady=5, fill="x", padx=20)
+
+        self.poll_status()
+
+    def choose_model(self):
+        path = filedialog.askopenfilename(parent=self, title="Select ONNX Model", filetypes=[("ONNX", "*.onnx"), ("All files", "*.*")])
+        if path:
+            self.backend_var.set("onnx")
+            self.entry_target.delete(0, tk.END); self.entry_target.insert(0, path)
+
+    def on_start(self):
+        p = self.parent
+        if not p.dataset.image_dir or not p.dataset.image_list:
+            messagebox.showinfo("Info", "Open a directory first.", parent=self)
+            return
+        backend, target = self.backend_var.get(), self.entry_target.get().strip()
+        if backend != "stub" and not target:
+            messagebox.showerror("Error", "Choose a model file or enter module:function.", parent=self)
+            return
+        try:
+            min_score = float(self.entry_score.get())
+            workers = int(self.entry_workers.get())
+            lookahead = int(self.entry_lookahead.get())
+        except ValueError:
+            messagebox.showerror("Error", "Confidence, workers and look-ahead must be numbers.", parent=self)
+            return
+        spec = backend if backend == "stub" else f"{backend}:{target}"
+        try:
+            p.start_preannotation(spec, workers, lookahead, min_score)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not start the detector.\n\n{e}", parent=self)
+
+    def on_stop(self):
+        self.parent.stop_preannotation()
+
+    def poll_status(self):
+        if not self.winfo_exists(): return
+        pa = self.parent.preannotator
+        if pa is None:
+            self.lbl_status.configure(text="Not running.")
+        else:
+            r = pa.report()
+            text = f"Running {r['backend']} on {r['workers']} worker(s): {pa.pending()} queued, {r['cached']} images cached."
+            if r["stopped"]: text = f"Stopped: {r['stopped']}. {r['cached']} images cached."
+            if r["images"]:
+                text += (f"\n{r['images']} images in {r['wall_seconds']}s = {r['images_per_second']} img/s"
+                         f" (mean {r['mean_ms']} ms, p95 {r['p95_ms']} ms, {r['errors']} errors)")
+            self.lbl_status.configure(text=text)
+        self.after(500, self.poll_status)
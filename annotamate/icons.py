@@ -0,0 +1,167 @@
+import os
+import tkinter as tk
+
+from .core.project import load_json, save_json, user_cache_dir
+
+# --- ICON GENERATOR (Using tkfontawesome) ---
+FA_MAP = {
+    "folder": "folder-open",
+    "tag": "tag",
+    "save": "save",
+    "trash": "trash-alt",
+    "prev": "chevron-left",
+    "next": "chevron-right",
+    "eye": "eye",
+    "eye_hide": "eye-slash",
+    "sun": "sun",
+    "moon": "moon",
+    "bars": "bars",         # Hamburger menu
+    "minus": "minus",       # Minimize
+    "close": "times"        # Close/Remove
+}
+
+
+def hex_color(color):
+    return "#%02x%02x%02x" % color
+
+
+class IconFactory:
+    @staticmethod
+    def create_icon(name, size=(20, 20), color=(220, 220, 220)):
+        fa_name = FA_MAP.get(name, "question-circle")
+        try:
+            # Imported here: the SVG renderer is only needed when the atlas misses
+            import tkfontawesome  # pip install tkfontawesome
+            # Generate PhotoImage using tkfontawesome
+            return tkfontawesome.icon_to_image(fa_name, fill=hex_color(color), scale_to_width=size[0])
+        except Exception:
+            # Fallback (Just a blank transparent image if FA fails)
+            return None
+
+
+# --- ICON SETS ---
+# Light Mode -> Dark Icons, Dark Mode -> Light Icons
+THEME_COLORS = {
+    "Light": {"fg": (50, 50, 50), "red": (200, 40, 40), "dim": (150, 150, 150)},
+    "Dark": {"fg": (220, 220, 220), "red": (255, 100, 100), "dim": (100, 100, 100)},
+}
+
+
+def icon_specs(theme):
+    # key -> (icon name, size, colour); keys are what the UI asks for
+    c = THEME_COLORS[theme]
+    s = (18, 18)
+    return {
+        "folder": ("folder", s, c["fg"]),
+        "tag": ("tag", s, c["fg"]),
+        "save": ("save", s, c["fg"]),
+        "del": ("trash", s, c["red"]),
+        "prev": ("prev", s, c["fg"]),
+        "next": ("next", s, c["fg"]),
+        "theme": ("moon" if theme == "Light" else "sun", s, c["fg"]),
+        "bars": ("bars", s, c["fg"]),
+        "min": ("minus", (12, 12), c["fg"]),
+        "close": ("close", (12, 12), c["fg"]),
+        "vis_on": ("eye", (16, 16), c["fg"]),
+        # Hidden eye slightly dimmer
+        "vis_off": ("eye_hide", (16, 16), c["dim"]),
+    }
+
+
+def library_version():
+    try:
+        from importlib.metadata import version
+        return version("tkfontawesome")
+    except Exception:
+        return "unknown"
+
+
+# --- ATLAS ---
+ATLAS_VERSION = 1
+
+
+class IconAtlas:
+    """Rasterized icons kept in one PNG strip in the user cache dir.
+
+    Entries are keyed by icon, size, colour and tkfontawesome version, so a
+    library upgrade or a palette change simply misses and re-renders. On a
+    hit nothing touches the SVG renderer: the strip is decoded once and each
+    icon is a region copy out of it.
+    """
+
+    def __init__(self, master, cache_dir=None):
+        self.master = master
+        self.cache_dir = cache_dir or user_cache_dir()
+        self.png_path = os.path.join(self.cache_dir, "icon_atlas.png")
+        self.index_path = os.path.join(self.cache_dir, "icon_atlas.json")
+        self.lib = library_version()
+
+    def key(self, name, size, color):
+        return f"{name}|{size[0]}x{size[1]}|{hex_color(color)}|{self.lib}"
+
+    def _crop(self, strip, rect):
+        x, y, w, h = rect
+        img = tk.PhotoImage(master=self.master, width=w, height=h)
+        img.tk.call(img, "copy", strip, "-from", x, y, x + w, y + h, "-to", 0, 0)
+        return img
+
+    def _load(self):
+        index = load_json(self.index_path, {})
+        if index.get("version") != ATLAS_VERSION or not os.path.exists(self.png_path): return {}
+        try:
+            strip = tk.PhotoImage(master=self.master, file=self.png_path)
+        except tk.TclError:
+            return {}
+        # Keep every cached entry (not just the wanted ones) so a rebuild preserves them
+        return {k: self._crop(strip, r) for k, r in index.get("icons", {}).items()}
+
+    def _save(self, images):
+        # Lay the icons out left to right in one strip
+        keys = sorted(images)
+        width = sum(images[k].width() for k in keys)
+        height = max(images[k].height() for k in keys)
+        strip = tk.PhotoImage(master=self.master, width=width, height=height)
+        rects, x = {}, 0
+        for k in keys:
+            img = images[k]
+            strip.tk.call(strip, "copy", img, "-to", x, 0)
+            rects[k] = [x, 0, img.width(), img.height()]
+            x += img.width()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self.png_path + ".tmp"
+        strip.write(tmp, format="png")
+        os.replace(tmp, self.png_path)
+        save_json(self.index_path, {"version": ATLAS_VERSION, "lib": self.lib, "icons": rects})
+
+    def icon_sets(self, themes=("Light", "Dark")):
+        """-> {theme: {key: PhotoImage}} for every theme, rendering only misses."""
+        specs = {t: icon_specs(t) for t in themes}
+        try:
+            images = self._load()
+        except Exception as e:
+            print(f"Icon cache unreadable, re-rendering: {e}")
+            images = {}
+
+        # Entries for other library versions are dead weight; drop them on rebuild
+        images = {k: v for k, v in images.items() if k.endswith("|" + self.lib)}
+        rendered = 0
+        for t in themes:
+            for name, size, color in specs[t].values():
+                k = self.key(name, size, color)
+                if k in images: continue
+                img = IconFactory.create_icon(name, size=size, color=color)
+                if img is None: continue # Not cached, so a later run can retry
+                images[k] = img
+                rendered += 1
+
+        if rendered:
+            try: self._save(images)
+            except Exception as e: print(f"Could not write icon cache: {e}")
+
+        out = {}
+        for t in themes:
+            out[t] = {}
+            for key, (name, size, color) in specs[t].items():
+                img = images.get(self.key(name, size, color))
+                out[t][key] = img if img is not None else tk.PhotoImage(master=self.master, width=size[0], height=size[1])
+        return out
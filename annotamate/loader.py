@@ -0,0 +1,108 @@
+import io
+import queue
+import threading
+
+from PIL import Image
+
+from .core.archive import open_image
+from .core.remote import is_remote, fetch_image
+from .perf import tracer
+
+# Job kinds
+PREVIEW = "preview" # Cheap, low-res frame while the user is still moving
+FULL = "full"       # Full decode + labels for the image the user stopped on
+
+
+def decode_full(path):
+    im = open_image(path)
+    im.load() # Decode now, on the worker, and release the file handle
+    return im
+
+
+def decode_preview(path, size):
+    # JPEG draft mode decodes at 1/2..1/8 scale for almost free; any other
+    # format would need a full decode, which is what we are avoiding
+    if is_remote(path): # The server scales (and caches) for us
+        with Image.open(io.BytesIO(fetch_image(path, max(size)))) as im: return im.convert("RGB")
+    with open_image(path) as im:
+        if im.format != "JPEG": return None
+        im.draft("RGB", size)
+        im = im.convert("RGB")
+    im.thumbnail(size, Image.Resampling.BILINEAR)
+    return im
+
+
+# --- ASYNC IMAGE LOADER ---
+class ImageLoader:
+    """One background worker for image loads where the newest request wins.
+
+    `request()` bumps the generation and replaces whatever is still pending,
+    so a held navigation key never builds a queue. A job that is already
+    running checks its generation between stages and is dropped once
+    superseded; only results for the current generation reach `results`.
+    """
+
+    def __init__(self, decode=decode_full, preview=decode_preview, release=Image.Image.close):
+        self.decode = decode
+        self.preview = preview
+        self.release = release # Disposes of full decodes nobody will see
+        self.results = queue.Queue() # (generation, path, kind, payload or Exception)
+        self.generation = 0
+        self._pending = None
+        self._running = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="image-loader", daemon=True)
+        self._thread.start()
+
+    def request(self, path, kind=FULL, size=None, labels=None):
+        """Queue a load; `labels(size)` runs on the worker after a FULL decode."""
+        with self._cond:
+            self.generation += 1
+            self._pending = (self.generation, path, kind, size, labels)
+            self._cond.notify()
+            return self.generation
+
+    def cancel(self):
+        with self._cond:
+            self.generation += 1
+            self._pending = None
+
+    def idle(self):
+        with self._cond:
+            return self._pending is None and not self._running and self.results.empty()
+
+    def is_current(self, gen):
+        return gen == self.generation
+
+    def poll(self):
+        # Drain finished jobs, keeping only ones that are still wanted
+        out = []
+        while True:
+            try: r = self.results.get_nowait()
+            except queue.Empty: return out
+            if self.is_current(r[0]): out.append(r)
+            elif r[2] == FULL and isinstance(r[3], tuple): self.release(r[3][0])
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None: self._cond.wait()
+                job, self._pending = self._pending, None
+                self._running = True
+            gen, path, kind, size, labels = job
+            try:
+                payload = self._load(gen, path, kind, size, labels)
+            except Exception as e:
+                payload = e
+            with self._cond:
+                if self.is_current(gen): self.results.put((gen, path, kind, payload))
+                self._running = False
+
+    def _load(self, gen, path, kind, size, labels):
+        if kind == PREVIEW:
+            with tracer.span("loader.preview"): return self.preview(path, size)
+        with tracer.span("loader.decode"): im = self.decode(path)
+        if not self.is_current(gen):
+            self.release(im); return None
+        if not labels: return im, None
+        with tracer.span("loader.labels"): return im, labels(im.size)
@@ -1,18 +1,38 @@
+import time
+_IMPORT_START = time.perf_counter() # For --profile-startup
+
 import customtkinter as ctk
 import tkinter as tk
-from tkinter import filedialog, messagebox, simpledialog
-from PIL import Image, ImageTk, ImageDraw
+from tkinter import filedialog, messagebox
+from PIL import Image
 import os
-import glob
 import sys
 import subprocess
-import shutil
-import json
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
-import tkfontawesome  # pip install tkfontawesome
 import warnings
 
+from .core import archive, codecs, Dataset, BoxStore, make_box
+from .core.classes import DEFAULT_CLASSES, ClassRegistry
+from .core.history import UndoHistory
+from .core.journal import EditJournal
+from .icons import IconAtlas
+from .loader import ImageLoader, PREVIEW, FULL
+from .decode import DecodeService
+from .perf import tracer, traced
+from .resources import ResourceGovernor, WidgetPool
+from .theme import PS_GRAY_DARK, PS_GRAY_MED, PS_GRAY_LIGHT, PS_GRAY_LIGHTER, PS_TEXT_COLOR, PS_BORDER_COLOR, PS_ACTIVE
+# Dialogs and the dataset tools (stats, validate, dedup, split, rename) are
+# imported where they are first used, keeping them off the startup path
+
+_IMPORTS_DONE = time.perf_counter()
+
+NAV_SETTLE_MS = 120 # Longer than the key-repeat interval: full load starts once D/A is released
+LOADER_POLL_MS = 15
+SIDEBAR_POOL_KEEP = 200 # Idle object rows kept for reuse; more are destroyed
+HEARTBEAT_MS = 60_000 # Lease renewal in shared mode; well inside the 5 minute lease
+OVERLAY_FONT = ("Consolas", 10)
+PICKER_PREBUILD_MS = 1500
+JOURNAL_CHECK_MS = 3000 # How often edits the journal could not write are looked for
+
 # --- Suppress CTkImage Warning for TkFontAwesome ---
 warnings.filterwarnings("ignore", message=".*CTkButton Warning: Given image is not CTkImage.*")
 
@@ -20,49 +40,6 @@ warnings.filterwarnings("ignore", message=".*CTkButton Warning: Given image is n
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("dark-blue") 
 
-# --- THEME CONSTANTS (Light, Dark) ---
-# We define colors as tuples: (Light Mode Color, Dark Mode Color)
-PS_GRAY_DARK = ("#e0e0e0", "#262626")   # Main Background / Canvas Area
-PS_GRAY_MED = ("#f0f0f0", "#383838")    # Panels / Sidebar
-PS_GRAY_LIGHT = ("#ffffff", "#535353")  # Buttons / Inputs
-PS_GRAY_LIGHTER = ("#d0d0d0", "#6b6b6b") # Hover state / Active
-PS_TEXT_COLOR = ("#1a1a1a", "#f0f0f0")  # Text
-PS_BORDER_COLOR = ("#cccccc", "#1a1a1a")
-PS_ACTIVE = ("#aaaaaa", "#6b6b6b")      # Active/Accent
-
-# --- ICON GENERATOR (Using tkfontawesome) ---
-class IconFactory:
-    @staticmethod
-    def create_icon(name, size=(20, 20), color=(220, 220, 220)):
-        # Convert RGB tuple to Hex string for tkfontawesome
-        hex_color = "#%02x%02x%02x" % color
-        
-        fa_map = {
-            "folder": "folder-open",
-            "tag": "tag",
-            "save": "save",
-            "trash": "trash-alt",
-            "prev": "chevron-left",
-            "next": "chevron-right",
-            "eye": "eye",
-            "eye_hide": "eye-slash",
-            "sun": "sun",
-            "moon": "moon",
-            "bars": "bars",         # Hamburger menu
-            "minus": "minus",       # Minimize
-            "close": "times"        # Close/Remove
-        }
-        
-        fa_name = fa_map.get(name, "question-circle")
-        
-        try:
-            # Generate PhotoImage using tkfontawesome
-            icon = tkfontawesome.icon_to_image(fa_name, fill=hex_color, scale_to_width=size[0])
-            return icon
-        except Exception as e:
-            # Fallback (Just a blank transparent image if FA fails)
-            return tk.PhotoImage(width=size[0], height=size[1])
-
 # --- CLASS MANAGER DIALOG (Unified) ---
 class ClassManagerDialog(ctk.CTkToplevel):
     def __init__(self, parent, selection_mode=False):
@@ -107,8 +84,8 @@ class ClassManagerDialog(ctk.CTkToplevel):
         self.scroll_classes = ctk.CTkScrollableFrame(self, label_text="Available Classes", label_text_color=PS_TEXT_COLOR, fg_color=PS_GRAY_DARK)
         self.scroll_classes.pack(fill="both", expand=True, padx=10, pady=5)
         
-        # Entry for New Class
-        self.entry_class = ctk.CTkEntry(self, placeholder_text="New Class Name...", fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+        # Entry for New Class (or an alias / parent for the selected one)
+        self.entry_class = ctk.CTkEntry(self, placeholder_text="Class Name...", fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
         self.entry_class.pack(fill="x", padx=10, pady=(10, 5))
         self.entry_class.bind("<Return>", lambda e: self.on_add())
 
@@ -120,6 +97,14 @@ class ClassManagerDialog(ctk.CTkToplevel):
         ctk.CTkButton(btn_frame, text="Add", width=60, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_add).pack(side="left", padx=5)
         ctk.CTkButton(btn_frame, text="Delete", width=60, fg_color=PS_GRAY_LIGHT, hover_color="#C0392B", text_color=PS_TEXT_COLOR, command=self.on_delete).pack(side="left", padx=5)
 
+        # Selected class: the typed name becomes an alias of it, or its parent class
+        meta_frame = ctk.CTkFrame(self, fg_color="transparent")
+        meta_frame.pack(fill="x", padx=10, pady=(0, 5), before=btn_frame)
+        ctk.CTkButton(meta_frame, text="Add Alias", width=90, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR,
+                      command=lambda: self.on_meta(self.parent.add_class_alias)).pack(side="left", padx=5)
+        ctk.CTkButton(meta_frame, text="Set Parent", width=90, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR,
+                      command=lambda: self.on_meta(self.parent.set_class_parent)).pack(side="left", padx=5)
+
         # Confirm/Close Button
         btn_text = "Confirm (S)" if selection_mode else "Close (S)"
         btn_color = PS_ACTIVE if selection_mode else PS_GRAY_LIGHT
@@ -146,9 +131,15 @@ class ClassManagerDialog(ctk.CTkToplevel):
         for w in self.scroll_classes.winfo_children(): w.destroy()
         
         current_val = self.parent.selected_class_var.get()
+        classes = self.parent.classes
+        aliases = {}
+        for alias, name in classes.aliases.items(): aliases.setdefault(name, []).append(alias)
 
-        for idx, cls in enumerate(self.parent.classes):
+        for idx in classes.active(): # Deleted classes keep their ID but are not listed
+            cls = classes[idx]
             str_idx = str(idx)
+            extra = [f"in {classes.parents[cls]}"] if cls in classes.parents else []
+            if cls in aliases: extra.append("aka " + ", ".join(aliases[cls]))
             
             # Row container
             row = ctk.CTkFrame(self.scroll_classes, fg_color="transparent", corner_radius=0)
@@ -162,7 +153,7 @@ class ClassManagerDialog(ctk.CTkToplevel):
             # Radio Button (Directly modifies parent variable)
             rb = ctk.CTkRadioButton(
                 row, 
-                text=f"{idx}: {cls}", 
+                text=f"{idx}: {cls}" + (f"  ({'; '.join(extra)})" if extra else ""), 
                 variable=self.parent.selected_class_var, 
                 value=str_idx,
                 text_color=PS_TEXT_COLOR,
@@ -186,6 +177,11 @@ class ClassManagerDialog(ctk.CTkToplevel):
         self.parent.delete_class()
         self.refresh_list()
 
+    def on_meta(self, apply):
+        apply(self.entry_class.get().strip())
+        self.entry_class.delete(0, tk.END)
+        self.refresh_list()
+
     def _is_typing(self):
         # Check if focus is on an entry widget to prevent accidental shortcuts
         focused = self.focus_get()
@@ -214,7 +210,9 @@ class ClassManagerDialog(ctk.CTkToplevel):
             curr = int(self.parent.selected_class_var.get())
         except: curr = 0
         
-        new_idx = (curr - 1) if curr > 0 else (len(self.parent.classes) - 1)
+        active = self.parent.classes.active()
+        if not active: return
+        new_idx = max((c for c in active if c < curr), default=active[-1])
         self.parent.selected_class_var.set(str(new_idx))
         self.refresh_list()
 
@@ -226,200 +224,18 @@ class ClassManagerDialog(ctk.CTkToplevel):
             curr = int(self.parent.selected_class_var.get())
         except: curr = 0
         
-        new_idx = (curr + 1) % len(self.parent.classes)
+        active = self.parent.classes.active()
+        if not active: return
+        new_idx = min((c for c in active if c > curr), default=active[0])
         self.parent.selected_class_var.set(str(new_idx))
         self.refresh_list()
 
-# --- BATCH RENAME DIALOG ---
-class BatchRenameDialog(ctk.CTkToplevel):
-    def __init__(self, parent, callback):
-        super().__init__(parent)
-        self.title("Batch Rename")
-        self.geometry("320x350")
-        self.resizable(False, False)
-        self.callback = callback
-        self.transient(parent)
-        self.configure(fg_color=PS_GRAY_MED)
-        self.grab_set()
-        
-        if hasattr(parent, 'icon_path') and parent.icon_path:
-            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
-            except: pass
-        
-        ctk.CTkLabel(self, text="Batch Rename Settings", font=("Arial", 16, "bold"), text_color=PS_TEXT_COLOR).pack(pady=15)
-        
-        # Base Name
-        self.frame1 = ctk.CTkFrame(self, fg_color="transparent")
-        self.frame1.pack(fill="x", padx=20, pady=5)
-        ctk.CTkLabel(self.frame1, text="Base Name:", width=80, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
-        self.entry_base = ctk.CTkEntry(self.frame1, placeholder_text="e.g. apple", fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
-        self.entry_base.pack(side="left", fill="x", expand=True)
-        
-        # Start Number
-        self.frame2 = ctk.CTkFrame(self, fg_color="transparent")
-        self.frame2.pack(fill="x", padx=20, pady=5)
-        ctk.CTkLabel(self.frame2, text="Start #:", width=80, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
-        self.entry_start = ctk.CTkEntry(self.frame2, fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
-        self.entry_start.insert(0, "1")
-        self.entry_start.pack(side="left", fill="x", expand=True)
-        
-        # Digits
-        self.frame3 = ctk.CTkFrame(self, fg_color="transparent")
-        self.frame3.pack(fill="x", padx=20, pady=5)
-        ctk.CTkLabel(self.frame3, text="Digits:", width=80, anchor="w", text_color=PS_TEXT_COLOR).pack(side="left")
-        self.entry_digits = ctk.CTkEntry(self.frame3, fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
-        self.entry_digits.insert(0, "4")
-        self.entry_digits.pack(side="left", fill="x", expand=True)
-        
-        # Preview
-        self.lbl_preview = ctk.CTkLabel(self, text="Preview: apple_0001.jpg", text_color="gray")
-        self.lbl_preview.pack(pady=10)
-        
-        # Bind updates for preview
-        self.entry_base.bind("<KeyRelease>", self.update_preview)
-        self.entry_start.bind("<KeyRelease>", self.update_preview)
-        self.entry_digits.bind("<KeyRelease>", self.update_preview)
-
-        ctk.CTkButton(self, text="Rename All", fg_color=PS_ACTIVE, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR, command=self.on_confirm).pack(pady=15, fill="x", padx=20)
-
-        self.center_window()
-        self.focus_force()
-
-    def center_window(self):
-        self.update_idletasks()
-        try:
-            x = self.master.winfo_x() + (self.master.winfo_width() // 2) - 160
-            y = self.master.winfo_y() + (self.master.winfo_height() // 2) - 175
-            self.geometry(f"+{x}+{y}")
-        except: pass
-
-    def update_preview(self, event=None):
-        base = self.entry_base.get().strip()
-        try: start = int(self.entry_start.get())
-        except: start = 1
-        try: digits = int(self.entry_digits.get())
-        except: digits = 4
-        
-        example = f"{base}_{str(start).zfill(digits)}.jpg"
-        self.lbl_preview.configure(text=f"Preview: {example}")
-
-    def on_confirm(self):
-        base = self.entry_base.get().strip()
-        if not base:
-            messagebox.showerror("Error", "Base name cannot be empty.")
-            return
-            
-        try:
-            start = int(self.entry_start.get())
-            digits = int(self.entry_digits.get())
-        except ValueError:
-            messagebox.showerror("Error", "Start and Digits must be numbers.")
-            return
-            
-        self.callback(base, start, digits)
-        self.destroy()
-
-# --- USAGE GUIDE DIALOG ---
-class UsageGuideDialog(ctk.CTkToplevel):
-    def __init__(self, parent):
-        super().__init__(parent)
-        self.title("How to Use")
-        self.geometry("500x600")
-        self.resizable(False, True)
-        self.transient(parent)
-        self.configure(fg_color=PS_GRAY_MED)
-        self.grab_set()
-
-        if hasattr(parent, 'icon_path') and parent.icon_path:
-            try: self.after(200, lambda: self.iconbitmap(parent.icon_path))
-            except: pass
-
-        # Title
-        ctk.CTkLabel(self, text="User Guide & Shortcuts", font=("Arial", 20, "bold"), text_color=PS_TEXT_COLOR).pack(pady=15)
-
-        # Scrollable Content
-        scroll_frame = ctk.CTkScrollableFrame(self, label_text="Instructions", label_text_color=PS_TEXT_COLOR, fg_color=PS_GRAY_DARK)
-        scroll_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
-
-        # Instructions Text
-        instructions = (
-            "1. Setup:\n"
-            "   - Click 'Open Directory' to load images.\n"
-            "   - (Optional) 'Set Label Directory' if different from images.\n\n"
-            "2. Classes:\n"
-            "   - Click 'Classes' in the top bar to Manage/Select active class.\n"
-            "   - The Sidebar shows objects drawn on the CURRENT image.\n\n"
-            "3. Drawing:\n"
-            "   - Press 'W' to activate Rect Tool.\n"
-            "   - Click and drag to draw a box.\n"
-            "   - Mode automatically switches to Edit after drawing.\n\n"
-            "4. Editing:\n"
-            "   - Edit Mode (X) allows moving/resizing.\n"
-            "   - Press 'X' again with a box selected to change its class.\n"
-            "   - Drag center to move, drag corners to resize.\n\n"
-            "5. Saving:\n"
-            "   - Select Format (YOLO/VOC/COCO) in toolbar.\n"
-            "   - Press Ctrl+S to save."
-        )
-
-        lbl_instr = ctk.CTkLabel(
-            scroll_frame, 
-            text=instructions, 
-            justify="left", 
-            anchor="w",
-            font=("Arial", 12),
-            text_color="#cccccc",
-            wraplength=420
-        )
-        lbl_instr.pack(fill="x", padx=10, pady=10)
-
-        # Shortcuts Section
-        ctk.CTkLabel(scroll_frame, text="Keyboard Shortcuts", font=("Arial", 14, "bold"), text_color=PS_TEXT_COLOR).pack(pady=(15, 5), anchor="w", padx=10)
-
-        shortcuts = [
-            ("A", "Previous Image"),
-            ("D", "Next Image"),
-            ("W", "Draw Rectangle"),
-            ("X", "Edit Mode / Change Class"),
-            ("Ctrl + S", "Save Annotation"),
-            ("F", "Fit Image to Screen"),
-            ("Ctrl + Z", "Undo Last Action"),
-            ("Ctrl + Y", "Redo Action"),
-            ("Ctrl + Scroll", "Zoom In/Out"),
-            ("Right Click", "Undo Box"),
-            ("Scroll", "Vertical Pan"),
-            ("Shift + Scroll", "Horizontal Pan")
-        ]
-
-        # Grid for shortcuts
-        sc_container = ctk.CTkFrame(scroll_frame, fg_color="transparent")
-        sc_container.pack(fill="x", padx=10, pady=5)
-
-        for i, (key, desc) in enumerate(shortcuts):
-            k_lbl = ctk.CTkLabel(sc_container, text=key, font=("Courier", 12, "bold"), text_color=PS_ACTIVE, anchor="w")
-            k_lbl.grid(row=i, column=0, sticky="w", pady=2, padx=(0, 20))
-            
-            d_lbl = ctk.CTkLabel(sc_container, text=desc, font=("Arial", 12), text_color="#cccccc", anchor="w")
-            d_lbl.grid(row=i, column=1, sticky="w", pady=2)
-
-        # Close Button
-        ctk.CTkButton(self, text="Close", command=self.destroy, fg_color=PS_GRAY_LIGHT, hover_color=PS_GRAY_LIGHTER, text_color=PS_TEXT_COLOR).pack(pady=15)
-
-        self.center_window()
-        self.focus_force()
-
-    def center_window(self):
-        self.update_idletasks()
-        try:
-            x = self.master.winfo_x() + (self.master.winfo_width() // 2) - 250
-            y = self.master.winfo_y() + (self.master.winfo_height() // 2) - 300
-            self.geometry(f"+{x}+{y}")
-        except: pass
-
 # --- MAIN APP ---
 class UltimateAnnotator(ctk.CTk):
-    def __init__(self):
+    def __init__(self, image_dir=None, label_dir=None, fmt=None, profile=None, shared=False):
+        self.profile = profile # StartupProfile when run with --profile-startup
         super().__init__()
+        self.mark_startup("window")
         self.title("Annotamate Pro")
         
         try: self.after(0, lambda: self.state('zoomed'))
@@ -431,29 +247,28 @@ class UltimateAnnotator(ctk.CTk):
         self.icon_path = None
 
         # --- Data ---
-        self.image_list = []
+        # Folder, label dir, format and label I/O live in the headless core
+        self.dataset = Dataset()
         self.filtered_indices = [] # Maps listbox index -> real index in image_list
-        self.annot_cache = {} # Caches annotation existence: path -> bool
+        self.skipped_images = set() # Paths A/D navigation steps over (e.g. duplicates)
         
-        self.current_dir = None    
-        self.label_dir = None      
         self.current_index = 0
-        self.classes = ["person", "car", "bicycle", "dog"] 
+        self.classes = ClassRegistry(DEFAULT_CLASSES) # Names by stable ID, with the name index and colours
         self.selected_class_var = tk.StringVar(value="0") 
         self.theme_mode = "Dark" # Track current theme
         self.nav_buttons = [] # Store buttons to update icons
+        self.vis_buttons = [] # Sidebar eye buttons: (button, visible)
         
         # Panel Visibility State - START MAXIMIZED
         self.objects_visible = True
         self.files_visible = True
         
-        # Fixed Colors for Classes
-        self.COLORS = ["#e74c3c", "#3498db", "#f1c40f", "#9b59b6", "#2ecc71", 
-                       "#1abc9c", "#34495e", "#d35400", "#7f8c8d", "#c0392b"]
-        
-        self.bboxes = []       
-        self.redo_stack = []   
-        self.box_images = [] # Cache for Transparent PIL images
+        self.store = BoxStore() # Boxes of the current image + edit operations
+        self.store.listener = self.journal_op
+        self.undo_history = UndoHistory() # Undo steps per image, kept when you come back to it
+        self.journal = None # Edits of the open folder as they happen: crash recovery and background autosave
+        self.journal_job = None
+        self.resources = ResourceGovernor(self) # Tk images and sidebar rows, reused across images
         
         self.auto_save_var = ctk.BooleanVar(value=False)
         self.show_all_var = ctk.BooleanVar(value=True) # For visibility toggle
@@ -461,6 +276,7 @@ class UltimateAnnotator(ctk.CTk):
         self.use_default_class_var = ctk.BooleanVar(value=False) # Use selected class as default
         self.draw_mode_var = ctk.StringVar(value="Edit") 
         self.format_var = ctk.StringVar(value="YOLO") # Export format
+        self.format_var.trace_add("write", lambda *_: self.dataset.set_format(self.format_var.get()))
         
         self.drawing = False
         self.start_x, self.start_y = 0, 0
@@ -471,11 +287,34 @@ class UltimateAnnotator(ctk.CTk):
         self.img_ox = 0 
         self.img_oy = 0
         self.is_processing = False 
-        self.selected_box_idx = None
+        self.selected_box_idx = None # The one selected box, with resize handles
+        self.selection = set() # Two or more selected boxes (then selected_box_idx is None)
+        self.band_adds = False # Shift held when the rubber band started: add to the selection
         self.drag_action = None
         self.has_unsaved_changes = False 
+        self.decoder = DecodeService() # Large images decode in worker processes
+        self.loader = ImageLoader(decode=self.decoder.decode, release=self.decoder.release) # Off the Tk thread; newest request wins
+        self.loader_polling = False
+        self.settle_job = None # Pending full load after key-repeat navigation
+        
+        self.preannotator = None # Model proposals, started from Tools > Pre-annotate
+        self.preannotate_min_score = 0.25
+        self.proposals_applied = None # Image whose proposals were already loaded
+        self.propagate_var = tk.BooleanVar(value=False) # Edit > Propagate Boxes to Next Frame
+        self.propagator = None # Built on first use (needs numpy)
+        self.propagate_target = None # Image expecting boxes tracked from the previous frame
+        self.shared_var = tk.BooleanVar(value=shared) # File > Shared Work Queue
+        self.work_queue = None # Our lease on a chunk of a shared folder
+        self.shard_job = None # Pending lease heartbeat
+        self.shard_skips = set() # skipped_images from before joining, restored on leave
+        self.perf_overlay_var = tk.BooleanVar(value=False) # Tools > Performance Overlay
+        self.perf_record_var = tk.BooleanVar(value=tracer.recording) # Tools > Record Performance Trace
+        self.overlay_job = None
+        self.switch_started = None # perf_counter_ns of the last image request, for the switch latency
         
         self.class_manager_window = None
+        self.class_picker = None # Resident class picker; built once the window is idle
+        self.stats_engine = None # Built lazily by get_stats_engine
 
         self.branding_img = None
         self.lbl_zoom = None
@@ -483,15 +322,74 @@ class UltimateAnnotator(ctk.CTk):
         
         # --- Init UI ---
         self.configure(fg_color=PS_GRAY_DARK) # Main Window BG
+        if fmt: self.format_var.set(fmt)
         self.load_assets()
+        self.mark_startup("assets")
         self.generate_icons()
+        self.mark_startup("icons")
         self._setup_menu()
         self._setup_ui()
         self._setup_footer()
         self._bind_shortcuts()
+        self.mark_startup("ui")
         
-        # Auto-Start
-        self.after(200, self.load_directory)
+        # Auto-Start: straight to the first image when a directory was given,
+        # otherwise ask for one once the window is up
+        if image_dir: self.after_idle(lambda: self.open_directory(image_dir, label_dir))
+        else:
+            if self.profile: self.after_idle(self.finish_startup_profile)
+            self.after(200, self.load_directory)
+        self.after(PICKER_PREBUILD_MS, self.build_class_picker) # Ready before the first box, off the startup path
+
+    # --- Startup Profiling ---
+    def mark_startup(self, name):
+        if self.profile and not self.profile.done: self.profile.mark(name)
+
+    def finish_startup_profile(self):
+        if not self.profile or self.profile.done: return
+        self.update_idletasks() # Let Tk lay out and paint what is pending
+        self.mark_startup("first paint")
+        self.profile.report()
+
+    # --- Performance Instrumentation (see perf.py) ---
+    def on_perf_toggle(self):
+        recording = self.perf_record_var.get()
+        if recording and not tracer.recording: tracer.reset() # A fresh trace per recording
+        tracer.recording = recording
+        tracer.enabled = recording or self.perf_overlay_var.get()
+        if self.perf_overlay_var.get(): self.draw_perf_overlay()
+        else: self.canvas.delete("perf_overlay")
+
+    def draw_perf_overlay(self):
+        self.overlay_job = None
+        self.canvas.delete("perf_overlay")
+        if not self.perf_overlay_var.get(): return
+        def ms(name):
+            v = tracer.last_ms(name)
+            return f"{v:7.1f} ms" if v is not None else "      -   "
+        hits = tracer.hit_rate("decode.prefetch_hit", "decode.prefetch_miss")
+        lines = [f"frame  {ms('ui.render_image')}   boxes   {ms('ui.redraw_boxes')}",
+                 f"decode {ms('loader.decode')}   switch  {ms('ui.image_switch')}",
+                 f"sidebar{ms('ui.update_sidebar_objects')}   {len(self.store.boxes)} boxes, "
+                 f"prefetch hits {'-' if hits is None else f'{hits:.0%}'}"]
+        # Pinned to the visible corner, whatever the scroll position
+        x, y = self.canvas.canvasx(0) + 8, self.canvas.canvasy(0) + 8
+        t_id = self.canvas.create_text(x, y, text="\n".join(lines), fill="#9f9", anchor="nw", font=OVERLAY_FONT, tags="perf_overlay")
+        bbox = self.canvas.bbox(t_id)
+        if bbox:
+            r_id = self.canvas.create_rectangle(bbox[0] - 4, bbox[1] - 3, bbox[2] + 4, bbox[3] + 3, fill="#000", outline="#444", tags="perf_overlay")
+            self.canvas.tag_lower(r_id, t_id)
+
+    def save_perf_trace(self):
+        if not tracer.events:
+            messagebox.showinfo("Performance Trace", "Nothing recorded yet. Turn on Tools > Record Performance Trace, use the editor, then save.")
+            return
+        path = filedialog.asksaveasfilename(title="Save Performance Trace", defaultextension=".json",
+                                            initialfile="annotamate-trace.json", filetypes=[("Chrome trace", "*.json")])
+        if not path: return
+        n = tracer.save_trace(path)
+        tracer.report()
+        messagebox.showinfo("Performance Trace", f"Saved {n} spans to {path}.\n\nOpen it in chrome://tracing or ui.perfetto.dev.")
 
     def load_assets(self):
         self.icon_path = os.path.join(self.assets_dir, "logo.ico")
@@ -509,42 +407,31 @@ class UltimateAnnotator(ctk.CTk):
             except: pass
 
     def generate_icons(self):
-        # Update Icon Colors based on Theme Mode
-        # Light Mode -> Dark Icons, Dark Mode -> Light Icons
-        if self.theme_mode == "Light":
-            c = (50, 50, 50)
-            c_red = (200, 40, 40)
-        else:
-            c = (220, 220, 220)
-            c_red = (255, 100, 100)
-
-        s = (18, 18) 
-        self.icon_folder = IconFactory.create_icon("folder", size=s, color=c)
-        self.icon_tag = IconFactory.create_icon("tag", size=s, color=c)
-        self.icon_save = IconFactory.create_icon("save", size=s, color=c)
-        self.icon_del = IconFactory.create_icon("trash", size=s, color=c_red) 
-        self.icon_prev = IconFactory.create_icon("prev", size=s, color=c)
-        self.icon_next = IconFactory.create_icon("next", size=s, color=c)
-        
-        self.icon_theme = IconFactory.create_icon("moon" if self.theme_mode=="Light" else "sun", size=s, color=c)
-        self.icon_bars = IconFactory.create_icon("bars", size=s, color=c)
-        self.icon_min = IconFactory.create_icon("minus", size=(12,12), color=c)
-        self.icon_close = IconFactory.create_icon("close", size=(12,12), color=c)
+        # Both theme variants come from the on-disk atlas and stay resident,
+        # so a theme toggle only swaps references
+        self.icon_sets = IconAtlas(self).icon_sets()
+        self.apply_icon_set()
+
+    def apply_icon_set(self):
+        icons = self.icon_sets[self.theme_mode]
+        self.icon_folder = icons["folder"]
+        self.icon_tag = icons["tag"]
+        self.icon_save = icons["save"]
+        self.icon_del = icons["del"]
+        self.icon_prev = icons["prev"]
+        self.icon_next = icons["next"]
+        self.icon_theme = icons["theme"]
+        self.icon_bars = icons["bars"]
+        self.icon_min = icons["min"]
+        self.icon_close = icons["close"]
         
         # --- VISIBILITY ICONS ---
-        self.icon_vis_on = IconFactory.create_icon("eye", size=(16, 16), color=c)
-        # Hidden eye slightly dimmer
-        dim_c = (150, 150, 150) if self.theme_mode == "Light" else (100, 100, 100)
-        self.icon_vis_off = IconFactory.create_icon("eye_hide", size=(16, 16), color=dim_c)
+        self.icon_vis_on = icons["vis_on"]
+        self.icon_vis_off = icons["vis_off"]
 
     # --- COLOR HASHING ---
     def get_class_color(self, class_id):
-        if 0 <= class_id < len(self.classes):
-            name = self.classes[class_id]
-            # Simple hash to keep color consistent per name
-            hash_val = sum(map(ord, name)) 
-            return self.COLORS[hash_val % len(self.COLORS)]
-        return "#999999"
+        return self.classes.color(class_id) # Precomputed per class
 
     def _setup_menu(self):
         # Determine Menu Colors based on theme (Standard TK Menu doesn't support tuples)
@@ -558,10 +445,13 @@ class UltimateAnnotator(ctk.CTk):
         menubar = tk.Menu(self, bg=bg_color, fg=fg_color, activebackground=active_bg, activeforeground="white", bd=0)
         
         file_menu = tk.Menu(menubar, tearoff=0, bg=bg_color, fg=fg_color)
-        file_menu.add_command(label="Open New Window", command=lambda: subprocess.Popen([sys.executable, __file__]))
+        file_menu.add_command(label="Open New Window", command=lambda: subprocess.Popen([sys.executable, "-m", "annotamate"]))
         file_menu.add_separator()
         file_menu.add_command(label="Open Directory...", command=self.load_directory)
+        file_menu.add_command(label="Open Archive (zip/tar)...", command=self.load_archive)
+        file_menu.add_command(label="Connect to Server...", command=self.connect_server)
         file_menu.add_command(label="Set Label Directory...", command=self.set_label_directory)
+        file_menu.add_checkbutton(label="Shared Work Queue", variable=self.shared_var, command=self.on_shared_toggle)
         file_menu.add_separator()
         file_menu.add_command(label="Save Annotation (Ctrl+S)", command=self.save_annotation)
         file_menu.add_command(label="Delete Image", command=self.delete_current_image)
@@ -573,9 +463,17 @@ class UltimateAnnotator(ctk.CTk):
         edit_menu.add_command(label="Rect Tool (W)", command=lambda: self.set_mode("Rect"))
         edit_menu.add_command(label="Edit Tool (X)", command=lambda: self.set_mode("Edit"))
         edit_menu.add_separator()
+        edit_menu.add_command(label="Select All (Ctrl+A)", command=self.select_all_boxes)
+        edit_menu.add_command(label="Select Same Class (Ctrl+Shift+A)", command=self.select_same_class)
+        edit_menu.add_command(label="Invert Selection (Ctrl+I)", command=self.invert_selection)
+        edit_menu.add_separator()
         edit_menu.add_command(label="Duplicate Box (Ctrl+D)", command=self.duplicate_selected_box)
+        edit_menu.add_command(label="Delete Box (Del)", command=self.delete_selected_box)
+        edit_menu.add_command(label="Show/Hide Selected (H)", command=self.toggle_selected_visibility)
         edit_menu.add_command(label="Undo (Ctrl+Z)", command=self.undo_last)
         edit_menu.add_command(label="Redo (Ctrl+Y)", command=self.redo_last)
+        edit_menu.add_separator()
+        edit_menu.add_checkbutton(label="Propagate Boxes to Next Frame", variable=self.propagate_var, command=self.on_propagate_toggle)
         menubar.add_cascade(label="Edit", menu=edit_menu)
         
         # --- NEW RENAME MENU ---
@@ -583,6 +481,22 @@ class UltimateAnnotator(ctk.CTk):
         rename_menu.add_command(label="Rename Current Image", command=self.rename_current_single)
         rename_menu.add_command(label="Batch Rename Directory...", command=self.open_batch_rename)
         menubar.add_cascade(label="Rename", menu=rename_menu)
+
+        tools_menu = tk.Menu(menubar, tearoff=0, bg=bg_color, fg=fg_color)
+        tools_menu.add_command(label="Dataset Statistics...", command=self.show_stats)
+        tools_menu.add_command(label="Validate Dataset...", command=self.show_validation)
+        tools_menu.add_command(label="Find Duplicates...", command=self.show_dedup)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Export Train/Val/Test Split...", command=self.show_split_export)
+        tools_menu.add_command(label="Export Tiles...", command=self.show_tile_export)
+        tools_menu.add_command(label="Export Object Crops...", command=self.show_crop_export)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Pre-annotate with Model...", command=self.show_preannotate)
+        tools_menu.add_separator()
+        tools_menu.add_checkbutton(label="Performance Overlay", variable=self.perf_overlay_var, command=self.on_perf_toggle)
+        tools_menu.add_checkbutton(label="Record Performance Trace", variable=self.perf_record_var, command=self.on_perf_toggle)
+        tools_menu.add_command(label="Save Performance Trace...", command=self.save_perf_trace)
+        menubar.add_cascade(label="Tools", menu=tools_menu)
         
         help_menu = tk.Menu(menubar, tearoff=0, bg=bg_color, fg=fg_color)
         help_menu.add_command(label="How to Use", command=self.show_usage_guide)
@@ -590,13 +504,19 @@ class UltimateAnnotator(ctk.CTk):
         help_menu.add_command(label="About", command=self.show_about)
         menubar.add_cascade(label="Help", menu=help_menu)
         
+        self.menus = [menubar, file_menu, edit_menu, rename_menu, tools_menu, help_menu] # Recoloured in place on theme toggle
         self.config(menu=menubar)
 
+    def _apply_menu_theme(self):
+        t_idx = 0 if self.theme_mode == "Light" else 1
+        for m in self.menus:
+            m.config(bg=PS_GRAY_MED[t_idx], fg=PS_TEXT_COLOR[t_idx])
+        self.menus[0].config(activebackground=PS_ACTIVE[t_idx])
+
     # --- RENAME LOGIC ---
     def rename_current_single(self):
-        if not self.image_list: return
-        curr_path = self.image_list[self.current_index]
-        old_name = os.path.basename(curr_path)
+        if not self.dataset.image_list or self.refuse_read_only("renamed"): return
+        curr_path = self.dataset.image_list[self.current_index]
         
         dialog = ctk.CTkInputDialog(text="Enter new name (with extension):", title="Rename File")
         if self.icon_path:
@@ -608,89 +528,322 @@ class UltimateAnnotator(ctk.CTk):
         
         dir_path = os.path.dirname(curr_path)
         new_path = os.path.join(dir_path, new_name)
+        if not self.check_unsaved_changes(): return
+        self.settle_journal() # Its label file moves with the image
         
-        if os.path.exists(new_path):
-            messagebox.showerror("Error", "File with that name already exists!")
-            return
-            
+        from .rename import RenameTransaction, plan_renames, journal_path as rename_journal_path
         try:
-            os.rename(curr_path, new_path)
-            # Rename corresponding annotation based on current format assumption or all? 
-            # Currently only checking .txt for rename in legacy code, could expand but keep simple for now
-            old_txt = os.path.splitext(curr_path)[0] + ".txt"
-            new_txt = os.path.join(os.path.dirname(new_path), os.path.splitext(new_name)[0] + ".txt")
-            if os.path.exists(old_txt):
-                os.rename(old_txt, new_txt)
-            
-            self.image_list[self.current_index] = new_path
-            
-            # Update cache
-            if curr_path in self.annot_cache:
-                self.annot_cache[new_path] = self.annot_cache.pop(curr_path)
-
-            self.refresh_file_list()
-            self.load_image_data()
+            # Moves labels in every format, next to the image and in label_dir
+            ops = plan_renames({curr_path: new_path}, [self.dataset.label_dir])
+            RenameTransaction(ops, rename_journal_path(self.dataset.image_dir)).execute()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to rename: {e}")
+            return
+
+        self.dataset.image_list[self.current_index] = new_path
+        
+        # Update cache
+        self.dataset.invalidate(curr_path)
+
+        self.refresh_file_list()
+        self.load_image_data()
 
     def open_batch_rename(self):
-        if not self.current_dir:
+        if not self.dataset.image_dir:
             messagebox.showinfo("Info", "Open a directory first.")
             return
+        if self.refuse_read_only("renamed"): return
+        from .dialogs import BatchRenameDialog
         BatchRenameDialog(self, self.execute_batch_rename)
 
     def execute_batch_rename(self, base_name, start_num, digits):
-        if not self.image_list: return
-        files_to_rename = self.image_list.copy()
-        count = start_num
-        renamed_count = 0
-        new_image_list = []
+        if not self.dataset.image_list: return
+        from .rename import RenameError, RenameTransaction, RollbackError, plan_batch_rename, journal_path as rename_journal_path
+        # Plan first: collisions are reported before anything is touched
         try:
-            for old_path in files_to_rename:
-                dir_path = os.path.dirname(old_path)
-                ext = os.path.splitext(old_path)[1]
-                new_filename = f"{base_name}_{str(count).zfill(digits)}{ext}"
-                new_path = os.path.join(dir_path, new_filename)
-                
-                if old_path != new_path:
-                    os.rename(old_path, new_path)
-                    # Basic txt rename support
-                    old_txt = os.path.splitext(old_path)[0] + ".txt"
-                    if os.path.exists(old_txt):
-                        new_txt_name = f"{base_name}_{str(count).zfill(digits)}.txt"
-                        new_txt = os.path.join(dir_path, new_txt_name)
-                        os.rename(old_txt, new_txt)
-                
-                new_image_list.append(new_path)
-                count += 1
-                renamed_count += 1
-            
-            self.image_list = new_image_list
-            self.annot_cache = {} # Clear cache on batch rename
-            self.refresh_file_list()
-            self.current_index = 0
-            self.load_image_data()
-            messagebox.showinfo("Success", f"Renamed {renamed_count} files.")
-            
+            ops, new_image_list = plan_batch_rename(self.dataset.image_list, base_name, start_num, digits, [self.dataset.label_dir])
+        except RenameError as e:
+            messagebox.showerror("Error", f"Batch rename not started.\n\n{e}")
+            return
+        if not self.check_unsaved_changes(): return
+        self.settle_journal()
+
+        # Release the open image so Windows lets us move it
+        if self.pil_image:
+            self.canvas.delete("all"); self.release_image()
+
+        self.config(cursor="watch"); self.update_idletasks()
+        try:
+            RenameTransaction(ops, rename_journal_path(self.dataset.image_dir)).execute()
+        except RollbackError as e:
+            self.config(cursor="")
+            messagebox.showerror("Error", "Batch rename failed and could not be rolled back: some files have their new names, "
+                                 f"some their old ones.\n\nThe rename journal at {e.journal_path} records every file; "
+                                 f"reopen the folder to finish or roll back the rename.\n\n{e}")
+            self.load_directory_manual(self.dataset.image_dir)
+            return
+        except Exception as e:
+            self.config(cursor="")
+            messagebox.showerror("Error", f"Batch rename failed, changes were rolled back.\n\n{e}")
+            self.load_directory_manual(self.dataset.image_dir)
+            return
+        self.config(cursor="")
+
+        self.dataset.image_list = new_image_list
+        self.dataset.invalidate() # Clear cache on batch rename
+        self.skipped_images = set()
+        self.refresh_file_list()
+        self.current_index = 0
+        self.load_image_data()
+        messagebox.showinfo("Success", f"Renamed {len(new_image_list)} images ({len(ops)} files).")
+
+    def check_pending_rename(self):
+        # A journal left behind means a batch rename was interrupted
+        from .rename import pending_transaction
+        tx = pending_transaction(self.dataset.image_dir)
+        if not tx: return
+        choice = messagebox.askyesnocancel("Interrupted Rename",
+                                           f"A rename of {len(tx.ops)} files was interrupted.\n\n"
+                                           "Yes: roll back to the old names\nNo: finish the rename\nCancel: decide later")
+        if choice is None: return
+        try:
+            if choice: tx.rollback()
+            else: tx.resume()
         except Exception as e:
-            messagebox.showerror("Error", f"Batch rename interrupted: {e}")
-            self.load_directory_manual(self.current_dir)
+            messagebox.showerror("Error", f"Could not recover rename: {e}")
+
+    def refuse_read_only(self, action):
+        if not self.dataset.read_only: return False
+        messagebox.showinfo("Read-only", f"Images inside an archive or on a server can't be {action}.")
+        return True
+
+    def refuse_remote(self):
+        # Dataset tools work on local files; a server dataset is edited image by image
+        if not self.dataset.is_remote: return False
+        messagebox.showinfo("Not Available", "This tool needs the dataset on this machine. Run it on the server instead.")
+        return True
 
     def load_directory_manual(self, d):
-        self.image_list = sorted(glob.glob(os.path.join(d, "*.*")))
-        self.image_list = [x for x in self.image_list if x.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))]
-        self.annot_cache = {}
+        self.abandon_edits()
+        self.dataset.image_dir = d
+        self.dataset.scan()
+        self.skipped_images = set()
         self.refresh_file_list()
         self.current_index = 0
-        if self.image_list: self.load_image_data()
+        if self.dataset.image_list: self.load_image_data()
 
     # --- ABOUT & USAGE ---
     def show_about(self):
         messagebox.showinfo("About", "Annotamate Pro \nRugved Jalit © 2025")
 
     def show_usage_guide(self):
+        from .dialogs import UsageGuideDialog
         UsageGuideDialog(self)
 
+    # --- DATASET STATISTICS ---
+    def get_stats_engine(self):
+        if not self.dataset.image_dir or not self.dataset.image_list: return None
+        fmt = self.format_var.get()
+        e = self.stats_engine
+        from .stats import DatasetStats
+        if e is None or e.fmt != fmt or e.label_dir != (self.dataset.label_dir or self.dataset.image_dir) or e.image_list != self.dataset.image_list:
+            self.stats_engine = DatasetStats(self.dataset.image_list, self.dataset.image_dir, self.dataset.label_dir, fmt)
+        return self.stats_engine
+
+    def show_stats(self):
+        if self.dataset.is_remote: return self.show_remote_stats()
+        from .dialogs import StatsDialog
+        StatsDialog(self)
+
+    def show_remote_stats(self):
+        try: s = self.dataset.stats()
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not get statistics: {e}")
+            return
+        top = "\n".join(f"  {name}: {n}" for name, n in s["classes"][:10])
+        messagebox.showinfo("Dataset Statistics", f"Images: {s['images']}\nLabelled: {s['labelled']}\nBoxes: {s['boxes']}\n\nTop classes:\n{top}")
+
+    def show_validation(self):
+        if self.refuse_remote(): return
+        from .dialogs import ValidationDialog
+        ValidationDialog(self)
+
+    def show_dedup(self):
+        if self.refuse_remote(): return
+        from .dialogs import DedupDialog
+        DedupDialog(self)
+
+    def show_split_export(self):
+        if self.refuse_remote(): return
+        from .dialogs import SplitDialog
+        SplitDialog(self)
+
+    def show_tile_export(self):
+        if self.refuse_remote(): return
+        from .dialogs import TileDialog
+        TileDialog(self)
+
+    def show_crop_export(self):
+        if self.refuse_remote(): return
+        from .dialogs import CropDialog
+        CropDialog(self)
+
+    # --- SHARED WORK QUEUE (several annotators, one folder) ---
+    def on_shared_toggle(self):
+        if self.shared_var.get(): self.join_shared_queue()
+        else: self.leave_shared_queue()
+
+    def join_shared_queue(self):
+        if not self.dataset.image_list or self.dataset.is_remote:
+            # A server already refuses conflicting saves; leases are for shared folders
+            if not self.dataset.is_remote: messagebox.showinfo("Info", "Open a directory first.")
+            self.shared_var.set(False)
+            return
+        from .shard import WorkQueue
+        self.leave_shared_queue()
+        try:
+            # Existence on disk, not the cache: other annotators are labelling too
+            self.work_queue = WorkQueue(self.dataset.label_dir or self.dataset.image_dir, list(self.dataset.image_list),
+                                        is_done=lambda p: os.path.exists(self.dataset.annotation_path(p)))
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not set up the shared queue: {e}")
+            self.shared_var.set(False)
+            return
+        if not self.check_unsaved_changes():
+            self.leave_shared_queue(); self.shared_var.set(False)
+            return
+        self.shard_skips = self.skipped_images
+        self.claim_chunk()
+
+    def claim_chunk(self):
+        # Hands in the current chunk (if any) and moves the editor onto a fresh one;
+        # callers have dealt with unsaved changes, or they are lost with the lease
+        self.abandon_edits()
+        try: chunk = self.work_queue.claim()
+        except OSError as e: chunk = None; print(f"Could not claim work: {e}")
+        if not chunk:
+            done, total = self.work_queue.progress()
+            messagebox.showinfo("Shared Work Queue", f"No unclaimed images left ({done}/{total} chunks finished).")
+            self.shared_var.set(False)
+            self.leave_shared_queue()
+            return
+        members = set(chunk)
+        self.skipped_images = self.shard_skips | (set(self.dataset.image_list) - members)
+        self.dataset.invalidate() # Others have been saving; re-check the ticks
+        self.refresh_file_list()
+        index = {p: i for i, p in enumerate(self.dataset.image_list)}
+        first = next((p for p in chunk if not self.dataset.has_annotation(p)), chunk[0])
+        self.propagate_target = None
+        self.current_index = index[first]
+        self.load_image_data()
+        if self.shard_job is None: self.shard_job = self.after(HEARTBEAT_MS, self.shard_heartbeat)
+
+    def shard_heartbeat(self):
+        self.shard_job = None
+        if not self.work_queue: return
+        try: ours = self.work_queue.heartbeat()
+        except OSError as e: ours = True; print(f"Lease heartbeat failed, retrying: {e}")
+        if not ours:
+            holder = self.work_queue.holder() or "nobody"
+            messagebox.showwarning("Shared Work Queue", f"Your lease expired and the chunk now belongs to {holder}.\nMoving you to a new chunk.")
+            self.claim_chunk() # Drops our edits, journal included: they must not be recovered onto their chunk
+            return
+        self.shard_job = self.after(HEARTBEAT_MS, self.shard_heartbeat)
+
+    def leave_shared_queue(self):
+        if self.shard_job: self.after_cancel(self.shard_job); self.shard_job = None
+        if not self.work_queue: return
+        try: self.work_queue.release()
+        except OSError as e: print(f"Could not release lease: {e}")
+        self.work_queue = None
+        self.skipped_images = self.shard_skips
+        self.shard_skips = set()
+        self.refresh_file_list()
+
+    # --- BOX PROPAGATION (video frames) ---
+    def on_propagate_toggle(self):
+        if not self.propagate_var.get(): return
+        try:
+            from .track import Propagator
+            if self.propagator is None: self.propagator = Propagator()
+        except Exception as e:
+            self.propagate_var.set(False)
+            messagebox.showerror("Error", f"Box propagation is unavailable: {e}")
+            return
+        self.queue_propagation()
+
+    def queue_propagation(self, idx=None):
+        # Track the current boxes into the next frame in the background -> target path or None
+        if not self.propagate_var.get() or not self.propagator or not self.pil_image or not len(self.store): return None
+        if idx is None: idx = self.find_unskipped(self.current_index, 1)
+        if idx is None: return None
+        dst = self.dataset.image_list[idx]
+        self.propagator.submit(self.dataset.image_list[self.current_index], dst, self.store.boxes)
+        return dst
+
+    def apply_propagation(self):
+        path = self.dataset.image_list[self.current_index] if self.dataset.image_list else None
+        if path is None or path != self.propagate_target or not self.pil_image or len(self.store):
+            self.propagate_target = None; return
+        try:
+            boxes = self.propagator.result(path)
+        except Exception as e:
+            print(f"Propagation failed for {os.path.basename(path)}: {e}")
+            self.propagate_target = None; return
+        if boxes is None:
+            if self.propagator.pending(path): self.after(50, self.apply_propagation)
+            else: self.propagate_target = None
+            return
+        self.propagate_target = None
+        self.store.replace(boxes)
+        self.has_unsaved_changes = True
+        self.redraw_boxes(); self.update_sidebar_objects()
+        self.queue_propagation() # Keep one frame ahead while this one is reviewed
+
+    # --- PRE-ANNOTATION ---
+    def show_preannotate(self):
+        if self.refuse_remote(): return
+        from .dialogs import PreannotateDialog
+        PreannotateDialog(self)
+
+    def start_preannotation(self, spec, workers, lookahead, min_score):
+        from .preannotate import PreAnnotator
+        self.stop_preannotation()
+        self.preannotator = PreAnnotator(self.dataset.image_list, self.dataset.label_dir or self.dataset.image_dir,
+                                         spec, self.classes, workers=workers, lookahead=lookahead,
+                                         image_root=self.dataset.image_dir)
+        self.preannotate_min_score = min_score
+        self.preannotator.advance(self.current_index)
+        self.poll_preannotation()
+
+    def stop_preannotation(self):
+        if self.preannotator:
+            self.preannotator.close(); self.preannotator = None
+
+    def poll_preannotation(self):
+        # Proposals for the image on screen may land after it was loaded
+        if not self.preannotator: return
+        self.apply_proposals()
+        self.after(250, self.poll_preannotation)
+
+    def apply_proposals(self):
+        # Model proposals fill an unlabelled image as ordinary, editable boxes
+        pa = self.preannotator
+        if not pa or not self.pil_image or len(self.store): return
+        path = self.dataset.image_list[self.current_index]
+        if self.proposals_applied == path or self.propagate_target == path or self.dataset.has_annotation(path): return
+        props = pa.proposals(path)
+        if props is None: return
+        from .preannotate import to_boxes
+        n_classes = len(self.classes)
+        boxes = to_boxes(props, self.classes, self.preannotate_min_score)
+        if len(self.classes) != n_classes: self.refresh_class_list()
+        self.proposals_applied = path # Once only: deleting them all must stick
+        if not boxes: return
+        self.store.replace(boxes)
+        self.has_unsaved_changes = True
+        self.redraw_boxes(); self.update_sidebar_objects()
+
     def set_mode(self, mode):
         self.draw_mode_var.set(mode)
         self.on_mode_change(mode)
@@ -710,23 +863,13 @@ class UltimateAnnotator(ctk.CTk):
         # 1. Update CTk Theme Mode (Handles all CTk widgets automatically via Tuples)
         ctk.set_appearance_mode(self.theme_mode)
         
-        # 2. Re-generate Icons for the new theme (Light background needs Dark icons)
-        self.generate_icons()
+        # 2. Swap to the other resident icon set (Light background needs Dark icons)
+        self.apply_icon_set()
         
-        # 3. Update Nav Button Icons manually (since tkfontawesome icons are static bitmaps)
-        # We need to map button instance to the icon it uses.
-        # This mapping is rebuilt during toggle.
+        # 3. Update Nav Button Icons manually (icons are static bitmaps)
+        icons = self.icon_sets[self.theme_mode]
         for btn, icon_name in self.nav_buttons:
-            if icon_name == "folder": img = self.icon_folder
-            elif icon_name == "tag": img = self.icon_tag
-            elif icon_name == "save": img = self.icon_save
-            elif icon_name == "del": img = self.icon_del
-            elif icon_name == "theme": img = self.icon_theme
-            elif icon_name == "bars": img = self.icon_bars # Update hamburger
-            elif icon_name == "min": img = self.icon_min
-            elif icon_name == "close": img = self.icon_close
-            
-            try: btn.configure(image=img)
+            try: btn.configure(image=icons[icon_name])
             except: pass
             
         # 4. Update Standard TK Widgets (Canvas, Listbox, Scrollbar, PanedWindow)
@@ -746,12 +889,13 @@ class UltimateAnnotator(ctk.CTk):
         # PanedWindow
         self.paned_window.config(bg=PS_BORDER_COLOR[t_idx])
         
-        # Menu Bar (Re-create to update colors)
-        self._setup_menu()
+        # Menu Bar (recolour in place)
+        self._apply_menu_theme()
         
-        # Update Sidebar eye icons (they are CTkButtons but use static images)
-        self.update_sidebar_objects()
-        self.refresh_file_list() # To update text color if needed
+        # Sidebar eye icons (colours there are theme tuples, only images need swapping)
+        for btn, is_vis in self.vis_buttons:
+            try: btn.configure(image=self.icon_vis_on if is_vis else self.icon_vis_off)
+            except: pass
 
     # --- UI SETUP ---
     def _setup_ui(self):
@@ -811,8 +955,10 @@ class UltimateAnnotator(ctk.CTk):
         self.frame_center = ctk.CTkFrame(self.nav_bar, fg_color="transparent")
         self.frame_center.grid(row=0, column=2) 
 
-        ctk.CTkButton(self.frame_center, text="", image=self.icon_prev, width=32, height=32, corner_radius=2, fg_color="transparent", hover_color=PS_GRAY_LIGHT, command=self.prev_image).pack(side="left", padx=5)
-        ctk.CTkButton(self.frame_center, text="", image=self.icon_next, width=32, height=32, corner_radius=2, fg_color="transparent", hover_color=PS_GRAY_LIGHT, command=self.next_image).pack(side="left", padx=5)
+        for key, icon, cmd in (("prev", self.icon_prev, self.prev_image), ("next", self.icon_next, self.next_image)):
+            btn = ctk.CTkButton(self.frame_center, text="", image=icon, width=32, height=32, corner_radius=2, fg_color="transparent", hover_color=PS_GRAY_LIGHT, command=cmd)
+            btn.pack(side="left", padx=5)
+            self.nav_buttons.append((btn, key))
 
         # Right Tools
         self.frame_tools_right = ctk.CTkFrame(self.nav_bar, fg_color="transparent")
@@ -960,6 +1106,8 @@ class UltimateAnnotator(ctk.CTk):
 
         self.scroll_objects = ctk.CTkScrollableFrame(self.frame_obj_content, label_text=None, fg_color=PS_GRAY_DARK)
         self.scroll_objects.pack(fill="both", expand=True)
+        self.object_rows = WidgetPool(self.scroll_objects, self.make_object_row,
+                                      lambda slot: [w.pack(fill="x", pady=0) for w in slot["frames"]])
 
         # === GROUP 2: FILES ===
         self.group_files = ctk.CTkFrame(self.frame_right, fg_color="transparent")
@@ -1141,82 +1289,188 @@ class UltimateAnnotator(ctk.CTk):
     # --- Path Helpers ---
     def get_annotation_path(self, img_path):
         """Returns the expected annotation path based on current format."""
-        fmt = self.format_var.get()
-        if fmt == "Pascal VOC": ext = ".xml"
-        elif fmt == "COCO": ext = ".json"
-        else: ext = ".txt" # YOLO default
-        
-        basename = os.path.splitext(os.path.basename(img_path))[0] + ext
-        if self.label_dir: return os.path.join(self.label_dir, basename)
-        else: return os.path.join(os.path.dirname(img_path), basename)
+        return self.dataset.annotation_path(img_path)
 
     # kept for legacy references, but should use get_annotation_path
     def get_txt_path(self, img_path):
         return self.get_annotation_path(img_path)
 
     def get_classes_file_path(self):
-        if self.label_dir: return os.path.join(self.label_dir, "classes.txt")
-        elif self.current_dir: return os.path.join(self.current_dir, "classes.txt")
-        return None
+        return self.dataset.classes_file_path()
 
     # --- Directory Loading ---
     def load_directory(self):
         d = filedialog.askdirectory(title="Select Image Directory")
         if not d: return
-        self.current_dir = d
-        self.label_dir = None 
+        self.open_directory(d)
+        self.after(200, self.set_label_directory)
+
+    def load_archive(self):
+        f = filedialog.askopenfilename(title="Select Image Archive", filetypes=[("Image archives", "*.zip *.tar"), ("All files", "*.*")])
+        if f: self.open_directory(f) # Labels go to the sidecar folder next to it
+
+    def connect_server(self):
+        dialog = ctk.CTkInputDialog(text="Server address (from `annotamate serve`):", title="Connect to Server")
+        if self.icon_path:
+            try: dialog.after(200, lambda: dialog.iconbitmap(self.icon_path))
+            except: pass
+        url = (dialog.get_input() or "").strip()
+        if not url: return
+        if "://" not in url: url = "http://" + url
+        self.open_directory(url)
+
+    def open_remote(self, url):
+        from .core.remote import RemoteDataset
+        self.stop_preannotation()
+        self.leave_shared_queue()
+        self.propagate_target = None
+        try:
+            ds = RemoteDataset(url)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not connect to {url}:\n\n{e}")
+            return
+        self.stop_journal() # The server keeps no journal of ours
+        self.undo_history.clear()
+        self.dataset = ds
+        self.format_var.set(ds.fmt) # The server's format; the dataset ignores changes
         self.load_classes()
-        self.image_list = sorted(glob.glob(os.path.join(d, "*.*")))
-        self.image_list = [x for x in self.image_list if x.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))]
-        self.annot_cache = {} # Clear cache on new load
+        self.mark_startup("directory scan")
+        self.skipped_images = set()
         self.refresh_file_list()
         self.current_index = 0
-        self.find_latest_session_and_jump(d)
-        if self.image_list: self.load_image_data()
-        self.after(200, self.set_label_directory)
+        if self.dataset.image_list: self.load_image_data()
+        elif self.profile: self.after_idle(self.finish_startup_profile)
+
+    def open_directory(self, d, label_dir=None):
+        if d.startswith(("http://", "https://")): return self.open_remote(d)
+        if self.dataset.is_remote: self.dataset = Dataset(fmt=self.format_var.get())
+        d = os.path.abspath(d)
+        if not os.path.isdir(d) and not archive.is_archive(d):
+            messagebox.showerror("Error", f"Not a directory or zip/tar archive: {d}")
+            return
+        self.stop_preannotation() # Its image list and cache belong to the old folder
+        self.leave_shared_queue()
+        self.propagate_target = None
+        self.dataset.image_dir = d
+        self.dataset.label_dir = os.path.abspath(label_dir) if label_dir else archive.default_label_dir(d)
+        if not self.dataset.read_only: self.check_pending_rename()
+        self.load_classes()
+        try:
+            self.dataset.scan() # Also clears the annotation cache
+        except (OSError, archive.ArchiveError) as e:
+            messagebox.showerror("Error", f"Could not read {os.path.basename(d)}:\n\n{e}")
+            self.dataset.image_list = []
+        self.start_journal() # May write recovered edits, so before anything reads labels
+        self.undo_history.clear()
+        self.mark_startup("directory scan")
+        self.skipped_images = set()
+        self.refresh_file_list()
+        self.current_index = 0
+        self.find_latest_session_and_jump(self.dataset.label_dir or d)
+        if self.shared_var.get() and self.dataset.image_list: self.join_shared_queue()
+        elif self.dataset.image_list: self.load_image_data()
+        elif self.profile: self.after_idle(self.finish_startup_profile)
 
     def set_label_directory(self):
-        if not self.current_dir: return
+        if not self.dataset.image_dir: return
         d = filedialog.askdirectory(title="Select Label/Annotation Directory")
         if d:
-            self.label_dir = d
+            self.dataset.set_label_dir(d) # Clears the annotation cache
             self.load_classes()
-            self.annot_cache = {} # Clear cache on label change
             self.find_latest_session_and_jump(d)
-            if self.image_list: self.load_image_data()
+            if self.dataset.image_list: self.load_image_data()
         else:
-            self.find_latest_session_and_jump(self.current_dir)
-            if self.image_list: self.load_image_data()
+            self.find_latest_session_and_jump(self.dataset.image_dir)
+            if self.dataset.image_list: self.load_image_data()
 
     def find_latest_session_and_jump(self, search_dir):
-        if not search_dir or not os.path.exists(search_dir): return
-        # Simple heuristic: check for any annotation file
-        txt_files = glob.glob(os.path.join(search_dir, "*.txt"))
-        xml_files = glob.glob(os.path.join(search_dir, "*.xml"))
-        json_files = glob.glob(os.path.join(search_dir, "*.json"))
-        
-        all_files = txt_files + xml_files + json_files
-        all_files = [f for f in all_files if os.path.basename(f) != "classes.txt"]
-        
-        if not all_files: return
-        try:
-            latest_file = max(all_files, key=os.path.getmtime)
-            latest_base = os.path.splitext(os.path.basename(latest_file))[0]
-            for i, img_path in enumerate(self.image_list):
-                img_base = os.path.splitext(os.path.basename(img_path))[0]
-                if img_base == latest_base:
-                    self.current_index = i
-                    return
-        except: pass
+        # Simple heuristic: resume at the most recently written annotation
+        idx = self.dataset.latest_annotated_index(search_dir)
+        if idx is not None: self.current_index = idx
 
     def load_classes(self):
-        cp = self.get_classes_file_path()
-        if cp and os.path.exists(cp):
-            try:
-                with open(cp, "r") as f:
-                    lc = [x.strip() for x in f.readlines() if x.strip()]
-                    if lc: self.classes = lc; self.refresh_class_list()
-            except: pass
+        lc = self.dataset.load_classes()
+        if lc: self.classes = lc if isinstance(lc, ClassRegistry) else ClassRegistry(lc); self.refresh_class_list()
+
+    # --- Edit Journal (see core/journal.py) ---
+    def start_journal(self):
+        self.stop_journal()
+        if self.dataset.is_remote or not self.dataset.project_root: return
+        try:
+            self.journal = EditJournal(self.dataset.project_root, lambda: self.classes, on_written=self.journal_written)
+        except OSError as e:
+            print(f"Edit journal unavailable, edits live in memory until saved: {e}")
+            return
+        self.check_journal_conflicts()
+        pending = self.journal.recovered()
+        if not pending: return
+        edits = sum(n for _, n in pending)
+        names = ", ".join(os.path.basename(p) for p, _ in pending[:5]) + (", ..." if len(pending) > 5 else "")
+        if not messagebox.askyesno("Recover Unsaved Edits",
+                                   f"{edits} edit(s) to {len(pending)} image(s) were not saved when Annotamate last closed:\n{names}\n\n"
+                                   "Write them to the label files now?\n(No discards them.)"):
+            self.journal.discard_recovered()
+            return
+        written, failed = self.journal.apply_recovered()
+        for p, reason in failed: print(f"Not recovered: {os.path.basename(p)}: {reason}")
+        if failed:
+            messagebox.showwarning("Recover Unsaved Edits", f"Recovered {written} image(s). {len(failed)} could not be written "
+                                   "because their label files changed since; see the console.")
+
+    def stop_journal(self):
+        if self.journal_job is not None:
+            self.after_cancel(self.journal_job); self.journal_job = None
+        if self.journal:
+            self.journal.close(); self.journal = None
+
+    def check_journal_conflicts(self):
+        # Handed-off edits the background writer could not write (their label file
+        # changed meanwhile, or the write failed) wait in the journal until asked about
+        self.journal_job = None
+        if not self.journal: return
+        conflicts = self.journal.take_conflicts()
+        if conflicts:
+            names = "\n".join(f"{os.path.basename(p)}: {reason}" for p, reason in conflicts[:5]) + ("\n..." if len(conflicts) > 5 else "")
+            write = messagebox.askyesno("Unsaved Edits",
+                                        f"Autosaved edits to {len(conflicts)} image(s) could not be written:\n{names}\n\n"
+                                        "Write them over the label files as they are now?\n(No discards them.)")
+            for p, _ in conflicts:
+                try: self.journal.resolve(p, write)
+                except Exception as e: print(f"Journalled edits for {os.path.basename(p)} not written: {e}")
+        self.journal_job = self.after(JOURNAL_CHECK_MS, self.check_journal_conflicts)
+
+    def abandon_edits(self):
+        # For moves that skip check_unsaved_changes: the open image's edits are
+        # dropped, and its journal session with them (else it is "recovered" later)
+        if self.journal: self.journal.abandon()
+        self.has_unsaved_changes = False
+
+    def settle_journal(self):
+        # Before files are renamed: handed-off edits reach their label files first
+        self.abandon_edits() # Already saved or handed off by check_unsaved_changes
+        if self.journal: self.journal.flush_all()
+
+    def journal_op(self, op):
+        if self.journal: self.journal.record(op)
+
+    def journal_written(self, img_path):
+        # Journal thread: a handed-off image reached its label file. Dataset caches only, no Tk.
+        self.dataset.annot_cache[img_path] = True
+        self.dataset.remember_label(img_path)
+
+    def autosave_in_background(self):
+        # AutoSave through the journal: the edits are on disk already and the
+        # label file is written off the Tk thread -> False to save the usual way
+        if not self.journal or not self.pil_image: return False
+        img_path = self.dataset.image_list[self.current_index]
+        if self.dataset.label_changed(img_path): return False # Let save_annotation ask about the conflict
+        self.sync_classes_file()
+        if self.journal.hand_off(img_path):
+            self.dataset.annot_cache[img_path] = True
+            self.show_labelled_in_list(img_path)
+        elif self.has_unsaved_changes: return False # Edits the journal does not hold: save them the usual way
+        self.has_unsaved_changes = False
+        return True
 
     # --- Logic ---
     def reset_class_selection(self):
@@ -1224,7 +1478,7 @@ class UltimateAnnotator(ctk.CTk):
         self.refresh_class_list()
 
     def on_mode_change(self, value):
-        self.selected_box_idx = None
+        self.clear_selection()
         self.canvas.delete("temp_poly")
         self.canvas.delete("rubber_band")
         self.redraw_boxes()
@@ -1240,75 +1494,139 @@ class UltimateAnnotator(ctk.CTk):
         self.bind("<Control-z>", lambda e: self.undo_last(e))
         self.bind("<Control-y>", lambda e: self.redo_last(e))
         self.bind("<Control-d>", lambda e: self.duplicate_selected_box(e)) # New Binding
+        self.bind("<Delete>", lambda e: self.delete_selected_box(e))
+        self.bind("h", lambda e: self.toggle_selected_visibility())
+        self.bind("<Control-a>", lambda e: self.select_all_boxes())
+        self.bind("<Control-A>", lambda e: self.select_same_class()) # Ctrl+Shift+A
+        self.bind("<Control-i>", lambda e: self.invert_selection())
+        self.bind("<Escape>", lambda e: self.select_object_from_sidebar(None))
 
     def unbind_shortcuts(self): 
-        self.unbind("w"); self.unbind("x"); self.unbind("s"); self.unbind("a"); self.unbind("d"); self.unbind("<Control-z>"); self.unbind("<Control-y>"); self.unbind("f"); self.unbind("<Control-d>")
+        self.unbind("w"); self.unbind("x"); self.unbind("s"); self.unbind("a"); self.unbind("d"); self.unbind("<Control-z>"); self.unbind("<Control-y>"); self.unbind("f"); self.unbind("<Control-d>"); self.unbind("<Delete>")
+        self.unbind("h"); self.unbind("<Control-a>"); self.unbind("<Control-A>"); self.unbind("<Control-i>"); self.unbind("<Escape>")
 
     def on_press_x(self):
         # Switch to Edit mode
         self.draw_mode_var.set("Edit")
         self.on_mode_change("Edit")
         
-        # If box selected, open change class dialog
-        if self.selected_box_idx is not None:
+        # If boxes are selected, pick a class for them (once for all of them)
+        selected = self.selected_indices()
+        if selected:
             self.is_processing = True 
-            self.update()
-            dialog = ClassManagerDialog(self, selection_mode=True)
-            self.wait_window(dialog)
-            
-            if dialog.result is not None: 
-                self.bboxes[self.selected_box_idx]['class_id'] = dialog.result
-                self.redraw_boxes()
-                self.update_sidebar_objects()
-                self.has_unsaved_changes = True
-            
-            self.after(200, lambda: setattr(self, 'is_processing', False))
+
+            def chosen(class_id):
+                if class_id is not None and all(self.store.valid(i) for i in selected):
+                    if len(selected) > 1: self.store.set_class_many(selected, class_id)
+                    else: self.store.set_class(selected[0], class_id)
+                    self.redraw_boxes()
+                    self.update_sidebar_objects()
+                    self.has_unsaved_changes = True
+                self.after(200, lambda: setattr(self, 'is_processing', False))
+            self.pick_class(chosen)
+
+    def build_class_picker(self):
+        if self.class_picker is None:
+            from .picker import ClassPicker
+            self.class_picker = ClassPicker(self)
+        return self.class_picker
+
+    def pick_class(self, callback):
+        # The resident picker (see picker.py), opened at the mouse
+        self.build_class_picker().ask(callback, *self.winfo_pointerxy())
 
     def duplicate_selected_box(self, event=None):
-        if self.selected_box_idx is None or self.selected_box_idx >= len(self.bboxes): return
-        box = self.bboxes[self.selected_box_idx].copy()
+        if self.selection:
+            # Copies of the whole selection, which becomes the selection
+            self.set_selection(self.store.duplicate_many(self.selection, 15 / self.imscale, self.pil_image.width, self.pil_image.height))
+            self.redraw_boxes(); self.update_sidebar_objects(); self.has_unsaved_changes = True
+            return
+        if not self.store.valid(self.selected_box_idx): return
         
         # Offset slightly
         offset = 15 / self.imscale
         w = self.pil_image.width; h = self.pil_image.height
-        box['x1'] = min(box['x1'] + offset, w - 5); box['x2'] = min(box['x2'] + offset, w)
-        box['y1'] = min(box['y1'] + offset, h - 5); box['y2'] = min(box['y2'] + offset, h)
-        
-        self.bboxes.append(box)
-        self.selected_box_idx = len(self.bboxes) - 1 # Select new box
+        self.selected_box_idx = self.store.duplicate(self.selected_box_idx, offset, w, h) # Select new box
+        self.redraw_boxes(); self.update_sidebar_objects(); self.has_unsaved_changes = True
+
+    def delete_selected_box(self, event=None):
+        selected = self.selected_indices()
+        if not selected: return
+        if len(selected) > 1: self.store.delete_many(selected)
+        else: self.store.delete(selected[0])
+        self.clear_selection()
+        self.redraw_boxes(); self.update_sidebar_objects(); self.has_unsaved_changes = True
+
+    def toggle_selected_visibility(self):
+        selected = self.selected_indices()
+        if not selected: return
+        self.store.toggle_visible_many(selected)
         self.redraw_boxes(); self.update_sidebar_objects(); self.has_unsaved_changes = True
 
+    # --- Selection ---
+    def selected_indices(self):
+        if self.selection: return sorted(i for i in self.selection if self.store.valid(i))
+        return [self.selected_box_idx] if self.store.valid(self.selected_box_idx) else []
+
+    def set_selection(self, indices):
+        # One box gets handles; several become a selection that edits act on together
+        chosen = {i for i in indices if self.store.valid(i)}
+        self.selection = chosen if len(chosen) > 1 else set()
+        self.selected_box_idx = next(iter(chosen)) if len(chosen) == 1 else None
+
+    def clear_selection(self):
+        self.selection = set()
+        self.selected_box_idx = None
+
+    def select_all_boxes(self):
+        self.select_boxes(range(len(self.store)))
+
+    def select_same_class(self):
+        # Every box of the selected boxes' classes (and classes below them), or of the class picked in the class list
+        classes = {self.store[i]['class_id'] for i in self.selected_indices()}
+        if not classes:
+            picked = self.selected_class()
+            if picked is None: return
+            classes = {picked}
+        family = {f for c in classes if 0 <= c < len(self.classes) for f in self.classes.family(c)} | classes
+        self.select_boxes(i for c in family for i in self.store.of_class(c))
+
+    def invert_selection(self):
+        selected = set(self.selected_indices())
+        self.select_boxes(i for i in range(len(self.store)) if i not in selected)
+
+    def select_boxes(self, indices):
+        if not self.pil_image: return
+        self.set_selection(indices)
+        self.redraw_boxes(); self.update_sidebar_objects()
+
     def check_unsaved_changes(self):
         if self.auto_save_var.get():
-            self.save_annotation()
+            if not self.autosave_in_background(): self.save_annotation()
             return True
         if self.has_unsaved_changes:
             choice = messagebox.askyesnocancel("Unsaved Changes", "You have unsaved changes.\nSave before continuing?")
             if choice is None: return False
             if choice: self.save_annotation()
+            elif self.journal: self.journal.discard(self.dataset.image_list[self.current_index])
         return True
 
     def undo_last(self, event=None):
-        if self.bboxes: 
-            box = self.bboxes.pop(); self.redo_stack.append(box); 
-            self.redraw_boxes(); self.update_sidebar_objects()
-            self.has_unsaved_changes = True
+        if self.store.undo(): self.after_history_step()
 
     def redo_last(self, event=None):
-        if self.redo_stack:
-            box = self.redo_stack.pop(); self.bboxes.append(box); 
-            self.redraw_boxes(); self.update_sidebar_objects()
-            self.has_unsaved_changes = True
+        if self.store.redo(): self.after_history_step()
 
-    def clear_redo_stack(self): self.redo_stack = []
+    def after_history_step(self):
+        # Undo/redo may have removed or re-added boxes, so indices in a selection may now mean others
+        self.selection = set()
+        if not self.store.valid(self.selected_box_idx): self.selected_box_idx = None
+        self.redraw_boxes(); self.update_sidebar_objects()
+        self.has_unsaved_changes = True
 
     # --- Class & File Mgmt ---
     def sync_classes_file(self):
-        cp = self.get_classes_file_path()
-        if not cp: return
-        try:
-            with open(cp, "w") as f:
-                for cls in self.classes: f.write(f"{cls}\n")
+        try: self.dataset.save_classes(self.classes)
         except: pass
 
     def refresh_class_list(self):
@@ -1317,25 +1635,55 @@ class UltimateAnnotator(ctk.CTk):
             self.class_manager_window.refresh_list()
 
     def add_class(self, new_name=None, from_popup=False):
-        # Called from Class Manager
-        if new_name and new_name not in self.classes:
-            self.classes.append(new_name)
-            self.refresh_class_list()
-            self.sync_classes_file()
+        # Called from Class Manager; a deleted (retired) name comes back with its old ID
+        if not new_name: return
+        cid = self.classes.lookup(new_name)
+        if cid is not None and not self.classes.is_retired(cid): return
+        self.classes.add(new_name)
+        self.refresh_class_list()
+        self.sync_classes_file()
 
-    def delete_class(self):
-        # Called from Class Manager
-        if not self.classes: return
+    def selected_class(self):
         try: idx = int(self.selected_class_var.get())
-        except: return
-        if idx < 0 or idx >= len(self.classes): return
-        if messagebox.askyesno("Delete", f"Delete '{self.classes[idx]}'?"):
-            self.classes.pop(idx); self.selected_class_var.set("-1")
+        except ValueError: return None
+        return idx if 0 <= idx < len(self.classes) else None
+
+    def delete_class(self):
+        # Called from Class Manager. IDs never shift: the class is retired and
+        # keeps its line in classes.txt, so existing label files stay correct
+        idx = self.selected_class()
+        if idx is None: return
+        if messagebox.askyesno("Delete", f"Delete '{self.classes[idx]}'?\n\nIts ID stays reserved so existing labels keep their meaning; "
+                               "boxes already using it keep it."):
+            self.classes.retire(idx); self.selected_class_var.set("-1")
             self.refresh_class_list()
             self.sync_classes_file()
-            self.redraw_boxes() # Colors might shift
+
+    def add_class_alias(self, alias):
+        # Another name for the selected class, e.g. as VOC/COCO files from elsewhere spell it
+        idx = self.selected_class()
+        if idx is None or not alias: return
+        try: self.classes.add_alias(alias, idx)
+        except ValueError as e:
+            messagebox.showerror("Alias", str(e)); return
+        self.refresh_class_list()
+        self.sync_classes_file()
+
+    def set_class_parent(self, parent_name):
+        # Puts the selected class under another one (an empty name clears it)
+        idx = self.selected_class()
+        if idx is None: return
+        pid = self.classes.lookup(parent_name) if parent_name else None
+        if parent_name and pid is None:
+            messagebox.showerror("Parent", f"No class named '{parent_name}'."); return
+        try: self.classes.set_parent(idx, pid)
+        except ValueError as e:
+            messagebox.showerror("Parent", str(e)); return
+        self.refresh_class_list()
+        self.sync_classes_file()
 
     # --- OPTIMIZED REFRESH LIST ---
+    @traced("ui.refresh_file_list")
     def refresh_file_list(self, event=None):
         self.file_listbox.delete(0, tk.END)
         self.filtered_indices = [] 
@@ -1343,18 +1691,14 @@ class UltimateAnnotator(ctk.CTk):
         search_text = self.entry_search.get().lower().strip()
         show_unlabelled = self.show_unlabelled_var.get()
         
-        for idx, path in enumerate(self.image_list):
+        for idx, path in enumerate(self.dataset.image_list):
             basename = os.path.basename(path)
             if search_text and search_text not in basename.lower():
                 continue
+            if self.work_queue and not self.work_queue.owns(path): continue # Someone else's chunk
 
             # Cached check
-            if path in self.annot_cache:
-                exists = self.annot_cache[path]
-            else:
-                annot_path = self.get_annotation_path(path)
-                exists = os.path.exists(annot_path)
-                self.annot_cache[path] = exists
+            exists = self.dataset.has_annotation(path)
 
             # Unlabelled filter logic
             if show_unlabelled and exists:
@@ -1396,33 +1740,140 @@ class UltimateAnnotator(ctk.CTk):
         if not self.check_unsaved_changes(): 
             self.highlight_current_file() # Revert selection if canceled
             return
+        self.propagate_target = None
         self.current_index = index; self.load_image_data()
     
     def next_image(self):
-        if self.current_index < len(self.image_list)-1:
+        idx = self.find_unskipped(self.current_index, 1)
+        if idx is None and self.work_queue:
+            # End of our chunk: hand it in and carry on with the next one
+            if self.check_unsaved_changes(): self.claim_chunk()
+            return
+        if idx is not None:
             if not self.check_unsaved_changes(): return
-            self.current_index += 1; self.load_image_data()
+            # Stepping forward from a labelled frame: its (possibly edited) boxes follow
+            self.propagate_target = self.queue_propagation(idx)
+            self.navigate_to(idx)
     def prev_image(self):
-        if self.current_index > 0:
+        idx = self.find_unskipped(self.current_index, -1)
+        if idx is not None:
             if not self.check_unsaved_changes(): return
-            self.current_index -= 1; self.load_image_data()
+            self.propagate_target = None
+            self.navigate_to(idx)
+
+    def find_unskipped(self, start, step):
+        i = start + step
+        while 0 <= i < len(self.dataset.image_list):
+            if self.dataset.image_list[i] not in self.skipped_images: return i
+            i += step
+        return None
+
+    def remove_images_from_list(self, paths):
+        # Drop deleted files from the list, keeping the current image if it survived
+        if not paths: return
+        current = self.dataset.image_list[self.current_index] if self.dataset.image_list else None
+        if current in paths and self.pil_image:
+            self.canvas.delete("all"); self.release_image()
+        self.dataset.image_list = [x for x in self.dataset.image_list if x not in paths]
+        for x in paths:
+            self.dataset.invalidate(x); self.skipped_images.discard(x)
+        if current in self.dataset.image_list:
+            self.current_index = self.dataset.image_list.index(current)
+        self.refresh_file_list()
+        if self.dataset.image_list:
+            if self.current_index >= len(self.dataset.image_list): self.current_index = len(self.dataset.image_list)-1
+            if not self.pil_image: self.load_image_data()
+        else: self.title("No Images")
+
+    # --- Image Loading (async, see loader.py) ---
+    def navigate_to(self, idx):
+        # Key-repeat friendly: a cheap preview per step, and the full load
+        # only once no further step arrives within NAV_SETTLE_MS
+        self.current_index = idx
+        self.begin_image_switch()
+        self.switch_started = time.perf_counter_ns()
+        size = (max(self.frame_left.winfo_width(), 50), max(self.frame_left.winfo_height(), 50))
+        self.loader.request(self.dataset.image_list[idx], PREVIEW, size=size)
+        self.watch_loader()
+        if self.settle_job: self.after_cancel(self.settle_job)
+        self.settle_job = self.after(NAV_SETTLE_MS, self.load_image_data)
+
+    def begin_image_switch(self):
+        # Drop the old image right away so nothing edits it under the new name
+        self.undo_history.close(self.store.history, self.store.boxes) # Once: reset() detaches it
+        self.release_image()
+        self.store.reset()
+        self.proposals_applied = None
+        self.clear_selection()
+        self.has_unsaved_changes = False
+        path = self.dataset.image_list[self.current_index]
+        self.lbl_info.configure(text=f"{os.path.basename(path)}  |  Loading... [{self.current_index + 1}/{len(self.dataset.image_list)}]")
+        self.highlight_current_file()
+        if self.vis_buttons: self.update_sidebar_objects()
+
+    def release_image(self):
+        # Frees the shared-memory frame too when a decode worker produced it
+        if self.pil_image:
+            self.decoder.release(self.pil_image); self.pil_image = None
 
+    @traced("ui.load_image_data")
     def load_image_data(self):
-        if not self.image_list: return
-        path = self.image_list[self.current_index]
+        if not self.dataset.image_list: return
+        if self.settle_job:
+            self.after_cancel(self.settle_job); self.settle_job = None
+        self.begin_image_switch()
+        if self.switch_started is None: self.switch_started = time.perf_counter_ns() # Keep a navigation's start
+        path = self.dataset.image_list[self.current_index]
+        classes = self.classes.copy() # Private to the loader thread; VOC/COCO may add to it
+        self.loader.request(path, FULL, labels=lambda size: (self.load_annotations(path, size, classes), classes))
+        self.watch_loader()
+
+    def watch_loader(self):
+        if self.loader_polling: return
+        self.loader_polling = True
+        self.after(LOADER_POLL_MS, self.poll_loader)
+
+    def poll_loader(self):
+        for _, path, kind, payload in self.loader.poll():
+            if isinstance(payload, Exception):
+                print(f"Error loading {path}: {payload}")
+                self.switch_started = None
+                self.lbl_info.configure(text=f"{os.path.basename(path)}  |  Could not load image: {payload}")
+            elif kind == PREVIEW: self.show_preview(payload)
+            elif payload is not None: self.apply_loaded_image(path, *payload)
+        if self.loader.idle(): self.loader_polling = False
+        else: self.after(LOADER_POLL_MS, self.poll_loader)
+
+    @traced("ui.show_preview")
+    def show_preview(self, im):
+        self.canvas.delete("all")
+        if im is None: return # Not cheap to preview this format; leave the canvas blank
+        self.tk_image = self.resources.frame_photo(im)
+        cw, ch = self.frame_left.winfo_width(), self.frame_left.winfo_height()
+        self.canvas.config(scrollregion=(0, 0, im.width, im.height))
+        self.canvas.create_image(max((cw - im.width) // 2, 0), max((ch - im.height) // 2, 0), anchor="nw", image=self.tk_image)
+
+    @traced("ui.apply_loaded_image")
+    def apply_loaded_image(self, path, im, labels):
+        (boxes, loaded_annot_path), classes = labels
+        self.pil_image = self.resources.track(im)
         name = os.path.basename(path)
-        self.pil_image = Image.open(path)
         
-        count_str = f"[{self.current_index + 1}/{len(self.image_list)}]"
+        count_str = f"[{self.current_index + 1}/{len(self.dataset.image_list)}]"
         
         # Reset window title to static
         self.title("Annotamate Pro")
-        
-        self.bboxes = []
-        self.redo_stack = [] 
-        
-        # Load annotations
-        loaded_annot_path = self.load_annotations(path)
+
+        # VOC/COCO may have added names, and the list may have changed while loading
+        if classes != self.classes:
+            for b in boxes:
+                if not 0 <= b['class_id'] < len(classes): continue # Unknown stays unknown
+                cname = classes[b['class_id']]
+                if cname not in self.classes: self.classes.append(cname)
+                b['class_id'] = self.classes.index(cname)
+            self.refresh_class_list()
+        self.store.reset(boxes, self.undo_history.open(path, boxes))
+        if self.journal: self.journal.begin(path, im.size, self.dataset.label_stamps.get(path), self.dataset.fmt, self.dataset.label_dir)
         
         if loaded_annot_path:
             annot_file = os.path.basename(loaded_annot_path)
@@ -1439,15 +1890,32 @@ class UltimateAnnotator(ctk.CTk):
         self.zoom_fit() 
         self.highlight_current_file()
         self.update_sidebar_objects() 
+        if self.propagate_target == path and not loaded_annot_path: self.apply_propagation()
+        else:
+            self.propagate_target = None
+            self.queue_propagation() # Labelled frame: have the next one ready before the user gets there
+        if self.preannotator:
+            self.preannotator.advance(self.current_index)
+            if not loaded_annot_path: self.apply_proposals()
+        # Warm the neighbours on idle decode workers
+        self.decoder.prefetch([self.dataset.image_list[i] for i in (self.find_unskipped(self.current_index, 1), self.find_unskipped(self.current_index, -1)) if i is not None])
+        if self.switch_started is not None and tracer.enabled:
+            # Request to boxes on screen, preview and settle delay included
+            tracer.add("ui.image_switch", self.switch_started, time.perf_counter_ns() - self.switch_started)
+        self.switch_started = None
+        if self.profile and not self.profile.done:
+            self.mark_startup("first image")
+            self.after_idle(self.finish_startup_profile)
 
     def on_resize_frame(self, event):
         if self.pil_image: self.render_image()
 
+    @traced("ui.render_image")
     def render_image(self):
         if not self.pil_image: return
         w, h = self.pil_image.size
         new_w, new_h = int(w * self.imscale), int(h * self.imscale)
-        self.tk_image = ImageTk.PhotoImage(self.pil_image.resize((new_w, new_h), Image.Resampling.NEAREST))
+        self.tk_image = self.resources.frame_photo(self.pil_image.resize((new_w, new_h), Image.Resampling.NEAREST))
         
         if self.lbl_zoom:
             self.lbl_zoom.configure(text=f"{int(self.imscale * 100)}%")
@@ -1581,9 +2049,10 @@ class UltimateAnnotator(ctk.CTk):
         mode = self.draw_mode_var.get()
 
         if mode == "Edit":
-            if self.selected_box_idx is not None:
+            shift = event.state & 0x0001
+            if self.selected_box_idx is not None and not shift:
                 # --- FIX: Validate index before accessing ---
-                if self.selected_box_idx >= len(self.bboxes):
+                if not self.store.valid(self.selected_box_idx):
                     self.selected_box_idx = None
                 else:
                     action = self.check_resize_handles(self.selected_box_idx, ix, iy)
@@ -1591,11 +2060,25 @@ class UltimateAnnotator(ctk.CTk):
                         self.drawing = True; self.drag_action = action; self.start_x, self.start_y = ix, iy; return
             
             idx = self.find_box_under_mouse(ix, iy)
-            if idx is not None:
+            if idx is not None and shift:
+                # Shift+click adds the box to the selection or takes it out
+                self.set_selection(set(self.selected_indices()) ^ {idx})
+                self.redraw_boxes(); self.update_sidebar_objects()
+            elif idx is not None and idx in self.selection:
+                # Dragging any selected box moves the whole selection
+                self.drawing = True; self.drag_action = "move_selection"; self.start_x, self.start_y = ix, iy
+            elif idx is not None:
+                self.selection = set()
                 self.selected_box_idx = idx; self.drawing = True; self.drag_action = "move"; self.start_x, self.start_y = ix, iy
                 self.redraw_boxes() # Will highlight sidebar
             else:
-                self.selected_box_idx = None; self.redraw_boxes()
+                # Empty space: rubber band selection (Shift adds to the current one)
+                if not shift: self.clear_selection()
+                self.band_adds = bool(shift)
+                self.drawing = True; self.drag_action = "rubber_band"; self.start_x, self.start_y = ix, iy
+                sx, sy = ix + self.img_ox, iy + self.img_oy
+                self.canvas.create_rectangle(sx, sy, sx, sy, outline="white", width=1, dash=(4, 2), tags="rubber_band")
+                self.redraw_boxes()
         
         elif mode == "Rect":
             self.drawing = True; self.start_x, self.start_y = ix, iy; self.selected_box_idx = None
@@ -1611,20 +2094,22 @@ class UltimateAnnotator(ctk.CTk):
         ix, iy = self.get_image_coords(event)
         mode = self.draw_mode_var.get()
 
-        if mode == "Edit" and self.selected_box_idx is not None:
+        if mode == "Edit" and self.drag_action == "rubber_band":
+            sx, sy = self.start_x + self.img_ox, self.start_y + self.img_oy
+            self.canvas.coords("rubber_band", sx, sy, ix + self.img_ox, iy + self.img_oy)
+        elif mode == "Edit" and self.drag_action == "move_selection":
+            dx, dy = (ix - self.start_x)/self.imscale, (iy - self.start_y)/self.imscale
+            self.store.move_many(self.selected_indices(), dx, dy)
+            self.start_x, self.start_y = ix, iy; self.redraw_boxes(); self.has_unsaved_changes = True
+        elif mode == "Edit" and self.selected_box_idx is not None:
             # --- FIX: Validate index ---
-            if self.selected_box_idx >= len(self.bboxes):
+            if not self.store.valid(self.selected_box_idx):
                 self.selected_box_idx = None
                 return
 
-            box = self.bboxes[self.selected_box_idx]
             dx, dy = (ix - self.start_x)/self.imscale, (iy - self.start_y)/self.imscale
-            if self.drag_action == "move":
-                box['x1'] += dx; box['x2'] += dx; box['y1'] += dy; box['y2'] += dy
-            elif self.drag_action == "tl": box['x1'] += dx; box['y1'] += dy
-            elif self.drag_action == "tr": box['x2'] += dx; box['y1'] += dy
-            elif self.drag_action == "bl": box['x1'] += dx; box['y2'] += dy
-            elif self.drag_action == "br": box['x2'] += dx; box['y2'] += dy
+            if self.drag_action == "move": self.store.move(self.selected_box_idx, dx, dy)
+            else: self.store.resize(self.selected_box_idx, self.drag_action, dx, dy)
             self.start_x, self.start_y = ix, iy; self.redraw_boxes(); self.has_unsaved_changes = True
         elif mode == "Rect":
             sx, sy = self.start_x + self.img_ox, self.start_y + self.img_oy
@@ -1633,16 +2118,27 @@ class UltimateAnnotator(ctk.CTk):
 
     def on_mouse_up(self, event):
         if self.is_processing: return
+        action = self.drag_action
         self.drawing = False; self.drag_action = None
         mode = self.draw_mode_var.get()
         
+        if mode == "Edit" and action == "rubber_band":
+            self.canvas.delete("rubber_band")
+            ix, iy = self.get_image_coords(event)
+            s = self.imscale
+            inside = self.store.boxes_in(self.start_x / s, self.start_y / s, ix / s, iy / s)
+            if self.band_adds: inside = set(inside) | set(self.selected_indices())
+            self.select_boxes(inside)
+            return
+        if mode == "Edit" and action == "move_selection":
+            self.store.normalize_many(self.selected_indices()) # One undo step for the whole selection
+            self.redraw_boxes()
+            return
         if mode == "Edit":
             if self.selected_box_idx is not None:
                 # --- FIX: Validate index ---
-                if self.selected_box_idx < len(self.bboxes):
-                    b = self.bboxes[self.selected_box_idx]
-                    b['x1'], b['x2'] = min(b['x1'], b['x2']), max(b['x1'], b['x2'])
-                    b['y1'], b['y2'] = min(b['y1'], b['y2']), max(b['y1'], b['y2'])
+                if self.store.valid(self.selected_box_idx):
+                    self.store.normalize(self.selected_box_idx)
                 else:
                     self.selected_box_idx = None
                 self.redraw_boxes()
@@ -1675,56 +2171,79 @@ class UltimateAnnotator(ctk.CTk):
                 try:
                     # Attempt to get selected class from radio variable
                     current_sel = int(self.selected_class_var.get())
-                    if 0 <= current_sel < len(self.classes):
+                    if 0 <= current_sel < len(self.classes) and not self.classes.is_retired(current_sel):
                         class_id = current_sel
                 except:
                     pass # Invalid selection
             
-            # If toggle OFF or invalid selection, ask user
+            # If toggle OFF or invalid selection, ask user; the box stays outlined meanwhile
             if class_id == -1:
                 self.is_processing = True 
-                self.update()
-                # Explicitly modal selection
-                dialog = ClassManagerDialog(self, selection_mode=True)
-                self.wait_window(dialog)
-                
-                if dialog.result is not None: 
-                    class_id = dialog.result
-                else: 
-                    self.after(200, lambda: setattr(self, 'is_processing', False))
-                    return 
-
-            self.clear_redo_stack() 
-            self.bboxes.append({"class_id": class_id, "x1": real_x1, "y1": real_y1, "x2": real_x2, "y2": real_y2, "visible": True})
-            self.has_unsaved_changes = True
-            
-            # Switch to Edit mode after drawing one box
-            self.set_mode("Edit")
-            
-            self.after(300, lambda: setattr(self, 'is_processing', False))
+                s = self.imscale
+                self.canvas.create_rectangle(real_x1 * s + self.img_ox, real_y1 * s + self.img_oy, real_x2 * s + self.img_ox, real_y2 * s + self.img_oy,
+                                             outline="#3498db", width=3, dash=(2,2), tags="pending_box")
+                image = self.pil_image
+
+                def chosen(class_id):
+                    self.canvas.delete("pending_box")
+                    if class_id is None or self.pil_image is not image: # Cancelled, or the image changed meanwhile
+                        self.after(200, lambda: setattr(self, 'is_processing', False))
+                        return
+                    self.add_new_box(make_box(class_id, real_x1, real_y1, real_x2, real_y2))
+                self.pick_class(chosen)
+                return
+
+            self.add_new_box(make_box(class_id, real_x1, real_y1, real_x2, real_y2))
+            return
             
         self.redraw_boxes()
         self.update_sidebar_objects()
 
+    def add_new_box(self, box):
+        self.store.add(box)
+        self.has_unsaved_changes = True
+        
+        # Switch to Edit mode after drawing one box
+        self.set_mode("Edit")
+        
+        self.after(300, lambda: setattr(self, 'is_processing', False))
+        self.redraw_boxes()
+        self.update_sidebar_objects()
+
     # --- Sidebar Object List & Visibility ---
     def toggle_show_all(self):
-        state = self.show_all_var.get()
-        for b in self.bboxes:
-            b['visible'] = state
+        self.store.set_all_visible(self.show_all_var.get())
         self.redraw_boxes()
         self.update_sidebar_objects()
 
     def on_single_vis_toggle(self, idx):
-        if 0 <= idx < len(self.bboxes):
-            self.bboxes[idx]['visible'] = not self.bboxes[idx].get('visible', True)
+        if self.store.valid(idx):
+            self.store.toggle_visible(idx)
             self.redraw_boxes()
             # Force sidebar update to toggle the eye icon
             self.update_sidebar_objects()
 
+    def make_object_row(self, parent):
+        # One sidebar row; built once, then reconfigured for whichever box it shows
+        row = ctk.CTkFrame(parent, fg_color="transparent")
+        # Theme tuples let CTk recolour these rows without a rebuild
+        btn_vis = ctk.CTkButton(row, text="", image=self.icon_vis_on, width=20, height=20, # Reduced size
+                                fg_color="transparent", hover_color=PS_GRAY_LIGHTER)
+        btn_vis.pack(side="left", padx=(5,0))
+        # Indicator - 10x10 Circle (Using CTkFrame for perfect shape)
+        ind = ctk.CTkFrame(row, fg_color="#999999", width=12, height=12, corner_radius=6)
+        ind.pack(side="left", padx=(5, 8))
+        btn = ctk.CTkButton(row, text="", anchor="w", fg_color="transparent", text_color=("#111", "#ddd"), height=20) # Reduced height
+        btn.pack(side="left", fill="x", expand=True)
+        sep = ctk.CTkFrame(parent, height=1, fg_color=("#ccc", "#2b2b2b"))
+        return {"frames": [row, sep], "vis": btn_vis, "ind": ind, "btn": btn, "state": None}
+
+    @traced("ui.update_sidebar_objects")
     def update_sidebar_objects(self):
-        for widget in self.scroll_objects.winfo_children(): widget.destroy()
-        
-        for i, box in enumerate(self.bboxes):
+        # Rows are pooled: only what changed since a row last showed something is reconfigured
+        self.vis_buttons = []
+        chosen = self.selection or {self.selected_box_idx}
+        for i, box in enumerate(self.store.boxes):
             cid = box['class_id']
             if cid < len(self.classes):
                 cls_name = self.classes[cid]
@@ -1732,71 +2251,38 @@ class UltimateAnnotator(ctk.CTk):
             else:
                 cls_name = "Unknown"
                 color = "#999999"
-            
-            row = ctk.CTkFrame(self.scroll_objects, fg_color="transparent")
-            row.pack(fill="x", pady=0) # Reduced padding
-            
-            # --- EYE VISIBILITY TOGGLE ---
             is_vis = box.get('visible', True)
-            
-            current_icon = self.icon_vis_on if is_vis else self.icon_vis_off
-            # Light Theme hover is dimmer than Dark Theme hover, handle dynamically
-            hover_color = PS_GRAY_LIGHTER[0] if self.theme_mode == "Light" else PS_GRAY_LIGHTER[1]
-
-            btn_vis = ctk.CTkButton(
-                row, 
-                text="", 
-                image=current_icon, 
-                width=20, # Reduced size
-                height=20, # Reduced size
-                fg_color="transparent", 
-                hover_color=hover_color,
-                command=lambda idx=i: self.on_single_vis_toggle(idx)
-            )
-            btn_vis.pack(side="left", padx=(5,0))
-            # ------------------------------
-
-            # Indicator - 10x10 Circle (Using CTkFrame for perfect shape)
-            ind = ctk.CTkFrame(row, fg_color=color, width=12, height=12, corner_radius=6)
-            ind.pack(side="left", padx=(5, 8))
-            
-            # Selection Button
-            text = f"{i+1}: {cls_name}"
-            # Highlight if selected
-            fg = "transparent"
-            tc = "#ddd"
-            
-            if self.theme_mode == "Light":
-                tc = "#111" if i != self.selected_box_idx else "#fff"
-            else:
-                tc = "#ddd" if i != self.selected_box_idx else "#fff"
-
-            if i == self.selected_box_idx:
-                fg = PS_ACTIVE[0] if self.theme_mode == "Light" else "#444"
-
-            btn = ctk.CTkButton(row, text=text, anchor="w", fg_color=fg, 
-                                text_color=tc, height=20, # Reduced height
-                                command=lambda idx=i: self.select_object_from_sidebar(idx))
-            btn.pack(side="left", fill="x", expand=True)
-
-            # --- SEPARATOR ---
-            sep_col = "#ccc" if self.theme_mode == "Light" else "#2b2b2b"
-            sep = ctk.CTkFrame(self.scroll_objects, height=1, fg_color=sep_col)
-            sep.pack(fill="x", pady=0)
+            selected = i in chosen
+            slot = self.object_rows.get(i)
+            state = (cls_name, color, is_vis, selected, self.icon_vis_on)
+            if slot["state"] != state:
+                slot["vis"].configure(image=self.icon_vis_on if is_vis else self.icon_vis_off,
+                                      command=lambda idx=i: self.on_single_vis_toggle(idx))
+                slot["ind"].configure(fg_color=color)
+                # Highlight if selected
+                slot["btn"].configure(text=f"{i+1}: {cls_name}", fg_color=(PS_ACTIVE[0], "#444") if selected else "transparent",
+                                      text_color="#fff" if selected else ("#111", "#ddd"),
+                                      command=lambda idx=i: self.select_object_from_sidebar(idx))
+                slot["state"] = state
+            self.vis_buttons.append((slot["vis"], is_vis))
+        n = len(self.store.boxes)
+        self.object_rows.hide_from(n)
+        if len(self.object_rows.slots) > max(n, SIDEBAR_POOL_KEEP): self.object_rows.trim(max(n, SIDEBAR_POOL_KEEP))
 
     def select_object_from_sidebar(self, idx):
-        self.selected_box_idx = idx
+        self.set_selection([] if idx is None else [idx])
         self.redraw_boxes()
         # Also need to refresh sidebar to show selection, but redraw_boxes calls highlight logic?
         # To avoid infinite loop, I won't call update_sidebar_objects in redraw_boxes.
         # But I need to visually update the list.
         self.update_sidebar_objects()
 
+    @traced("ui.redraw_boxes")
     def redraw_boxes(self):
         self.canvas.delete("box")
-        self.box_images = [] # Clear image cache
+        self.resources.begin_redraw() # Fills no longer on the canvas may now be evicted
         
-        for i, box in enumerate(self.bboxes):
+        for i, box in enumerate(self.store.boxes):
             # VISIBILITY CHECK
             if not box.get('visible', True):
                 continue
@@ -1810,23 +2296,20 @@ class UltimateAnnotator(ctk.CTk):
             sx2, sy2 = x2 + self.img_ox, y2 + self.img_oy
 
             cid = box['class_id']
-            # Use Fixed Colors
-            hex_c = self.get_class_color(cid)
+            # Colours are precomputed by the class registry
+            hex_c = self.classes.color(cid)
             
             # --- Smooth Transparent Mask (PIL) ---
             w_box = int(sx2 - sx1)
             h_box = int(sy2 - sy1)
             if w_box > 0 and h_box > 0:
-                # Convert hex to rgb
-                rgb = tuple(int(hex_c.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-                # Create semi-transparent image (alpha 64 approx 25%)
-                fill_img = Image.new('RGBA', (w_box, h_box), rgb + (64,))
-                tk_fill = ImageTk.PhotoImage(fill_img)
-                self.box_images.append(tk_fill) # Prevent GC
+                # Semi-transparent fill, shared by boxes of the same size and colour
+                tk_fill = self.resources.fill_image(w_box, h_box, self.classes.rgb(cid))
                 self.canvas.create_image(sx1, sy1, image=tk_fill, anchor='nw', tags="box")
 
-            width = 3 if i != self.selected_box_idx else 4
-            outline_color = hex_c if i != self.selected_box_idx else "white"
+            chosen = i == self.selected_box_idx or i in self.selection
+            width = 4 if chosen else 3
+            outline_color = "white" if chosen else hex_c
             # In light mode, selected box white outline might be invisible on white background? 
             # Actually white is usually visible on image. But if image is white...
             # Standard interaction: selection is usually white or cyan.
@@ -1840,6 +2323,7 @@ class UltimateAnnotator(ctk.CTk):
             
             if i != self.selected_box_idx:
                 lbl_text = f"{cid}: {self.classes[cid]}" if cid < len(self.classes) else f"{cid}: ?"
+                if 'score' in box: lbl_text += f" {box['score']:.2f}" # Model proposal
                 
                 # Create text first to get bbox
                 # Text color should be contrasting
@@ -1856,270 +2340,145 @@ class UltimateAnnotator(ctk.CTk):
         
         # Note: We do NOT call update_sidebar_objects here to avoid drag-lag. 
         # Sidebar updates happen on Add/Delete/Load or specific selection events.
+        if self.perf_overlay_var.get() and not self.overlay_job:
+            self.overlay_job = self.after_idle(self.draw_perf_overlay) # Once per burst of redraws
 
     def find_box_under_mouse(self, ix, iy):
-        for i in range(len(self.bboxes)-1, -1, -1):
-            # Check visibility before selecting
-            if not self.bboxes[i].get('visible', True): continue
-            
-            b = self.bboxes[i]
-            if b['x1']*self.imscale <= ix <= b['x2']*self.imscale and b['y1']*self.imscale <= iy <= b['y2']*self.imscale: return i
-        return None
+        return self.store.hit_test(ix / self.imscale, iy / self.imscale)
 
     def check_resize_handles(self, idx, ix, iy):
-        # --- FIX: Validate bounds ---
-        if idx is None or idx < 0 or idx >= len(self.bboxes):
-            return None
-            
-        b = self.bboxes[idx]; s = self.imscale; r = 8
-        coords = {'tl':(b['x1']*s,b['y1']*s), 'tr':(b['x2']*s,b['y1']*s), 'bl':(b['x1']*s,b['y2']*s), 'br':(b['x2']*s,b['y2']*s)}
-        for k, v in coords.items():
-            if abs(ix-v[0])<r and abs(iy-v[1])<r: return k
-        return None
+        # Handle radius is 8 screen pixels regardless of zoom
+        s = self.imscale
+        return self.store.handle_at(idx, ix / s, iy / s, 8 / s)
 
+    @traced("ui.save_annotation")
     def save_annotation(self):
         if not self.pil_image: return
         self.sync_classes_file()
-        img_path = self.image_list[self.current_index]
+        img_path = self.dataset.image_list[self.current_index]
         w, h = self.pil_image.size
         
         fmt = self.format_var.get()
-        
+
+        # Writers skip zero-area boxes; at least say so
+        dropped = sum(1 for b in self.store.boxes if not codecs.clip_box(b, w, h))
+        if dropped: print(f"Warning: {dropped} zero-area box(es) not written for {os.path.basename(img_path)}")
+        
+        if self.dataset.label_changed(img_path):
+            # Someone else saved this image since we loaded it
+            if not self.has_unsaved_changes: return # Nothing of ours to add; keep theirs
+            choice = messagebox.askyesnocancel("Labels Changed",
+                                               f"{os.path.basename(img_path)} was saved elsewhere after you opened it.\n\n"
+                                               "Yes: overwrite with your boxes\nNo: discard yours and load theirs\nCancel: keep editing")
+            if choice is None: return
+            if not choice:
+                self.has_unsaved_changes = False
+                if self.journal: self.journal.discard(img_path)
+                self.load_image_data()
+                return
+            self.dataset.remember_label(img_path) # Theirs is now the version we knowingly replace
+
         try:
-            if fmt == "YOLO":
-                self.save_yolo(img_path, w, h, self.bboxes)
-            elif fmt == "Pascal VOC":
-                self.save_voc(img_path, w, h, self.bboxes)
-            elif fmt == "COCO":
-                self.save_coco(img_path, w, h, self.bboxes)
-                
+            # Writes in the current format (or to the server) and records the new label stamp
+            annot_path = self.dataset.save_boxes(img_path, (w, h), self.store.boxes, self.classes)
+            print(f"Saved {fmt}: {annot_path}")
+            if self.journal: self.journal.saved(img_path, self.dataset.label_stamps.get(img_path)) # Edits from here on are journalled again
+
             self.has_unsaved_changes = False
-            self.annot_cache[img_path] = True # Mark current as annotated
-            self.highlight_current_file()
 
-            # We need to refresh the current listbox item text to show checkmark
-            # but that's expensive to find. 
-            # Easiest way is just calling refresh_file_list() but that might reset scroll.
-            # Efficient update for current item only:
-            try:
-                listbox_idx = self.filtered_indices.index(self.current_index)
-                prefix = "✔ "
-                text = f"{prefix}{os.path.basename(img_path)}"
-                self.file_listbox.delete(listbox_idx)
-                self.file_listbox.insert(listbox_idx, text)
-                self.file_listbox.selection_set(listbox_idx)
-            except: pass
+            # Keep the statistics in step without rescanning
+            if self.stats_engine and self.stats_engine.fmt == fmt:
+                self.stats_engine.update_file(img_path, self.store.boxes, w, h, self.classes)
+            self.highlight_current_file()
+            self.show_labelled_in_list(img_path)
 
         except Exception as e: 
             print(f"Error saving: {e}")
             messagebox.showerror("Error", f"Could not save file: {e}")
 
-    def save_yolo(self, img_path, w, h, boxes):
-        tp = self.get_annotation_path(img_path)
-        with open(tp, 'w') as f:
-            for b in boxes:
-                # Basic validation
-                x1, y1 = max(0, min(b['x1'], w)), max(0, min(b['y1'], h))
-                x2, y2 = max(0, min(b['x2'], w)), max(0, min(b['y2'], h))
-                if x2 <= x1 or y2 <= y1: continue
-                
-                bw, bh = x2 - x1, y2 - y1
-                cx, cy = x1 + bw/2, y1 + bh/2
-                
-                # Normalize
-                n_cx, n_cy = min(cx/w, 1.0), min(cy/h, 1.0)
-                n_w, n_h = min(bw/w, 1.0), min(bh/h, 1.0)
-                
-                f.write(f"{b['class_id']} {n_cx:.6f} {n_cy:.6f} {n_w:.6f} {n_h:.6f}\n")
-        print(f"Saved YOLO: {tp}")
-
-    def save_voc(self, img_path, w, h, boxes):
-        # Pascal VOC XML
-        root = ET.Element("annotation")
-        ET.SubElement(root, "folder").text = os.path.basename(os.path.dirname(img_path))
-        ET.SubElement(root, "filename").text = os.path.basename(img_path)
-        ET.SubElement(root, "path").text = img_path
-        
-        source = ET.SubElement(root, "source")
-        ET.SubElement(source, "database").text = "Unknown"
-        
-        size = ET.SubElement(root, "size")
-        ET.SubElement(size, "width").text = str(w)
-        ET.SubElement(size, "height").text = str(h)
-        ET.SubElement(size, "depth").text = "3"
-        
-        ET.SubElement(root, "segmented").text = "0"
-        
-        for b in boxes:
-            x1, y1 = max(0, min(b['x1'], w)), max(0, min(b['y1'], h))
-            x2, y2 = max(0, min(b['x2'], w)), max(0, min(b['y2'], h))
-            if x2 <= x1 or y2 <= y1: continue
-            
-            obj = ET.SubElement(root, "object")
-            cid = b['class_id']
-            cname = self.classes[cid] if cid < len(self.classes) else "unknown"
-            
-            ET.SubElement(obj, "name").text = cname
-            ET.SubElement(obj, "pose").text = "Unspecified"
-            ET.SubElement(obj, "truncated").text = "0"
-            ET.SubElement(obj, "difficult").text = "0"
-            
-            bndbox = ET.SubElement(obj, "bndbox")
-            ET.SubElement(bndbox, "xmin").text = str(int(x1))
-            ET.SubElement(bndbox, "ymin").text = str(int(y1))
-            ET.SubElement(bndbox, "xmax").text = str(int(x2))
-            ET.SubElement(bndbox, "ymax").text = str(int(y2))
-            
-        annot_path = self.get_annotation_path(img_path)
-        # Pretty print XML
-        xmlstr = minidom.parseString(ET.tostring(root)).toprettyxml(indent="   ")
-        with open(annot_path, "w") as f:
-            f.write(xmlstr)
-        print(f"Saved VOC: {annot_path}")
-
-    def save_coco(self, img_path, w, h, boxes):
-        # COCO JSON (Per-image standard structure)
-        # Structure: { "images": [...], "annotations": [...], "categories": [...] }
-        
-        images = [{
-            "id": 1, # Arbitrary ID for single-image mode
-            "width": w,
-            "height": h,
-            "file_name": os.path.basename(img_path)
-        }]
-        
-        categories = []
-        for i, cls_name in enumerate(self.classes):
-            categories.append({
-                "id": i + 1, # 1-based index is standard for COCO
-                "name": cls_name,
-                "supercategory": "none"
-            })
-            
-        annotations = []
-        for i, b in enumerate(boxes):
-            x1, y1 = max(0, min(b['x1'], w)), max(0, min(b['y1'], h))
-            x2, y2 = max(0, min(b['x2'], w)), max(0, min(b['y2'], h))
-            if x2 <= x1 or y2 <= y1: continue
-            
-            width = x2 - x1
-            height = y2 - y1
-            area = width * height
-            
-            # COCO bbox is [x_min, y_min, width, height]
-            annotations.append({
-                "id": i + 1,
-                "image_id": 1,
-                "category_id": b['class_id'] + 1, # Map to 1-based
-                "segmentation": [], # BBox only
-                "area": area,
-                "bbox": [x1, y1, width, height],
-                "iscrowd": 0
-            })
-            
-        data = {
-            "images": images,
-            "annotations": annotations,
-            "categories": categories
-        }
-            
-        annot_path = self.get_annotation_path(img_path)
-        with open(annot_path, "w") as f:
-            json.dump(data, f, indent=4)
-        print(f"Saved COCO: {annot_path}")
-
-    def load_annotations(self, img_path):
-        annot_path = self.get_annotation_path(img_path)
-        w_img, h_img = self.pil_image.size
-        
-        if not os.path.exists(annot_path): 
-            return None
-        
+    def show_labelled_in_list(self, img_path):
+        # We need to refresh the current listbox item text to show checkmark
+        # but that's expensive to find. 
+        # Easiest way is just calling refresh_file_list() but that might reset scroll.
+        # Efficient update for current item only:
         try:
-            print(f"Loading annotations from: {annot_path}")
-            ext = os.path.splitext(annot_path)[1].lower()
-            
-            if ext == ".txt":
-                # Load YOLO
-                with open(annot_path, 'r') as f:
-                    for line in f:
-                        p = line.split()
-                        if len(p) >= 5:
-                            cid = int(p[0])
-                            ncx, ncy, nw, nh = map(float, p[1:5])
-                            w, h = nw*w_img, nh*h_img
-                            cx, cy = ncx*w_img, ncy*h_img
-                            self.bboxes.append({"class_id": cid, "x1": cx-w/2, "y1": cy-h/2, "x2": cx+w/2, "y2": cy+h/2, "visible": True})
-                            
-            elif ext == ".xml":
-                # Load VOC
-                tree = ET.parse(annot_path)
-                root = tree.getroot()
-                for obj in root.findall("object"):
-                    name = obj.find("name").text
-                    bndbox = obj.find("bndbox")
-                    xmin = float(bndbox.find("xmin").text)
-                    ymin = float(bndbox.find("ymin").text)
-                    xmax = float(bndbox.find("xmax").text)
-                    ymax = float(bndbox.find("ymax").text)
-                    
-                    try: cid = self.classes.index(name)
-                    except ValueError: 
-                        self.classes.append(name)
-                        cid = len(self.classes) - 1
-                        
-                    self.bboxes.append({"class_id": cid, "x1": xmin, "y1": ymin, "x2": xmax, "y2": ymax, "visible": True})
-            
-            elif ext == ".json":
-                # Load COCO
-                with open(annot_path, 'r') as f:
-                    data = json.load(f)
-                    # We need to map category IDs back to internal 0-based index
-                    # Create a map first
-                    cat_map = {c['id']: c['name'] for c in data.get("categories", [])}
-                    
-                    for ann in data.get("annotations", []):
-                        cat_id = ann['category_id']
-                        name = cat_map.get(cat_id, "unknown")
-                        
-                        # Sync with class list
-                        if name not in self.classes:
-                            self.classes.append(name)
-                        cid = self.classes.index(name)
-                        
-                        # bbox is [x, y, w, h]
-                        x, y, w, h = ann['bbox']
-                        self.bboxes.append({"class_id": cid, "x1": x, "y1": y, "x2": x+w, "y2": y+h, "visible": True})
-            
-            return annot_path
+            listbox_idx = self.filtered_indices.index(self.dataset.image_list.index(img_path))
+            prefix = "✔ "
+            text = f"{prefix}{os.path.basename(img_path)}"
+            selected = self.file_listbox.selection_includes(listbox_idx)
+            self.file_listbox.delete(listbox_idx)
+            self.file_listbox.insert(listbox_idx, text)
+            if selected: self.file_listbox.selection_set(listbox_idx)
+        except: pass
 
+    def load_annotations(self, img_path, size, classes):
+        # Runs on the loader thread; `classes` is a private copy
+        journal = self.journal
+        if journal:
+            journal.flush(img_path) # Handed-off edits reach the label file before it is read again
+            if img_path in journal.conflicts: print(f"Journalled edits for {os.path.basename(img_path)} not written: {journal.conflicts[img_path]}")
+        try:
+            # VOC/COCO names missing from the class list get appended to it
+            boxes, annot_path = self.dataset.load_boxes(img_path, size, classes)
         except Exception as e:
-            print(f"Error loading {annot_path}: {e}")
-            return None
+            print(f"Error loading {self.get_annotation_path(img_path)}: {e}")
+            return [], None
+        if annot_path: print(f"Loading annotations from: {annot_path}")
+        return boxes, annot_path
 
     def delete_current_image(self):
-        if not self.image_list: return
-        p = self.image_list[self.current_index]
+        if not self.dataset.image_list or self.refuse_read_only("deleted"): return
+        p = self.dataset.image_list[self.current_index]
         if not messagebox.askyesno("Delete", f"Delete {os.path.basename(p)}?"): return
-        self.canvas.delete("all"); self.pil_image.close(); self.pil_image = None
+        self.canvas.delete("all"); self.release_image()
         os.remove(p)
         tp = self.get_txt_path(p)
         if os.path.exists(tp): os.remove(tp)
-        self.image_list.pop(self.current_index)
+        self.dataset.image_list.pop(self.current_index)
         
         # Clear cache for deleted file
-        if p in self.annot_cache:
-             del self.annot_cache[p]
+        self.dataset.invalidate(p)
 
         self.refresh_file_list()
-        if self.image_list:
-            if self.current_index >= len(self.image_list): self.current_index = len(self.image_list)-1
+        if self.dataset.image_list:
+            if self.current_index >= len(self.dataset.image_list): self.current_index = len(self.dataset.image_list)-1
             self.load_image_data()
         else: self.title("No Images")
 
-def main():
-    app = UltimateAnnotator()
-    app.mainloop()
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="annotamate", description="Bounding box annotation tool.")
+    parser.add_argument("directory", nargs="?", help="image directory or .zip/.tar archive to open (skips the folder dialog)")
+    parser.add_argument("--labels", metavar="DIR", help="label directory (default: next to the images, or <archive>_labels)")
+    parser.add_argument("--format", choices=list(codecs.FORMAT_EXTS), help="annotation format")
+    parser.add_argument("--shared", action="store_true",
+                        help="join the shared work queue: take a chunk of unlabelled images other instances won't get")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print a time-to-first-image breakdown and the hottest calls")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record timings of the editor's hot paths and write them as a Chrome trace on exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profile = None
+    if args.profile_startup:
+        from .perf import StartupProfile
+        profile = StartupProfile(start=_IMPORT_START)
+        profile.mark("imports", at=_IMPORTS_DONE)
+    if args.trace: tracer.enabled = tracer.recording = True
+    app = UltimateAnnotator(args.directory, args.labels, args.format, profile=profile, shared=args.shared)
+    try: app.mainloop()
+    finally:
+        if app.work_queue: app.work_queue.release()
+        app.stop_journal()
+        app.stop_preannotation()
+        if app.propagator: app.propagator.close()
+        app.decoder.shutdown()
+        if args.trace:
+            print(f"Wrote {tracer.save_trace(args.trace)} spans to {args.trace}")
+            tracer.report()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+# --- STARTUP PROFILE ---
+class StartupProfile:
+    """Wall-clock marks from process start to the first image on screen.
+
+    `mark(name)` records the time spent since the previous mark; `report()`
+    prints the phases and, when cProfile was enabled, the hottest calls.
+    """
+
+    def __init__(self, start=None, cprofile=True):
+        self.start = start if start is not None else time.perf_counter()
+        self.last = self.start
+        self.phases = [] # (name, seconds)
+        self.done = False
+        self.profiler = None
+        if cprofile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def mark(self, name, at=None):
+        now = at if at is not None else time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.start
+
+    def report(self, top=15, file=None):
+        if self.done: return
+        self.done = True
+        if self.profiler: self.profiler.disable()
+        print("--- Startup profile ---", file=file)
+        for name, dt in self.phases:
+            print(f"  {name:<24}{dt * 1000:9.1f} ms", file=file)
+        print(f"  {'total':<24}{self.total() * 1000:9.1f} ms", file=file)
+        if self.profiler:
+            import pstats
+            print(f"--- Top {top} calls by cumulative time ---", file=file)
+            pstats.Stats(self.profiler, stream=file).sort_stats("cumulative").print_stats(top)
+
+
+# --- RUNTIME TRACING ---
+TRACE_EVENTS = 200_000 # Spans kept for a trace export; the oldest go first
+
+
+class Tracer:
+    """Timers and counters for the editor's hot paths.
+
+    `span(name)` (a context manager) and `@traced(name)` time a block, and
+    `count(name)` bumps a counter. Per-name totals are always kept while
+    enabled; with `recording` the individual spans are kept too and can be
+    written as a Chrome trace (chrome://tracing, Perfetto). Disabled, a
+    timed call costs one attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.recording = False
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.reset()
+
+    def reset(self):
+        self.stats = {} # name -> [calls, total ns, last ns, max ns]
+        self.counters = {}
+        self.events = deque(maxlen=TRACE_EVENTS) # (name, thread id, start ns, duration ns)
+        self.threads = {}
+
+    def add(self, name, start, duration):
+        s = self.stats.get(name)
+        if s is None: s = self.stats[name] = [0, 0, 0, 0]
+        s[0] += 1
+        s[1] += duration
+        s[2] = duration
+        if duration > s[3]: s[3] = duration
+        if self.recording:
+            t = threading.current_thread()
+            self.threads.setdefault(t.ident, t.name)
+            self.events.append((name, t.ident, start, duration))
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try: yield
+        finally: self.add(name, start, time.perf_counter_ns() - start)
+
+    def count(self, name, n=1):
+        if self.enabled: self.counters[name] = self.counters.get(name, 0) + n
+
+    def last_ms(self, name):
+        s = self.stats.get(name)
+        return s[2] / 1e6 if s else None
+
+    def mean_ms(self, name):
+        s = self.stats.get(name)
+        return s[1] / s[0] / 1e6 if s else None
+
+    def hit_rate(self, hits, misses):
+        h, m = self.counters.get(hits, 0), self.counters.get(misses, 0)
+        return h / (h + m) if h + m else None
+
+    def summary(self):
+        """-> rows (name, calls, mean ms, max ms, total ms), slowest total first."""
+        rows = [(name, s[0], s[1] / s[0] / 1e6, s[3] / 1e6, s[1] / 1e6) for name, s in self.stats.items()]
+        return sorted(rows, key=lambda r: -r[4])
+
+    def report(self, file=None):
+        print("--- Timings ---", file=file)
+        print(f"  {'span':<28}{'calls':>7}{'mean ms':>10}{'max ms':>10}{'total ms':>11}", file=file)
+        for name, calls, mean, peak, total in self.summary():
+            print(f"  {name:<28}{calls:>7}{mean:>10.2f}{peak:>10.2f}{total:>11.1f}", file=file)
+        for name, n in sorted(self.counters.items()):
+            print(f"  {name:<28}{n:>7}", file=file)
+
+    def chrome_trace(self):
+        """Recorded spans in the Chrome trace event format (times in µs)."""
+        events = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": tname}}
+                  for tid, tname in self.threads.items()]
+        for name, tid, start, duration in list(self.events):
+            events.append({"name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": self.pid, "tid": tid,
+                           "ts": (start - self.origin) / 1000, "dur": duration / 1000})
+        if self.counters:
+            events.append({"name": "counters", "ph": "C", "pid": self.pid, "tid": 0,
+                           "ts": (time.perf_counter_ns() - self.origin) / 1000, "args": dict(self.counters)})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_trace(self, path):
+        with open(path, "w") as f: json.dump(self.chrome_trace(), f)
+        return len(self.events)
+
+
+tracer = Tracer() # One per process, shared by the GUI, the loader thread and the decoder
+
+
+def traced(name):
+    """Decorator form of `tracer.span(name)`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not tracer.enabled: return fn(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try: return fn(*args, **kwargs)
+            finally: tracer.add(name, start, time.perf_counter_ns() - start)
+        return inner
+    return wrap
@@ -0,0 +1,140 @@
+import customtkinter as ctk
+import tkinter as tk
+
+from .core.classes import ClassIndex
+from .theme import PS_GRAY_DARK, PS_GRAY_MED, PS_GRAY_LIGHT, PS_GRAY_LIGHTER, PS_TEXT_COLOR, PS_ACTIVE
+
+PICKER_ROWS = 10 # Result rows; built once, whatever the number of classes
+RECENT_KEEP = PICKER_ROWS
+
+
+# --- CLASS PICKER ---
+class ClassPicker(ctk.CTkToplevel):
+    """Keyboard class chooser for new and selected boxes.
+
+    One window built once and then shown and hidden. Typing searches a
+    ClassIndex (IDs, name and word prefixes, then letters in order) and
+    only reconfigures the fixed result rows, so thousands of classes cost
+    no widgets. Digits that can only mean one ID choose it at once; Enter
+    takes the highlighted row (or adds the typed name as a new class),
+    Up/Down move the highlight and Escape cancels. With nothing typed the
+    most recently used classes are listed.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.withdraw()
+        self.title("Pick Class")
+        self.parent = parent
+        self.transient(parent)
+        self.resizable(False, False)
+        self.configure(fg_color=PS_GRAY_MED)
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        self.callback = None
+        self.index = None
+        self.results = []
+        self.highlight = 0
+        self.recent = [] # Class IDs, most recent first
+
+        self.query = tk.StringVar()
+        self.entry = ctk.CTkEntry(self, textvariable=self.query, width=280, placeholder_text="Class name or ID...",
+                                  fg_color=PS_GRAY_DARK, border_color=PS_GRAY_LIGHT, text_color=PS_TEXT_COLOR)
+        self.entry.pack(fill="x", padx=10, pady=(10, 5))
+        self.rows = []
+        for k in range(PICKER_ROWS):
+            row = ctk.CTkFrame(self, fg_color="transparent", corner_radius=0)
+            row.pack(fill="x", padx=10)
+            ind = ctk.CTkFrame(row, fg_color="#999999", width=12, height=12, corner_radius=2)
+            ind.pack(side="left", padx=(5, 8))
+            btn = ctk.CTkButton(row, text="", anchor="w", height=22, fg_color="transparent", hover_color=PS_GRAY_LIGHTER,
+                                text_color=PS_TEXT_COLOR, command=lambda k=k: self.choose_row(k))
+            btn.pack(side="left", fill="x", expand=True)
+            self.rows.append({"ind": ind, "btn": btn, "state": None})
+        self.lbl_hint = ctk.CTkLabel(self, text="Enter: choose  ·  ↑↓: move  ·  Esc: cancel", font=("Arial", 11), text_color=PS_TEXT_COLOR)
+        self.lbl_hint.pack(pady=(5, 10))
+
+        self.query.trace_add("write", lambda *_: self.on_query())
+        self.bind("<Return>", lambda e: self.choose_row(self.highlight))
+        self.bind("<Escape>", lambda e: self.cancel())
+        self.bind("<Up>", lambda e: self.move_highlight(-1))
+        self.bind("<Down>", lambda e: self.move_highlight(1))
+
+    # --- Showing ---
+    def ask(self, callback, x=None, y=None):
+        """Shows the picker near (x, y) on screen; `callback(class_id or None)` once it closes."""
+        classes = self.parent.classes
+        if self.index is None or self.index.stale(classes): self.index = ClassIndex(classes) # Classes changed since last time
+        self.recent = [c for c in self.recent if c in self.index.active_set]
+        self.callback = callback
+        self.query.set("") # Lists the recent classes
+        if x is not None: self.geometry(f"+{max(x - 20, 0)}+{max(y - 20, 0)}")
+        self.deiconify()
+        self.lift()
+        self.grab_set() # Keys and clicks belong to the picker until it closes
+        self.entry.focus_force()
+
+    def hide(self):
+        self.grab_release()
+        self.withdraw()
+        self.parent.focus()
+
+    # --- Results ---
+    def on_query(self):
+        if self.callback is None: return
+        q = self.query.get().strip()
+        cid = self.index.complete_id(q)
+        if cid is not None: return self.choose(cid) # One keystroke for an unambiguous ID
+        if q: self.results = self.index.search(q, PICKER_ROWS)
+        else:
+            self.results = self.recent[:PICKER_ROWS]
+            self.results += [c for c in self.index.active[:PICKER_ROWS * 2] if c not in self.results][:PICKER_ROWS - len(self.results)]
+        self.highlight = 0
+        self.show_results()
+
+    def show_results(self):
+        for k, slot in enumerate(self.rows):
+            if k < len(self.results):
+                cid = self.results[k]
+                state = (cid, self.index.names[cid], self.parent.get_class_color(cid), k == self.highlight)
+            else:
+                state = None
+            if slot["state"] == state: continue # Only rows that show something new are touched
+            if state is None:
+                slot["btn"].configure(text="", fg_color="transparent", state="disabled")
+                slot["ind"].configure(fg_color=PS_GRAY_MED)
+            else:
+                cid, name, color, lit = state
+                slot["btn"].configure(text=f"{cid}: {name}", fg_color=PS_ACTIVE if lit else "transparent", state="normal")
+                slot["ind"].configure(fg_color=color)
+            slot["state"] = state
+        q = self.query.get().strip()
+        self.lbl_hint.configure(text=f"Enter: add class '{q}'  ·  Esc: cancel" if q and not self.results
+                                else "Enter: choose  ·  ↑↓: move  ·  Esc: cancel")
+
+    def move_highlight(self, step):
+        if not self.results: return
+        self.highlight = (self.highlight + step) % len(self.results)
+        self.show_results()
+
+    # --- Closing ---
+    def choose_row(self, k):
+        if self.callback is None: return
+        if k < len(self.results): return self.choose(self.results[k])
+        name = self.query.get().strip()
+        if name and not self.results:
+            self.parent.add_class(name)
+            if name in self.parent.classes: self.choose(self.parent.classes.index(name))
+
+    def choose(self, cid):
+        self.recent = [cid] + [c for c in self.recent if c != cid][:RECENT_KEEP - 1]
+        self.parent.selected_class_var.set(str(cid)) # Also the default class for new boxes
+        self._close(cid)
+
+    def cancel(self):
+        self._close(None)
+
+    def _close(self, result):
+        callback, self.callback = self.callback, None
+        self.hide()
+        if callback: callback(result)
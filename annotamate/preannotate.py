@@ -0,0 +1,342 @@
+import os
+import time
+import random
+import zlib
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from .core.archive import open_image, file_stamp, resolve
+from .core.project import project_dir, load_json, save_json, rel_key
+
+# Backend specs (picklable, so every worker can build its own detector):
+#   "stub"                       deterministic fake boxes, for testing the pipeline
+#   "onnx:/path/to/model.onnx"   YOLOv5/v8-style export run by ONNX Runtime on CPU
+#   "python:package.module:func" func(PIL.Image) -> [(class, x1, y1, x2, y2, score), ...]
+BACKENDS = ("stub", "onnx", "python")
+CACHE_NAME = "proposals.json"
+SAVE_EVERY = 25 # Flush the proposal cache after this many new results
+MAX_RESTARTS = 3 # Pools rebuilt after a worker died before giving up
+
+
+class PreannotateError(Exception):
+    pass
+
+
+# --- DETECTORS ---
+class Detector:
+    """Turns a PIL image into [(class, x1, y1, x2, y2, score), ...].
+
+    `class` is a name (str) or an index into the detector's `names`; boxes
+    are in image pixels.
+    """
+    names = []
+
+    def detect(self, image):
+        raise NotImplementedError
+
+
+class StubDetector(Detector):
+    # Same image in, same boxes out: seeded from the file name and size
+    def __init__(self, names, per_image=3):
+        self.names = list(names) or ["object"]
+        self.per_image = per_image
+
+    def detect(self, image):
+        w, h = image.size
+        seed = zlib.crc32(f"{os.path.basename(getattr(image, 'filename', '') or '')}|{w}x{h}".encode())
+        rng = random.Random(seed)
+        out = []
+        for _ in range(self.per_image):
+            bw, bh = rng.uniform(0.05, 0.4) * w, rng.uniform(0.05, 0.4) * h
+            x1, y1 = rng.uniform(0, w - bw), rng.uniform(0, h - bh)
+            out.append((rng.randrange(len(self.names)), x1, y1, x1 + bw, y1 + bh, round(rng.uniform(0.3, 0.99), 3)))
+        return out
+
+
+class CallableDetector(Detector):
+    def __init__(self, target, names):
+        module, _, attr = target.partition(":")
+        if not attr: raise PreannotateError(f"Expected 'module:function', got '{target}'")
+        self.fn = getattr(importlib.import_module(module), attr)
+        self.names = list(names)
+
+    def detect(self, image):
+        return list(self.fn(image))
+
+
+class OnnxDetector(Detector):
+    """YOLO-style ONNX model on the CPU execution provider.
+
+    Handles both output layouts: v5 (N, 5+nc) with objectness and v8
+    (4+nc, N). Class names come from the model metadata when present.
+    """
+
+    def __init__(self, model_path, names, input_size=640, iou=0.45):
+        try:
+            import numpy as np
+            import onnxruntime as ort
+        except ImportError as e:
+            raise PreannotateError(f"ONNX backend needs numpy and onnxruntime ({e})")
+        self.np = np
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1 # One thread per worker process; the pool provides the parallelism
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input = self.session.get_inputs()[0]
+        shape = self.input.shape
+        self.size = shape[2] if isinstance(shape[2], int) else input_size
+        self.iou = iou
+        self.names = self._model_names() or list(names)
+
+    def _model_names(self):
+        import ast
+        meta = self.session.get_modelmeta().custom_metadata_map
+        try:
+            names = ast.literal_eval(meta.get("names", ""))
+        except (ValueError, SyntaxError):
+            return None
+        if isinstance(names, dict): return [names[k] for k in sorted(names)]
+        return list(names) if isinstance(names, (list, tuple)) else None
+
+    def detect(self, image):
+        np = self.np
+        w, h = image.size
+        # Letterbox to the model size
+        r = min(self.size / w, self.size / h)
+        nw, nh = int(round(w * r)), int(round(h * r))
+        px, py = (self.size - nw) // 2, (self.size - nh) // 2
+        canvas = Image.new("RGB", (self.size, self.size), (114, 114, 114))
+        canvas.paste(image.convert("RGB").resize((nw, nh), Image.Resampling.BILINEAR), (px, py))
+        x = np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1)[None] / 255.0
+
+        out = self.session.run(None, {self.input.name: x})[0][0]
+        if out.shape[0] < out.shape[1]: out = out.T # v8: (4+nc, N) -> (N, 4+nc)
+        nc = len(self.names)
+        if nc and out.shape[1] == 5 + nc: # v5: objectness column
+            scores = out[:, 5:] * out[:, 4:5]
+        else:
+            scores = out[:, 4:]
+        cls = scores.argmax(1)
+        conf = scores[np.arange(len(cls)), cls]
+        keep = conf > 0.001
+        boxes, cls, conf = out[keep, :4], cls[keep], conf[keep]
+
+        # cx, cy, w, h in letterbox space -> x1, y1, x2, y2 in image pixels
+        xy = np.empty_like(boxes)
+        xy[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - px) / r
+        xy[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - py) / r
+        xy[:, 2] = (boxes[:, 0] + boxes[:, 2] / 2 - px) / r
+        xy[:, 3] = (boxes[:, 1] + boxes[:, 3] / 2 - py) / r
+        xy[:, [0, 2]] = xy[:, [0, 2]].clip(0, w)
+        xy[:, [1, 3]] = xy[:, [1, 3]].clip(0, h)
+        idx = nms(np, xy, conf, cls, self.iou)
+        return [(int(cls[i]), *map(float, xy[i]), round(float(conf[i]), 3)) for i in idx]
+
+
+def nms(np, boxes, scores, classes, iou):
+    # Class-aware greedy NMS (offsetting boxes per class keeps classes apart)
+    off = boxes + (classes[:, None] * 4096.0)
+    areas = (off[:, 2] - off[:, 0]) * (off[:, 3] - off[:, 1])
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(off[i, 0], off[order[1:], 0]); yy1 = np.maximum(off[i, 1], off[order[1:], 1])
+        xx2 = np.minimum(off[i, 2], off[order[1:], 2]); yy2 = np.minimum(off[i, 3], off[order[1:], 3])
+        inter = (xx2 - xx1).clip(0) * (yy2 - yy1).clip(0)
+        ov = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][ov <= iou]
+    return keep
+
+
+def make_detector(spec, names):
+    kind, _, arg = spec.partition(":")
+    if kind == "stub": return StubDetector(names)
+    if kind == "onnx":
+        if not os.path.isfile(arg): raise PreannotateError(f"Model not found: {arg}")
+        return OnnxDetector(arg, names)
+    if kind == "python": return CallableDetector(arg, names)
+    raise PreannotateError(f"Unknown backend '{kind}' (expected one of {', '.join(BACKENDS)})")
+
+
+def detector_id(spec):
+    # Proposals are only reused for the exact same model file
+    kind, _, arg = spec.partition(":")
+    if kind == "onnx" and os.path.isfile(arg):
+        st = os.stat(arg)
+        return f"{spec}|{st.st_mtime_ns}|{st.st_size}"
+    return spec
+
+
+# --- WORKER SIDE ---
+_detector = None
+
+
+def _init_worker(spec, names):
+    global _detector
+    _detector = make_detector(spec, names)
+
+
+def _detect_job(path, src, stamp):
+    # -> (path, stamp, [[class name, x1, y1, x2, y2, score], ...], seconds)
+    t0 = time.perf_counter() # Decode counts: it is part of the per-image cost
+    with open_image(src) as im:
+        im.load()
+        raw = _detector.detect(im)
+    dt = time.perf_counter() - t0
+    names = _detector.names
+    out = []
+    for c, x1, y1, x2, y2, score in raw:
+        if not isinstance(c, str): c = names[c] if 0 <= c < len(names) else str(c)
+        out.append([c, round(x1, 2), round(y1, 2), round(x2, 2), round(y2, 2), float(score)])
+    return path, list(stamp), out, dt
+
+
+# --- SCHEDULER ---
+class PreAnnotator:
+    """Runs a detector in a process pool ahead of the annotator.
+
+    `advance(index)` keeps up to `lookahead` images after `index` queued;
+    finished proposals are cached per image (keyed by its path under
+    `image_root` and checked against mtime and size) in the project dir, so
+    moving back and forth or reopening the folder does not re-run the model.
+    `proposals(path)` returns the cached result or None.
+    """
+
+    def __init__(self, image_list, cache_root, spec, classes, workers=2, lookahead=16, image_root=None):
+        self.image_list = list(image_list)
+        self.image_root = image_root or cache_root
+        self.spec = spec
+        self.workers = max(1, workers)
+        self.lookahead = lookahead
+        # Fail here, in the caller, rather than in every worker
+        self.names = make_detector(spec, classes).names
+        self.cache_path = os.path.join(project_dir(cache_root), CACHE_NAME)
+        cache = load_json(self.cache_path, {})
+        self.detector = detector_id(spec)
+        self.entries = cache.get("images", {}) if cache.get("detector") == self.detector else {}
+        self.lock = threading.Lock()
+        self.inflight = {} # path -> future
+        self.unsaved = 0
+        self.errors = 0
+        self.times = [] # Decode + detect seconds per image
+        self.started = None
+        self.finished = None
+        self.restarts = 0
+        self.broken = None # Why the pool was given up on, once workers keep dying
+        self.initargs = (spec, list(classes))
+        self.pool = self._new_pool()
+
+    def _new_pool(self):
+        # Long-lived pool next to a running Tk: spawn rather than fork
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=self.initargs)
+
+    def _fresh(self, path):
+        e = self.entries.get(rel_key(path, self.image_root))
+        if not e: return None
+        try: stamp = file_stamp(path)
+        except OSError: return None
+        return e if e["stamp"] == list(stamp) else None
+
+    def proposals(self, path):
+        with self.lock:
+            e = self._fresh(path)
+        return e["boxes"] if e else None
+
+    def advance(self, index):
+        submitted = []
+        with self.lock:
+            budget = self.workers * 2 - len(self.inflight) # Keep the queue short so it can follow the user
+            for path in self.image_list[index:index + self.lookahead]:
+                if budget <= 0 or self.broken: break
+                if path in self.inflight or self._fresh(path): continue
+                if self.started is None: self.started = time.perf_counter()
+                try: fut = self.pool.submit(_detect_job, path, resolve(path), file_stamp(path))
+                except OSError: continue # Gone since the folder was scanned
+                except BrokenProcessPool as e:
+                    self._restart(e) # A worker died; its futures fail on their own
+                    continue
+                self.inflight[path] = fut
+                submitted.append((path, fut))
+                budget -= 1
+        # Outside the lock: a future that is already done runs its callback right here
+        for path, fut in submitted: fut.add_done_callback(lambda f, p=path: self._done(p, f))
+
+    def _restart(self, error):
+        # Caller holds self.lock
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.restarts >= MAX_RESTARTS:
+            self.broken = f"workers keep dying ({error})"
+            print(f"Pre-annotation stopped: {self.broken}")
+            return
+        self.restarts += 1
+        print(f"Pre-annotation worker died, restarting the pool ({error})")
+        self.pool = self._new_pool()
+
+    def _done(self, path, fut):
+        with self.lock:
+            self.inflight.pop(path, None)
+            if fut.cancelled(): return
+            try:
+                _, stamp, boxes, dt = fut.result()
+            except Exception as e:
+                self.errors += 1
+                print(f"Pre-annotation failed for {os.path.basename(path)}: {e}")
+                return
+            self.entries[rel_key(path, self.image_root)] = {"stamp": stamp, "boxes": boxes}
+            self.times.append(dt)
+            self.finished = time.perf_counter()
+            self.unsaved += 1
+            flush = self.unsaved >= SAVE_EVERY
+        if flush: self.save()
+
+    def pending(self):
+        with self.lock: return len(self.inflight)
+
+    def save(self):
+        with self.lock:
+            data = {"detector": self.detector, "images": dict(self.entries)}
+            self.unsaved = 0
+        save_json(self.cache_path, data)
+
+    def report(self):
+        """Throughput of this session's detector runs (cache hits excluded)."""
+        with self.lock:
+            times = sorted(self.times)
+            n = len(times)
+            wall = (self.finished - self.started) if n and self.started else 0.0
+            return {
+                "backend": self.spec,
+                "workers": self.workers,
+                "images": n,
+                "errors": self.errors,
+                "stopped": self.broken,
+                "cached": len(self.entries),
+                "wall_seconds": round(wall, 3),
+                "images_per_second": round(n / wall, 2) if wall > 0 else None,
+                "mean_ms": round(1000 * sum(times) / n, 1) if n else None,
+                "p95_ms": round(1000 * times[min(n - 1, int(n * 0.95))], 1) if n else None,
+            }
+
+    def close(self):
+        with self.lock: inflight = list(self.inflight.values())
+        for fut in inflight: fut.cancel() # Runs _done, which takes the lock
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.unsaved: self.save()
+
+
+def to_boxes(proposals, classes, min_score=0.0):
+    """Cached proposals -> editor box dicts; unknown class names are appended to `classes`."""
+    from .core.boxes import make_box
+    boxes = []
+    for name, x1, y1, x2, y2, score in proposals:
+        if score < min_score: continue
+        if name not in classes: classes.append(name)
+        boxes.append(make_box(classes.index(name), x1, y1, x2, y2, score=score))
+    return boxes
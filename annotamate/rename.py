@@ -0,0 +1,199 @@
+import os
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import codecs
+from .core.project import project_dir, load_json
+
+JOURNAL_NAME = "rename_journal.json"
+
+# Journal phases. Files only ever sit in two of {src, tmp, dst} per phase,
+# so where each file is can be read from disk without per-file bookkeeping.
+PLANNED = "planned"       # nothing moved yet
+FORWARD_1 = "forward_1"   # src -> tmp
+FORWARD_2 = "forward_2"   # tmp -> dst
+BACKWARD_1 = "backward_1" # dst -> tmp
+BACKWARD_2 = "backward_2" # tmp -> src
+
+LABEL_EXTS = tuple(codecs.FORMAT_EXTS.values())
+
+
+class RenameError(Exception):
+    pass
+
+
+class RollbackError(RenameError):
+    """A rename failed and undoing it failed too: files sit under mixed names until the journal is resumed or rolled back."""
+
+    def __init__(self, message, journal_path):
+        super().__init__(message)
+        self.journal_path = journal_path
+
+
+def _listdir(d, cache):
+    if d not in cache:
+        try: cache[d] = set(os.listdir(d))
+        except OSError: cache[d] = set()
+    return cache[d]
+
+
+def plan_renames(mapping, label_dirs=()):
+    """Expands {old_image: new_image} to every file that must move with it.
+
+    Label files in every format are looked up next to the image and in each
+    of label_dirs. Raises RenameError if any target would clobber a file that
+    is not itself being renamed away, or if two files claim the same target.
+    Returns a list of (src, dst) pairs.
+    """
+    listing = {}
+    ops = []
+    for old, new in mapping.items():
+        if old != new: ops.append((old, new))
+        old_stem = os.path.splitext(os.path.basename(old))[0]
+        new_stem = os.path.splitext(os.path.basename(new))[0]
+        if old_stem == new_stem: continue
+        dirs = [os.path.dirname(old)] + [d for d in label_dirs if d]
+        for d in dict.fromkeys(dirs): # Keep order, drop duplicates
+            names = _listdir(d, listing)
+            for ext in LABEL_EXTS:
+                if old_stem + ext in names and old_stem + ext != "classes.txt":
+                    ops.append((os.path.join(d, old_stem + ext), os.path.join(d, new_stem + ext)))
+
+    problems = []
+    sources = set()
+    targets = {}
+    for src, dst in ops:
+        if src in sources: problems.append(f"{os.path.basename(src)} would be renamed twice")
+        sources.add(src)
+        if dst in targets: problems.append(f"{os.path.basename(targets[dst])} and {os.path.basename(src)} both become {os.path.basename(dst)}")
+        targets[dst] = src
+    for src, dst in ops:
+        d, name = os.path.split(dst)
+        if name in _listdir(d, listing) and dst not in sources:
+            problems.append(f"{name} already exists")
+    if problems:
+        shown = "\n".join(problems[:10])
+        more = f"\n... and {len(problems) - 10} more" if len(problems) > 10 else ""
+        raise RenameError(f"{len(problems)} conflict(s):\n{shown}{more}")
+    return ops
+
+
+def plan_batch_rename(image_list, base_name, start_num, digits, label_dirs=()):
+    """Plans base_NNNN.ext names for every image. Returns (ops, new_image_list)."""
+    mapping = {}
+    new_list = []
+    for i, old in enumerate(image_list):
+        ext = os.path.splitext(old)[1]
+        new = os.path.join(os.path.dirname(old), f"{base_name}_{str(start_num + i).zfill(digits)}{ext}")
+        mapping[old] = new
+        new_list.append(new)
+    return plan_renames(mapping, label_dirs), new_list
+
+
+# --- TRANSACTION ---
+class RenameTransaction:
+    """Two-phase rename (everything to unique temp names, then to targets).
+
+    Going through temp names makes swaps and chains (a->b, b->c) safe. A
+    journal in the project directory records the phase, so a crash can be
+    rolled back or resumed with pending_transaction().
+    """
+
+    def __init__(self, ops, journal_path, txid=None, phase=PLANNED):
+        self.txid = txid or uuid.uuid4().hex[:8]
+        self.journal_path = journal_path
+        self.phase = phase
+        self.ops = [] # [src, tmp, dst]
+        for i, (src, dst) in enumerate(ops):
+            tmp = os.path.join(os.path.dirname(dst), f".{self.txid}.{i}.renaming")
+            self.ops.append((src, tmp, dst))
+
+    @classmethod
+    def load(cls, journal_path):
+        data = load_json(journal_path)
+        if not data: return None
+        tx = cls([], journal_path, data["txid"], data["phase"])
+        tx.ops = [tuple(op) for op in data["ops"]]
+        return tx
+
+    def _write_journal(self, phase):
+        self.phase = phase
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"txid": self.txid, "phase": phase, "ops": self.ops}, f)
+            f.flush(); os.fsync(f.fileno()) # The journal must hit disk before files move
+        os.replace(tmp, self.journal_path)
+
+    def _move_all(self, a, b, workers, missing="error"):
+        # Moves every op's file from position a to b of (src, tmp, dst). Renames
+        # inside one phase are independent, so they run concurrently. A file
+        # missing from position a is
+        #   "error": deleted since planning, reported (a fresh phase)
+        #   "moved": skipped if it sits at another of its names (resuming a phase)
+        #   "skip":  skipped (rolling back: restore whatever is there)
+        def move(op):
+            if not os.path.exists(op[a]):
+                if missing == "skip" or missing == "moved" and any(os.path.exists(p) for p in op): return None
+                return f"{op[a]}: no such file"
+            try: os.rename(op[a], op[b]); return None
+            except OSError as e: return f"{op[a]}: {e}"
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            errors = [e for e in pool.map(move, self.ops, chunksize=64) if e]
+        if errors: raise RenameError(f"{len(errors)} file(s) failed, first: {errors[0]}")
+
+    def _forward(self, workers):
+        if self.phase in (PLANNED, FORWARD_1):
+            missing = "moved" if self.phase == FORWARD_1 else "error"
+            self._write_journal(FORWARD_1)
+            self._move_all(0, 1, workers, missing)
+        missing = "moved" if self.phase == FORWARD_2 else "error"
+        self._write_journal(FORWARD_2)
+        self._move_all(1, 2, workers, missing)
+
+    def _backward(self, workers):
+        if self.phase in (FORWARD_2, BACKWARD_1):
+            self._write_journal(BACKWARD_1)
+            self._move_all(2, 1, workers, "skip")
+        self._write_journal(BACKWARD_2)
+        self._move_all(1, 0, workers, "skip")
+
+    def _finish(self):
+        try: os.remove(self.journal_path)
+        except OSError: pass
+
+    def execute(self, workers=16):
+        """Runs the rename; on failure rolls back and re-raises."""
+        if not self.ops: return
+        try:
+            self._forward(workers)
+        except Exception:
+            try: self._backward(workers)
+            except Exception as e:
+                raise RollbackError(f"Rename failed and rollback failed too ({e}). Journal kept at {self.journal_path}", self.journal_path)
+            self._finish()
+            raise
+        self._finish()
+
+    def resume(self, workers=16):
+        if self.phase in (BACKWARD_1, BACKWARD_2): self._backward(workers)
+        else: self._forward(workers)
+        self._finish()
+
+    def rollback(self, workers=16):
+        if self.phase == PLANNED:
+            self._finish()
+            return
+        self._backward(workers)
+        self._finish()
+
+
+def journal_path(root):
+    return os.path.join(project_dir(root), JOURNAL_NAME)
+
+
+def pending_transaction(root):
+    """Returns an interrupted RenameTransaction for the project, if any."""
+    path = os.path.join(project_dir(root, create=False), JOURNAL_NAME)
+    if not os.path.exists(path): return None
+    return RenameTransaction.load(path)
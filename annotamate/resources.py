@@ -0,0 +1,159 @@
+import os
+import sys
+import weakref
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+# Tk-side resources with explicit lifetimes. Everything the editor creates
+# per image or per redraw (Tk photo images, sidebar rows) comes from here,
+# so a long session reuses a bounded set instead of growing one.
+FILL_CACHE_PIXELS = 16_000_000 # Box fill images kept between redraws (~64 MB of RGBA in Tk)
+FILL_ALPHA = 64 # ~25% opacity
+
+
+# --- PROCESS COUNTERS ---
+def rss_bytes():
+    """Resident set size now (not the peak), or None where it can't be read."""
+    try:
+        import psutil # Optional; the /proc fallback covers Linux
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def open_handles():
+    """Open file descriptors (handles on Windows), or None where they can't be counted."""
+    try:
+        import psutil
+        p = psutil.Process()
+        return p.num_handles() if sys.platform == "win32" else p.num_fds()
+    except ImportError:
+        pass
+    for d in ("/proc/self/fd", "/dev/fd"):
+        try: return len(os.listdir(d))
+        except OSError: continue
+    return None
+
+
+# --- WIDGET POOL ---
+class WidgetPool:
+    """Rows of widgets built once by `factory(parent)` and then reconfigured.
+
+    `get(i)` returns slot i (built on first use) and shows it; `hide_from(n)`
+    unpacks every slot from n on. Slots are only ever hidden as a suffix and
+    shown in order, so re-packing keeps them in sequence. `trim(keep)`
+    destroys idle slots past `keep`.
+    """
+
+    def __init__(self, parent, factory, pack):
+        self.parent = parent
+        self.factory = factory # parent -> dict of widgets, with the packed ones under "frames"
+        self.pack = pack # slot -> None; packs slot["frames"] in order
+        self.slots = []
+        self.shown = 0
+
+    def get(self, i):
+        while len(self.slots) <= i: self.slots.append(self.factory(self.parent))
+        if i >= self.shown:
+            for j in range(self.shown, i + 1): self.pack(self.slots[j])
+            self.shown = i + 1
+        return self.slots[i]
+
+    def hide_from(self, n):
+        for slot in self.slots[n:self.shown]:
+            for w in slot["frames"]: w.pack_forget()
+        self.shown = min(self.shown, n)
+
+    def trim(self, keep):
+        self.hide_from(keep)
+        for slot in self.slots[keep:]:
+            for w in slot["frames"]: w.destroy()
+        del self.slots[keep:]
+
+    def __len__(self):
+        return self.shown
+
+
+# --- GOVERNOR ---
+class ResourceGovernor:
+    """Owns the editor's Tk images and tracks its PIL frames.
+
+    - Box fills are cached by (size, colour) with a pixel budget, trimmed
+      at the start of each redraw so every fill on screen stays alive.
+    - The main frame is one Tk photo that is pasted into while the size
+      stays the same (video frames, resizes back and forth).
+    - Decoded frames are registered so `snapshot()` can report how many
+      are still alive.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.fills = OrderedDict() # (w, h, rgb) -> PhotoImage
+        self.fill_pixels = 0
+        self.frame = None # Current main-canvas PhotoImage
+        self.frame_key = None # (size, mode) it was built for
+        self.images = weakref.WeakSet() # Live decoded frames
+
+    # --- Box fills ---
+    def begin_redraw(self):
+        # Fills from the previous redraw are off the canvas now; bring the cache back under budget
+        while self.fill_pixels > FILL_CACHE_PIXELS and self.fills:
+            (w, h, _), _ = self.fills.popitem(last=False)
+            self.fill_pixels -= w * h
+
+    def fill_image(self, w, h, rgb):
+        key = (w, h, rgb)
+        photo = self.fills.get(key)
+        if photo is not None:
+            self.fills.move_to_end(key)
+            return photo
+        photo = self.fills[key] = ImageTk.PhotoImage(Image.new("RGBA", (w, h), rgb + (FILL_ALPHA,)))
+        self.fill_pixels += w * h
+        return photo
+
+    # --- Main frame ---
+    def frame_photo(self, im):
+        """PhotoImage showing `im`, reusing the current one when the size matches."""
+        key = (im.size, im.mode)
+        if self.frame is not None and self.frame_key == key:
+            self.frame.paste(im)
+        else:
+            self.frame = ImageTk.PhotoImage(im)
+            self.frame_key = key
+        return self.frame
+
+    def drop_frame(self):
+        self.frame = None
+        self.frame_key = None
+
+    # --- Frames ---
+    def track(self, im):
+        self.images.add(im)
+        return im
+
+    def clear(self):
+        self.fills.clear()
+        self.fill_pixels = 0
+        self.drop_frame()
+
+    # --- Accounting ---
+    def tk_image_count(self):
+        return len(self.widget.tk.call("image", "names"))
+
+    def widget_count(self):
+        n, stack = 0, [self.widget]
+        while stack:
+            w = stack.pop()
+            n += 1
+            stack.extend(w.winfo_children())
+        return n
+
+    def snapshot(self):
+        """Counters a long session should keep flat."""
+        return {"rss": rss_bytes(), "handles": open_handles(), "tk_images": self.tk_image_count(),
+                "widgets": self.widget_count(), "pil_images": len(self.images), "fills": len(self.fills)}
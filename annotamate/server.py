@@ -0,0 +1,299 @@
+import io
+import os
+import json
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from PIL import Image
+
+from .core import Dataset, codecs
+from .core.boxes import box_to_json, box_from_json
+from .core.archive import open_image, read_bytes, file_stamp, split_member
+from .core.classes import DEFAULT_CLASSES, ClassRegistry
+
+DEFAULT_PORT = 8642
+CACHE_BYTES = 256 * 1024 * 1024 # Scaled images kept in memory, least recently used first out
+PREVIEW_QUALITY = 85
+MAX_BATCH = 256 # Labels per batched fetch
+MIME = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".bmp": "image/bmp"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def image_name(path):
+    # Archive members keep their folders ("x/1.jpg"), so same-named ones stay apart
+    member = split_member(path)
+    return member[1] if member else os.path.basename(path)
+
+
+# --- DATASET SERVICE ---
+class AnnotationService:
+    """The dataset operations the HTTP API exposes, without the HTTP.
+
+    Images are addressed by file name. Boxes travel with class *names* so
+    clients with a differently ordered class list still agree on meaning;
+    saves carry the label stamp the client last saw and are refused (409)
+    if the file changed since.
+    """
+
+    def __init__(self, image_dir, label_dir=None, fmt="YOLO"):
+        self.dataset = Dataset(image_dir, label_dir, fmt)
+        self.classes = self.dataset.load_classes() or ClassRegistry(DEFAULT_CLASSES)
+        self.by_name = {image_name(p): p for p in self.dataset.image_list}
+        self.lock = threading.Lock() # Label writes and the class list
+        self.cache = OrderedDict() # (name, max side, stamp) -> (bytes, mime)
+        self.cache_bytes = 0
+        self.cache_lock = threading.Lock()
+        self.sizes = {} # name -> (stamp, (w, h))
+        self.stats = None
+        self.stats_lock = threading.Lock() # Rescans wait here, not on label reads and writes
+
+    def path(self, name):
+        p = self.by_name.get(name)
+        if p is None: raise ApiError(404, f"No such image: {name}")
+        return p
+
+    def stamp(self, name):
+        try: return list(file_stamp(self.path(name)))
+        except OSError: raise ApiError(404, f"Image is gone: {name}")
+
+    def size(self, name):
+        stamp = self.stamp(name)
+        hit = self.sizes.get(name)
+        if hit and hit[0] == stamp: return hit[1]
+        with open_image(self.path(name)) as im: size = im.size # Header only
+        self.sizes[name] = (stamp, size)
+        return size
+
+    # --- Listing ---
+    def info(self):
+        return {"format": self.dataset.fmt, "classes": list(self.classes), "count": len(self.dataset.image_list),
+                "read_only": self.dataset.read_only}
+
+    def images(self):
+        out = []
+        for p in self.dataset.image_list:
+            name = image_name(p)
+            try: stamp = list(file_stamp(p))
+            except OSError: continue
+            out.append([name, self.dataset.has_annotation(p), stamp])
+        return {"format": self.dataset.fmt, "classes": list(self.classes), "images": out}
+
+    # --- Images ---
+    def _mime(self, name, max_side):
+        return MIME.get(os.path.splitext(name)[1].lower(), "application/octet-stream") if not max_side else "image/jpeg"
+
+    def image_head(self, name, max_side=None):
+        """-> (mime type, etag, byte length or None) from the file stamp, without reading the image."""
+        stamp = self.stamp(name)
+        etag = f'"{stamp[0]:x}-{stamp[1]:x}-{max_side or 0}"'
+        if not max_side: return self._mime(name, max_side), etag, stamp[1]
+        with self.cache_lock: hit = self.cache.get((name, max_side, tuple(stamp)))
+        return self._mime(name, max_side), etag, len(hit[0]) if hit else None
+
+    def image(self, name, max_side=None):
+        """-> (bytes, mime type, etag). Originals are sent as stored; scaled
+        copies are JPEG-encoded once and then served from the LRU cache."""
+        p = self.path(name)
+        stamp = self.stamp(name)
+        etag = f'"{stamp[0]:x}-{stamp[1]:x}-{max_side or 0}"'
+        if not max_side: return read_bytes(p), self._mime(name, max_side), etag
+        key = (name, max_side, tuple(stamp))
+        with self.cache_lock:
+            hit = self.cache.get(key)
+            if hit:
+                self.cache.move_to_end(key)
+                return hit[0], hit[1], etag
+        with open_image(p) as im:
+            im.draft("RGB", (max_side, max_side)) # JPEG: decode at a fraction of the size
+            im = im.convert("RGB")
+        im.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+        buf = io.BytesIO()
+        im.save(buf, "JPEG", quality=PREVIEW_QUALITY)
+        data = buf.getvalue()
+        with self.cache_lock:
+            if key not in self.cache:
+                self.cache[key] = (data, "image/jpeg")
+                self.cache_bytes += len(data)
+                while self.cache_bytes > CACHE_BYTES and self.cache:
+                    _, (old, _) = self.cache.popitem(last=False)
+                    self.cache_bytes -= len(old)
+        return data, "image/jpeg", etag
+
+    # --- Labels ---
+    def labels(self, name):
+        p = self.path(name)
+        w, h = self.size(name)
+        with self.lock:
+            boxes, _ = self.dataset.load_boxes(p, (w, h), self.classes) # VOC/COCO may add names
+            stamp = self.dataset.label_stamps.get(p)
+            names = list(self.classes)
+        return {"name": name, "size": [w, h], "stamp": list(stamp) if stamp else None,
+                "boxes": [box_to_json(b, names) for b in boxes]}
+
+    def label_stamp(self, name):
+        """-> the label file's stamp (None when unlabelled) from a stat, without parsing the file."""
+        stamp = self.dataset.label_stamp(self.path(name))
+        return list(stamp) if stamp else None
+
+    def labels_batch(self, names):
+        if len(names) > MAX_BATCH: raise ApiError(400, f"At most {MAX_BATCH} labels per request")
+        out = {}
+        for name in names:
+            try: out[name] = self.labels(name)
+            except ApiError as e: out[name] = {"name": name, "error": str(e)}
+        return {"labels": out}
+
+    def save_labels(self, name, body):
+        p = self.path(name)
+        try:
+            w, h = body["size"]
+            rows = body["boxes"]
+        except (KeyError, TypeError, ValueError):
+            raise ApiError(400, "Expected {'size': [w, h], 'boxes': [...]}")
+        with self.lock:
+            current = self.dataset.label_stamp(p)
+            if "expect" in body and (list(current) if current else None) != body["expect"]:
+                raise ApiError(409, "Labels changed since they were read")
+            boxes = [box_from_json(r, self.classes) for r in rows]
+            self.dataset.save_boxes(p, (w, h), boxes, self.classes)
+            self.dataset.save_classes(self.classes)
+            stamp = self.dataset.label_stamps.get(p)
+            classes = self.classes.copy()
+        if self.stats and self.stats_lock.acquire(blocking=False): # Mid-rescan: the next scan sees the new stamp instead
+            try: self.stats.update_file(p, boxes, w, h, classes)
+            finally: self.stats_lock.release()
+        return {"name": name, "stamp": list(stamp) if stamp else None}
+
+    # --- Classes & stats ---
+    def set_classes(self, body):
+        names = body.get("classes") if isinstance(body, dict) else None
+        if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+            raise ApiError(400, "Expected {'classes': [names...]}")
+        with self.lock:
+            # Existing IDs keep their meaning: new names are only ever appended
+            for n in names:
+                if n not in self.classes: self.classes.append(n)
+            self.dataset.save_classes(self.classes)
+            return {"classes": list(self.classes)}
+
+    def summary(self):
+        from .stats import DatasetStats
+        with self.stats_lock: # Never self.lock around the scan: labels stay readable and writable meanwhile
+            if self.stats is None:
+                self.stats = DatasetStats(self.dataset.image_list, self.dataset.image_dir, self.dataset.label_dir, self.dataset.fmt)
+            self.stats.scan() # Incremental: only changed label files are parsed
+            self.stats.save()
+            with self.lock: classes = self.classes.copy()
+            return self.stats.summary(classes)
+
+
+# --- HTTP ---
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive: every response carries a Content-Length
+    disable_nagle_algorithm = True # Headers and body go out in separate writes; don't wait on delayed ACKs
+    service = None # Set on the subclass built by make_server
+    quiet = False
+
+    def log_message(self, fmt, *args):
+        if not self.quiet: super().log_message(fmt, *args)
+
+    def _send(self, status, body=b"", mime="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", mime)
+        headers = {"Content-Length": str(len(body)), **(headers or {})} # HEAD may give the length it would send
+        for k, v in headers.items(): self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD": self.wfile.write(body)
+
+    def _json(self, status, data):
+        self._send(status, json.dumps(data, separators=(",", ":")).encode())
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        if not n: return {}
+        try: return json.loads(self.rfile.read(n))
+        except ValueError: raise ApiError(400, "Body is not valid JSON")
+
+    def _route(self):
+        url = urlsplit(self.path)
+        parts = [unquote(x) for x in url.path.strip("/").split("/")]
+        query = parse_qs(url.query)
+        if parts[:1] != ["api"]: raise ApiError(404, "Not found")
+        return parts[1:], query
+
+    def _dispatch(self, method):
+        s = self.service
+        try:
+            parts, query = self._route()
+            head = parts[0] if parts else ""
+            if method == "GET" and parts == ["info"]: return self._json(200, s.info())
+            if method == "GET" and parts == ["images"]: return self._json(200, s.images())
+            if method == "GET" and head == "images" and len(parts) == 2:
+                max_side = int(query["max"][0]) if "max" in query else None
+                mime, etag, length = s.image_head(parts[1], max_side)
+                headers = {"ETag": etag, "Cache-Control": "no-cache"} # Revalidate, usually to a 304
+                if self.headers.get("If-None-Match") == etag: return self._send(304, headers=headers)
+                if self.command == "HEAD":
+                    if length is not None: headers["Content-Length"] = str(length)
+                    return self._send(200, mime=mime, headers=headers)
+                data, mime, etag = s.image(parts[1], max_side)
+                return self._send(200, data, mime, dict(headers, ETag=etag))
+            if method == "GET" and head == "labels" and len(parts) == 2:
+                if self.command == "HEAD": # Just the stamp, as the ETag; none when unlabelled
+                    stamp = s.label_stamp(parts[1])
+                    return self._send(200, headers={"ETag": f'"{stamp[0]:x}-{stamp[1]:x}"'} if stamp else {})
+                return self._json(200, s.labels(parts[1]))
+            if method == "POST" and parts == ["labels"]: return self._json(200, s.labels_batch(self._body().get("names", [])))
+            if method == "PUT" and head == "labels" and len(parts) == 2: return self._json(200, s.save_labels(parts[1], self._body()))
+            if method == "GET" and parts == ["classes"]: return self._json(200, {"classes": list(s.classes)})
+            if method == "PUT" and parts == ["classes"]: return self._json(200, s.set_classes(self._body()))
+            if method == "GET" and parts == ["stats"]: return self._json(200, s.summary())
+            raise ApiError(404, "Not found")
+        except ApiError as e:
+            self._json(e.status, {"error": str(e)})
+        except ValueError as e:
+            self._json(400, {"error": str(e)})
+        except Exception as e:
+            self._json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self): self._dispatch("GET")
+    def do_HEAD(self): self._dispatch("GET")
+    def do_POST(self): self._dispatch("POST")
+    def do_PUT(self): self._dispatch("PUT")
+
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT, quiet=False):
+    handler = type("Handler", (ApiHandler,), {"service": service, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="annotamate serve", description="Serve a dataset to Annotamate clients over HTTP.")
+    parser.add_argument("directory", help="image directory or .zip/.tar archive")
+    parser.add_argument("--labels", metavar="DIR", help="label directory (default: next to the images)")
+    parser.add_argument("--format", choices=list(codecs.FORMAT_EXTS), default="YOLO", help="annotation format")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for the whole network)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--quiet", action="store_true", help="don't log requests")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = AnnotationService(os.path.abspath(args.directory), args.labels and os.path.abspath(args.labels), args.format)
+    server = make_server(service, args.host, args.port, args.quiet)
+    print(f"Serving {len(service.dataset.image_list)} images from {args.directory} on http://{args.host}:{server.server_port}/")
+    print(f"Open it with: annotamate http://{args.host}:{server.server_port}/")
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally: server.server_close()
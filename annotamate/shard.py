@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import zlib
+import socket
+import getpass
+
+from .core.project import project_dir
+
+# Several instances on one shared folder split the unlabelled images into
+# chunks; each chunk is owned through a lease file in <labels>/.annotamate/leases.
+# Creating the file with O_EXCL is the lock, and expired leases are replaced
+# under a second O_EXCL lock, so this works on any filesystem with atomic
+# exclusive create and rename (local disks, SMB, NFSv3+).
+CHUNK_SIZE = 50
+LEASE_SECONDS = 300 # A crashed instance's chunk is handed out again after this
+RENEW_MARGIN = 10 # Seconds; a lease this close to expiry is not rewritten or removed, it may expire meanwhile
+STEAL_SECONDS = 30 # A steal lock this old was left by an instance that crashed mid-steal
+LEASE_DIR = "leases"
+
+
+def worker_id():
+    try: user = getpass.getuser()
+    except Exception: user = "user"
+    return f"{user}@{socket.gethostname()}:{os.getpid()}"
+
+
+def chunk_key(paths):
+    # Named after its images, not its position, so instances whose lists
+    # differ slightly still agree on what a chunk is
+    names = "\n".join(os.path.basename(p) for p in paths)
+    return f"{zlib.crc32(names.encode()):08x}_{len(paths)}"
+
+
+class WorkQueue:
+    """Hands this instance a chunk of unlabelled images nobody else holds.
+
+    `claim()` takes the next free chunk (skipping finished ones and live
+    leases, stealing expired ones), `heartbeat()` extends the lease and
+    reports whether it is still ours, and `release()` gives it back,
+    marking it finished when it is, so other instances skip it without
+    rescanning.
+    Expiry times are wall-clock, so machines sharing a folder should keep
+    their clocks in sync.
+    """
+
+    def __init__(self, root, image_list, is_done, chunk_size=CHUNK_SIZE, lease_seconds=LEASE_SECONDS, owner=None):
+        self.dir = os.path.join(project_dir(root), LEASE_DIR)
+        os.makedirs(self.dir, exist_ok=True)
+        self.is_done = is_done
+        self.lease_seconds = lease_seconds
+        self.owner = owner or worker_id()
+        self.chunks = [image_list[i:i + chunk_size] for i in range(0, len(image_list), chunk_size)]
+        self.keys = [chunk_key(c) for c in self.chunks]
+        self.current = None # Index into self.chunks
+        self.members = frozenset()
+
+    def _path(self, key, ext=".lease"):
+        return os.path.join(self.dir, key + ext)
+
+    def _read(self, path):
+        try:
+            with open(path, "r") as f: return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _lease(self):
+        now = time.time()
+        return {"owner": self.owner, "acquired": now, "expires": now + self.lease_seconds}
+
+    def _create(self, path, lease=None):
+        # -> the lease written, or None if the file exists
+        lease = lease or self._lease()
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, "w") as f: json.dump(lease, f)
+        return lease
+
+    def _live(self, path):
+        # -> False once the lease file at `path` has expired (or is missing)
+        lease = self._read(path)
+        if lease is not None: return lease.get("expires", 0) > time.time()
+        # Half-written by a creator that is still writing, or garbage;
+        # only treat it as abandoned once it is older than a lease
+        try: return time.time() - os.path.getmtime(path) < self.lease_seconds
+        except OSError: return False
+
+    def _acquire(self, key):
+        path = self._path(key)
+        if self._create(path): return True
+        if self._live(path): return False
+        # Expired: steal it under a second O_EXCL lock, so one instance at a time
+        # checks and replaces it. The holder never writes a lease that is past
+        # (or close to) expiry, so what we checked is still what we replace.
+        lock = self._path(key, ".steal")
+        if not self._create(lock, dict(self._lease(), expires=time.time() + STEAL_SECONDS)):
+            if not self._live(lock): # Left by a stealer that crashed mid-steal
+                try: os.remove(lock)
+                except OSError: pass
+            return False
+        try:
+            if not os.path.exists(path): return self._create(path) is not None # Released meanwhile
+            if self._live(path): return False # Another stealer was first
+            tmp = f"{path}.{zlib.crc32(self.owner.encode()):08x}.tmp"
+            with open(tmp, "w") as f: json.dump(self._lease(), f)
+            os.replace(tmp, path)
+            return True
+        finally:
+            try: os.remove(lock)
+            except OSError: pass
+
+    def finished(self, i):
+        if os.path.exists(self._path(self.keys[i], ".done")): return True
+        return all(self.is_done(p) for p in self.chunks[i])
+
+    def claim(self):
+        """Releases the current chunk and takes the next free one -> its image paths, or None."""
+        previous = self.current # Left unfinished, it goes to whoever comes next, not back to us
+        if previous is not None: self.release()
+        # Start at an owner-specific chunk so instances don't all race for the first one
+        n = len(self.chunks)
+        start = zlib.crc32(self.owner.encode()) % n if n else 0
+        for j in range(n):
+            i = (start + j) % n
+            if i == previous: continue
+            key = self.keys[i]
+            if os.path.exists(self._path(key, ".done")): continue
+            lease = self._read(self._path(key))
+            if lease and lease.get("expires", 0) > time.time(): continue # Cheap pre-check before locking
+            if self.finished(i):
+                self._mark_done(key)
+                continue
+            if self._acquire(key):
+                self.current = i
+                self.members = frozenset(self.chunks[i])
+                return self.chunks[i]
+        return None
+
+    def owns(self, path):
+        return path in self.members
+
+    def holder(self):
+        """Owner recorded in our chunk's lease file right now (None if there is none)."""
+        if self.current is None: return None
+        lease = self._read(self._path(self.keys[self.current]))
+        return lease.get("owner") if lease else None
+
+    def heartbeat(self):
+        """Extends our lease -> False if it expired and someone else took the chunk."""
+        if self.current is None: return False
+        key = self.keys[self.current]
+        path = self._path(key)
+        lease = self._read(path)
+        if not lease or lease.get("owner") != self.owner: return False
+        # Stealers only touch expired leases, so a live one can be rewritten in
+        # place; one past expiry is taken again the way they take it, and one
+        # about to expire is left alone (still ours) until the next heartbeat
+        expires = lease.get("expires", 0)
+        if expires <= time.time(): return self._acquire(key)
+        if expires < time.time() + RENEW_MARGIN: return True
+        renewed = dict(lease, expires=time.time() + self.lease_seconds)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f: json.dump(renewed, f)
+        if self._read(path) != lease: # Changed hands since we read it
+            os.remove(tmp)
+            return False
+        os.replace(tmp, path)
+        return True
+
+    def _mark_done(self, key):
+        try:
+            with open(self._path(key, ".done"), "w") as f: f.write(self.owner)
+        except OSError:
+            pass
+
+    def release(self, done=None):
+        """Gives the chunk back; done=None marks it finished if all its images are labelled."""
+        if self.current is None: return
+        key = self.keys[self.current]
+        if done is None: done = self.finished(self.current)
+        if done: self._mark_done(key)
+        path = self._path(key)
+        lease = self._read(path)
+        # An expiring lease is left to expire: a stealer may be replacing it right now
+        if lease and lease.get("owner") == self.owner and lease.get("expires", 0) > time.time() + RENEW_MARGIN:
+            try: os.remove(path)
+            except OSError: pass
+        self.current = None
+        self.members = frozenset()
+
+    def progress(self):
+        """-> (finished chunks, total chunks), from the done markers."""
+        done = sum(1 for k in self.keys if os.path.exists(self._path(k, ".done")))
+        return done, len(self.chunks)
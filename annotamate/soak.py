@@ -0,0 +1,181 @@
+import os
+import gc
+import sys
+import time
+
+from .bench import BenchError, make_dataset
+from .core import Dataset
+from .core.project import user_cache_dir
+from .resources import rss_bytes, open_handles
+
+# A long labelling session, compressed: step through thousands of images
+# and check that memory and handle counts level off after a warm-up
+# instead of climbing with every image
+WARMUP = 200 # Images before the baseline is taken; caches and pools fill up first
+CHECK_EVERY = 500
+RSS_SLACK_MB = 64 # Allowed RSS growth after warm-up (allocator noise, fragmentation)
+HANDLE_SLACK = 4
+WIDGET_SLACK = 0 # Pooled: the widget count must not grow at all
+TK_IMAGE_SLACK = 2 # Besides the fill cache, which is budgeted separately
+
+
+class Soak:
+    """Snapshots taken while stepping through images, and the flatness check."""
+
+    def __init__(self, probe, limits, file=None):
+        self.probe = probe # -> dict of counters
+        self.limits = limits # counter -> allowed growth over the baseline
+        self.file = file
+        self.baseline = None
+        self.samples = []
+
+    def sample(self, step):
+        gc.collect()
+        snap = self.probe()
+        snap["step"] = step
+        if self.baseline is None: self.baseline = snap
+        self.samples.append(snap)
+        grown = ", ".join(f"{k} {snap[k] - self.baseline[k]:+d}" for k in self.limits
+                          if k != "rss" and snap.get(k) is not None and self.baseline.get(k) is not None)
+        rss = snap.get("rss")
+        print(f"  step {step:>6}  rss {rss / 2**20 if rss else 0:8.1f} MB  ({grown})", file=self.file, flush=True)
+        return snap
+
+    def failures(self):
+        """-> descriptions of counters that grew past their limit between baseline and last sample."""
+        if len(self.samples) < 2: return []
+        last, out = self.samples[-1], []
+        for k, limit in self.limits.items():
+            a, b = self.baseline.get(k), last.get(k)
+            if a is None or b is None: continue
+            if b - a > limit: out.append(f"{k} grew by {b - a} (limit {limit})")
+        return out
+
+
+def _limits(rss_slack_mb):
+    return {"rss": rss_slack_mb * 2**20, "handles": HANDLE_SLACK}
+
+
+# --- DECODER ---
+def soak_decoder(image_list, steps, warmup=WARMUP, check_every=CHECK_EVERY, rss_slack_mb=RSS_SLACK_MB, file=None):
+    """Loader + decode workers (shared memory) without a window -> Soak."""
+    from .decode import DecodeService
+    from .loader import ImageLoader, FULL
+    decoder = DecodeService()
+    loader = ImageLoader(decode=decoder.decode, release=decoder.release)
+
+    def probe():
+        return {"rss": rss_bytes(), "handles": open_handles(), "frames": len(decoder.frames),
+                "prefetched": len(decoder.prefetched)}
+    limits = dict(_limits(rss_slack_mb), frames=0, prefetched=0)
+    soak = Soak(probe, limits, file)
+    current = None
+    n = len(image_list)
+    try:
+        for step in range(steps):
+            i = step % n
+            loader.request(image_list[i], FULL)
+            got = None
+            while got is None:
+                for _, path, kind, payload in loader.poll():
+                    if isinstance(payload, Exception): raise BenchError(f"{path}: {payload}")
+                    got = payload
+                if got is None: time.sleep(0.001)
+            if current is not None: decoder.release(current) # What the editor does on every switch
+            current = got[0]
+            decoder.prefetch([image_list[(i + 1) % n], image_list[i - 1]])
+            if step == warmup or (step > warmup and (step - warmup) % check_every == 0): soak.sample(step)
+        if current is not None: decoder.release(current); current = None
+        soak.sample(steps)
+    finally:
+        if current is not None: decoder.release(current)
+        decoder.shutdown()
+    return soak
+
+
+# --- EDITOR ---
+def soak_gui(image_dir, label_dir, steps, warmup=WARMUP, check_every=CHECK_EVERY, rss_slack_mb=RSS_SLACK_MB, file=None):
+    """The editor itself, switching images, redrawing and rebuilding the sidebar -> Soak."""
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        raise BenchError("No display for --gui: run it under xvfb-run, or leave --gui out.")
+    from .main import UltimateAnnotator
+    app = UltimateAnnotator(image_dir, label_dir, "YOLO")
+
+    def wait_for_image():
+        deadline = time.time() + 60
+        while (app.pil_image is None or not app.loader.idle()) and time.time() < deadline:
+            app.update(); time.sleep(0.001)
+        if app.pil_image is None: raise BenchError("An image did not load within a minute.")
+
+    def probe():
+        snap = app.resources.snapshot()
+        snap["tk_images"] -= snap["fills"] # The fill cache is budgeted by pixels, not counted
+        snap["loader_results"] = app.loader.results.qsize()
+        return snap
+    limits = dict(_limits(rss_slack_mb), tk_images=TK_IMAGE_SLACK, widgets=WIDGET_SLACK, pil_images=1)
+    soak = Soak(probe, limits, file)
+    try:
+        wait_for_image()
+        n = len(app.dataset.image_list)
+        for step in range(steps):
+            app.current_index = (app.current_index + 1) % n
+            app.load_image_data()
+            wait_for_image()
+            if app.store.boxes: # Select, then reselect: the sidebar and the boxes redraw
+                app.select_object_from_sidebar(step % len(app.store.boxes))
+                app.select_object_from_sidebar(None)
+            app.update_idletasks()
+            if step == warmup or (step > warmup and (step - warmup) % check_every == 0): soak.sample(step)
+        soak.sample(steps)
+    finally:
+        app.decoder.shutdown()
+        app.destroy()
+    return soak
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="annotamate soak",
+                                     description="Step through thousands of images and check memory and handles stay flat.")
+    parser.add_argument("directory", nargs="?", help="image folder to use (default: a synthetic one)")
+    parser.add_argument("--labels", metavar="DIR", help="label directory")
+    parser.add_argument("--steps", type=int, default=3000, help="images to step through")
+    parser.add_argument("--files", type=int, default=500, help="size of the synthetic folder (it wraps around)")
+    parser.add_argument("--image-size", default="1600x1200", help="synthetic image size, WxH (above 1 MP uses the decode workers)")
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--check-every", type=int, default=CHECK_EVERY)
+    parser.add_argument("--rss-slack", type=int, default=RSS_SLACK_MB, metavar="MB", help="RSS growth allowed after warm-up")
+    parser.add_argument("--gui", action="store_true", help="soak the editor window instead of the loader (needs a display, e.g. xvfb-run)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.warmup >= args.steps:
+        print("--steps must be larger than --warmup")
+        return 2
+    if args.directory:
+        image_dir, label_dir = os.path.abspath(args.directory), args.labels and os.path.abspath(args.labels)
+    else:
+        w, h = (int(x) for x in args.image_size.lower().split("x"))
+        root = os.path.join(user_cache_dir(), "bench", f"soak_{args.files}_{w}x{h}")
+        image_dir, label_dir = make_dataset(root, args.files, (w, h))
+    try:
+        print(f"--- Soak: {args.steps} images from {image_dir} ({'editor' if args.gui else 'loader'}) ---")
+        if args.gui:
+            soak = soak_gui(image_dir, label_dir, args.steps, args.warmup, args.check_every, args.rss_slack)
+        else:
+            image_list = Dataset(image_dir, label_dir).image_list
+            if not image_list: raise BenchError(f"No images in {image_dir}")
+            soak = soak_decoder(image_list, args.steps, args.warmup, args.check_every, args.rss_slack)
+    except BenchError as e:
+        print(f"Soak failed: {e}")
+        return 1
+    failures = soak.failures()
+    for f in failures: print(f"LEAK? {f}")
+    if not failures: print("Flat: no counter grew past its limit after warm-up.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
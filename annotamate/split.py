@@ -0,0 +1,227 @@
+import os
+import json
+import random
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import archive, codecs
+from .core.classes import as_registry
+from .stats import DatasetStats
+
+SPLITS = ("train", "val", "test")
+LINK_MODES = ("hardlink", "symlink", "copy")
+
+
+class SplitError(Exception):
+    pass
+
+
+# --- STRATIFICATION ---
+def stratified_split(items, ratios, seed=0):
+    """Splits [(key, set_of_classes), ...] so every class follows `ratios`.
+
+    Iterative stratification (Sechidis et al.): take the class with the fewest
+    unassigned images, hand each of its images to the split that still needs
+    that class the most. Works for multi-label images. Deterministic for a
+    given seed. Returns {split: [key, ...]}.
+    """
+    rng = random.Random(seed)
+    items = list(items)
+    rng.shuffle(items)
+
+    total = float(sum(ratios)) or 1.0
+    ratios = [r / total for r in ratios]
+    names = SPLITS[:len(ratios)]
+    out = {n: [] for n in names}
+
+    labelled = [(k, cs) for k, cs in items if cs]
+    empty = [k for k, cs in items if not cs]
+
+    # Desired counts per split, overall and per class
+    need_total = [r * len(labelled) for r in ratios]
+    per_class = {}
+    for k, cs in labelled:
+        for c in cs: per_class.setdefault(c, []).append((k, cs))
+    need_class = {c: [r * len(v) for r in ratios] for c, v in per_class.items()}
+
+    done = set()
+    remaining = {c: len(v) for c, v in per_class.items()}
+    while remaining:
+        # Rarest class first: its placement is the hardest to get right
+        c = min(remaining, key=lambda x: (remaining[x], str(x)))
+        for k, cs in per_class[c]:
+            if k in done: continue
+            needs = need_class[c]
+            best = max(range(len(names)), key=lambda i: (needs[i], need_total[i], -i))
+            out[names[best]].append(k)
+            done.add(k)
+            need_total[best] -= 1
+            for c2 in cs:
+                need_class[c2][best] -= 1
+                if c2 in remaining:
+                    remaining[c2] -= 1
+                    if remaining[c2] <= 0: del remaining[c2]
+        remaining.pop(c, None)
+
+    # Images without boxes: plain proportional split
+    start = 0
+    for i, n in enumerate(names):
+        end = len(empty) if i == len(names) - 1 else start + int(round(ratios[i] * len(empty)))
+        out[n].extend(empty[start:end])
+        start = end
+    return out
+
+
+# --- MATERIALIZATION ---
+def place_file(src, dst, mode):
+    """Links (or copies) src to dst. Falls back hardlink -> symlink -> copy; returns the mode used."""
+    if os.path.lexists(dst): os.remove(dst)
+    if archive.split_member(src): # Inside an archive: nothing to link to
+        archive.extract(src, dst)
+        return "copy"
+    modes = LINK_MODES[LINK_MODES.index(mode):]
+    for m in modes:
+        try:
+            if m == "hardlink": os.link(src, dst)
+            elif m == "symlink": os.symlink(os.path.abspath(src), dst)
+            else: shutil.copy2(src, dst)
+            return m
+        except (OSError, NotImplementedError):
+            if m == modes[-1]: raise
+    return None
+
+
+def _yaml_str(s):
+    return json.dumps(str(s)) # JSON strings are valid YAML scalars
+
+
+def write_data_yaml(path, out_dir, splits, classes):
+    lines = [f"path: {_yaml_str(os.path.abspath(out_dir))}"]
+    for n in splits: lines.append(f"{n}: {_yaml_str('images/' + n)}")
+    lines.append(f"nc: {len(classes)}")
+    lines.append("names:")
+    for i, c in enumerate(classes): lines.append(f"  {i}: {_yaml_str(c)}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _image_size(img_path):
+    try:
+        with archive.open_image(img_path) as im: return im.size
+    except Exception as e:
+        print(f"Skipping unreadable image {img_path}: {e}")
+        return None
+
+
+def export_split(image_list, image_dir, label_dir, fmt, classes, out_dir,
+                 ratios=(0.8, 0.1, 0.1), seed=0, out_format="YOLO", link="hardlink",
+                 include_unlabelled=False, workers=16, progress=None):
+    """Splits a labelled folder into out_dir without copying image bytes.
+
+    YOLO output: images/<split>, labels/<split> and data.yaml.
+    COCO output: images/<split> and annotations/instances_<split>.json.
+    Returns a summary dict.
+    """
+    if link not in LINK_MODES: raise SplitError(f"Unknown link mode: {link}")
+    classes = as_registry(classes)
+
+    # Class sets per image come from the (cached) stats index
+    stats = DatasetStats(image_list, image_dir, label_dir, fmt)
+    stats.scan()
+    ext = stats.ext
+    items = []
+    for p in image_list:
+        entry = stats.entries.get(codecs.label_stem(p) + ext)
+        if entry is None:
+            if not include_unlabelled: continue
+            items.append((p, frozenset()))
+        else:
+            items.append((p, frozenset(entry["c"])))
+    if not items: raise SplitError("No labelled images to split.")
+
+    groups = stratified_split(items, ratios, seed)
+    src_labels = stats.label_dir
+    modes_used = set()
+
+    def label_src(p):
+        return codecs.annotation_path(p, fmt, src_labels)
+
+    jobs = []
+    for split, paths in groups.items():
+        img_out = os.path.join(out_dir, "images", split)
+        os.makedirs(img_out, exist_ok=True)
+        if out_format == "YOLO":
+            os.makedirs(os.path.join(out_dir, "labels", split), exist_ok=True)
+        for p in paths:
+            jobs.append((split, p))
+
+    total = len(jobs)
+    classes_lock = threading.Lock() # read_boxes may append VOC/COCO names
+    sizes = {} # Image headers read on the pool, reused by the COCO writer
+    def place(job):
+        split, p = job
+        modes = [place_file(p, os.path.join(out_dir, "images", split, os.path.basename(p)), link)]
+        if out_format == "COCO":
+            sizes[p] = _image_size(p)
+        elif out_format == "YOLO":
+            lp = label_src(p)
+            dst = os.path.join(out_dir, "labels", split, os.path.splitext(os.path.basename(p))[0] + ".txt")
+            if fmt == "YOLO":
+                if os.path.exists(lp): modes.append(place_file(lp, dst, link))
+            elif os.path.exists(lp):
+                # Other formats are converted, boxes stay in pixel space until written
+                size = _image_size(p)
+                if not size: return modes
+                w, h = size
+                with classes_lock: boxes = codecs.read_boxes(lp, w, h, classes, add_unknown=True)
+                codecs.write_yolo(dst, w, h, boxes)
+        return modes
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, used in enumerate(pool.map(place, jobs, chunksize=64)):
+            modes_used.update(m for m in used if m)
+            if progress and i % 500 == 0: progress(i, total)
+
+    if out_format == "YOLO":
+        write_data_yaml(os.path.join(out_dir, "data.yaml"), out_dir, list(groups.keys()), classes)
+    elif out_format == "COCO":
+        os.makedirs(os.path.join(out_dir, "annotations"), exist_ok=True)
+        for split, paths in groups.items():
+            write_coco_split(os.path.join(out_dir, "annotations", f"instances_{split}.json"), paths, fmt, src_labels, classes, sizes)
+    else:
+        raise SplitError(f"Unknown output format: {out_format}")
+
+    if progress: progress(total, total)
+    return {
+        "out_dir": out_dir,
+        "counts": {k: len(v) for k, v in groups.items()},
+        "link_modes": sorted(modes_used),
+        "seed": seed,
+    }
+
+
+def write_coco_split(path, img_paths, fmt, label_dir, classes, sizes=None):
+    # One COCO file per split, merged from the per-image labels
+    images, annotations = [], []
+    ann_id = 1
+    for img_id, p in enumerate(img_paths, start=1):
+        size = sizes[p] if sizes and p in sizes else _image_size(p)
+        if not size: continue
+        w, h = size
+        images.append({"id": img_id, "width": w, "height": h, "file_name": os.path.basename(p)})
+        lp = codecs.annotation_path(p, fmt, label_dir)
+        if not os.path.exists(lp): continue
+        for b in codecs.read_boxes(lp, w, h, classes, add_unknown=True):
+            clipped = codecs.clip_box(b, w, h)
+            if not clipped: continue
+            x1, y1, x2, y2 = clipped
+            annotations.append({
+                "id": ann_id, "image_id": img_id, "category_id": b['class_id'] + 1,
+                "segmentation": [], "area": (x2 - x1) * (y2 - y1),
+                "bbox": [x1, y1, x2 - x1, y2 - y1], "iscrowd": 0,
+            })
+            ann_id += 1
+    categories = [{"id": i + 1, "name": c, "supercategory": "none"} for i, c in enumerate(classes)]
+    with open(path, "w") as f:
+        json.dump({"images": images, "annotations": annotations, "categories": categories}, f)
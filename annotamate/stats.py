@@ -0,0 +1,233 @@
+import os
+import threading
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from .core import codecs
+from .core.archive import open_image
+from .core.project import project_dir, load_json, save_json
+
+# --- HISTOGRAM BINS ---
+# Box area as a fraction of the image area
+AREA_EDGES = [0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5]
+AREA_LABELS = ["<0.01%", "0.01-0.1%", "0.1-1%", "1-5%", "5-10%", "10-25%", "25-50%", ">50%"]
+
+# Box aspect ratio (width / height) in pixels
+ASPECT_EDGES = [0.25, 0.5, 0.8, 1.25, 2.0, 4.0]
+ASPECT_LABELS = ["<1:4", "1:4-1:2", "1:2-4:5", "~1:1", "5:4-2:1", "2:1-4:1", ">4:1"]
+
+# Boxes per labelled image
+COUNT_EDGES = [1, 2, 3, 6, 11, 21, 51]
+COUNT_LABELS = ["0", "1", "2", "3-5", "6-10", "11-20", "21-50", "51+"]
+
+CACHE_VERSION = 1
+
+# Below this many files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 500
+
+
+def _image_size(img_path):
+    try:
+        with open_image(img_path) as im: # Header only, pixels are not decoded
+            return im.size
+    except Exception:
+        return None
+
+
+def _new_entry(mtime_ns, size_bytes):
+    return {"m": mtime_ns, "s": size_bytes, "n": 0, "c": {},
+            "a": [0] * len(AREA_LABELS), "r": [0] * len(ASPECT_LABELS)}
+
+
+def _add_box(entry, key, bw, bh, img_size):
+    # bw/bh in pixels when img_size is known, otherwise normalized
+    entry["n"] += 1
+    entry["c"][key] = entry["c"].get(key, 0) + 1
+    if bw <= 0 or bh <= 0: return
+    if img_size:
+        entry["a"][bisect_right(AREA_EDGES, (bw * bh) / float(img_size[0] * img_size[1]))] += 1
+        entry["r"][bisect_right(ASPECT_EDGES, bw / bh)] += 1
+
+
+def scan_label_file(job):
+    """Parses one label file into a compact stats entry. Runs in worker processes."""
+    annot_path, img_path, mtime_ns, size_bytes = job
+    entry = _new_entry(mtime_ns, size_bytes)
+    try:
+        ext = os.path.splitext(annot_path)[1].lower()
+        if ext == ".txt":
+            rows = codecs.parse_yolo(annot_path)
+            img_size = _image_size(img_path) if rows else None
+            for cid, _, _, nw, nh in rows:
+                if img_size: _add_box(entry, str(cid), nw * img_size[0], nh * img_size[1], img_size)
+                else: _add_box(entry, str(cid), nw, nh, None)
+        elif ext == ".xml":
+            img_size, objects = codecs.parse_voc(annot_path)
+            if objects and not img_size: img_size = _image_size(img_path)
+            for name, xmin, ymin, xmax, ymax in objects:
+                _add_box(entry, name, xmax - xmin, ymax - ymin, img_size)
+        elif ext == ".json":
+            img_size, objects = codecs.parse_coco(annot_path)
+            if objects and not img_size: img_size = _image_size(img_path)
+            for name, _, _, w, h in objects:
+                _add_box(entry, name, w, h, img_size)
+    except Exception as e:
+        entry["err"] = str(e)
+    return codecs.label_stem(img_path) + os.path.splitext(annot_path)[1], entry
+
+
+# --- STATS ENGINE ---
+class DatasetStats:
+    """Per-class counts and box-shape histograms for one (image list, label dir, format).
+
+    Per-file results are cached in the project directory keyed by mtime, so a
+    rescan only re-parses label files that changed since the last run.
+    """
+
+    def __init__(self, image_list, image_dir, label_dir, fmt):
+        self.image_list = list(image_list)
+        self.label_dir = label_dir or image_dir
+        self.fmt = fmt
+        self.ext = codecs.annotation_ext(fmt)
+        self.cache_path = os.path.join(project_dir(self.label_dir), f"stats_{self.ext[1:]}.json")
+
+        self.entries = {} # label name under label_dir ("/"-separated) -> entry
+        self.dirty = False
+        self.lock = threading.Lock() # update_file may land while a scan runs
+        self._reset_totals()
+
+        cached = load_json(self.cache_path, {})
+        if cached.get("version") == CACHE_VERSION:
+            for name, entry in cached.get("files", {}).items():
+                self.entries[name] = entry
+                self._apply(entry, 1)
+
+    def _reset_totals(self):
+        self.total_classes = Counter()
+        self.total_boxes = 0
+        self.total_labelled = 0
+        self.total_counts = [0] * len(COUNT_LABELS)
+        self.total_area = [0] * len(AREA_LABELS)
+        self.total_aspect = [0] * len(ASPECT_LABELS)
+
+    def _apply(self, entry, sign):
+        # Add (sign=1) or remove (sign=-1) one file's contribution to the totals
+        self.total_labelled += sign
+        self.total_boxes += sign * entry["n"]
+        self.total_counts[bisect_right(COUNT_EDGES, entry["n"])] += sign
+        for k, v in entry["c"].items(): self.total_classes[k] += sign * v
+        for i, v in enumerate(entry["a"]): self.total_area[i] += sign * v
+        for i, v in enumerate(entry["r"]): self.total_aspect[i] += sign * v
+
+    def _set_entry(self, name, entry):
+        with self.lock:
+            old = self.entries.get(name)
+            if old is not None: self._apply(old, -1)
+            if entry is None:
+                self.entries.pop(name, None)
+            else:
+                self.entries[name] = entry
+                self._apply(entry, 1)
+            self.dirty = True
+
+    def scan(self, workers=None, progress=None):
+        """Brings the stats up to date. Returns the number of files re-parsed."""
+        # One directory listing instead of a stat() per image
+        on_disk = {}
+        try:
+            with os.scandir(self.label_dir) as it:
+                for de in it:
+                    if de.name.endswith(self.ext) and de.name != "classes.txt":
+                        on_disk[de.name] = de
+        except OSError:
+            pass
+
+        jobs = []
+        seen = set()
+        for img_path in self.image_list:
+            name = codecs.label_stem(img_path) + self.ext
+            path = os.path.join(self.label_dir, *name.split("/"))
+            if "/" in name: # Archive member in a subfolder; the sidecar mirrors it
+                try: st = os.stat(path)
+                except OSError: continue
+                seen.add(name)
+            else:
+                de = on_disk.get(name)
+                if de is None: continue
+                seen.add(name)
+                try: st = de.stat()
+                except OSError: continue
+            old = self.entries.get(name)
+            if old and old["m"] == st.st_mtime_ns and old["s"] == st.st_size: continue
+            jobs.append((path, img_path, st.st_mtime_ns, st.st_size))
+
+        # Drop labels that disappeared (or whose image left the list)
+        for name in [n for n in self.entries if n not in seen]:
+            self._set_entry(name, None)
+
+        if len(jobs) < PARALLEL_THRESHOLD:
+            results = map(scan_label_file, jobs)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(scan_label_file, jobs, chunksize=256)
+
+        try:
+            for i, (name, entry) in enumerate(results):
+                self._set_entry(name, entry)
+                if progress and i % 1000 == 0: progress(i, len(jobs))
+        finally:
+            if pool: pool.shutdown()
+
+        if progress: progress(len(jobs), len(jobs))
+        self.save()
+        return len(jobs)
+
+    def update_file(self, img_path, boxes, w, h, classes):
+        """Refreshes one file from in-memory boxes right after the editor saved it."""
+        annot_path = codecs.annotation_path(img_path, self.fmt, self.label_dir)
+        try: st = os.stat(annot_path)
+        except OSError: return
+        entry = _new_entry(st.st_mtime_ns, st.st_size)
+        for b in boxes:
+            clipped = codecs.clip_box(b, w, h) # Same filter the writers apply
+            if not clipped: continue
+            x1, y1, x2, y2 = clipped
+            cid = b['class_id']
+            if self.ext == ".txt": key = str(cid)
+            else: key = classes[cid] if cid < len(classes) else "unknown"
+            _add_box(entry, key, x2 - x1, y2 - y1, (w, h))
+        self._set_entry(codecs.label_stem(img_path) + self.ext, entry)
+
+    def save(self):
+        with self.lock:
+            if not self.dirty: return
+            try:
+                save_json(self.cache_path, {"version": CACHE_VERSION, "files": self.entries})
+                self.dirty = False
+            except OSError as e:
+                print(f"Could not write stats cache: {e}")
+
+    def summary(self, classes):
+        # Resolve cache keys (YOLO ids, VOC/COCO names) to display names
+        per_class = Counter()
+        for k, v in self.total_classes.items():
+            if v <= 0: continue
+            if self.ext == ".txt":
+                cid = int(k)
+                name = classes[cid] if 0 <= cid < len(classes) else f"#{cid} (unknown)"
+            else:
+                name = k
+            per_class[name] += v
+
+        return {
+            "images": len(self.image_list),
+            "labelled": self.total_labelled,
+            "boxes": self.total_boxes,
+            "classes": per_class.most_common(),
+            "boxes_per_image": list(zip(COUNT_LABELS, self.total_counts)),
+            "area": list(zip(AREA_LABELS, self.total_area)),
+            "aspect": list(zip(ASPECT_LABELS, self.total_aspect)),
+            "errors": sorted(n for n, e in self.entries.items() if "err" in e),
+        }
@@ -0,0 +1,9 @@
+# --- THEME CONSTANTS (Light, Dark) ---
+# We define colors as tuples: (Light Mode Color, Dark Mode Color)
+PS_GRAY_DARK = ("#e0e0e0", "#262626")   # Main Background / Canvas Area
+PS_GRAY_MED = ("#f0f0f0", "#383838")    # Panels / Sidebar
+PS_GRAY_LIGHT = ("#ffffff", "#535353")  # Buttons / Inputs
+PS_GRAY_LIGHTER = ("#d0d0d0", "#6b6b6b") # Hover state / Active
+PS_TEXT_COLOR = ("#1a1a1a", "#f0f0f0")  # Text
+PS_BORDER_COLOR = ("#cccccc", "#1a1a1a")
+PS_ACTIVE = ("#aaaaaa", "#6b6b6b")      # Active/Accent
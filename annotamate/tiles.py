@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .core import codecs
+from .core.archive import open_image
+from .core.classes import as_registry, write_classes_file
+from .core.project import output_stem
+
+PARALLEL_THRESHOLD = 8 # Images; below this the pool start-up costs more than it saves
+JPEG_QUALITY = 95
+
+
+class TileError(Exception):
+    pass
+
+
+# --- GEOMETRY ---
+def tile_grid(w, h, tile, overlap):
+    """Top-left aligned tiles of `tile` px with `overlap` px shared between
+    neighbours; the last row/column is shifted back so it ends on the image
+    edge instead of running past it. Returns [(x1, y1, x2, y2), ...]."""
+    if overlap >= tile: raise TileError("Overlap must be smaller than the tile size.")
+    step = tile - overlap
+    def starts(n):
+        if n <= tile: return [0]
+        s = list(range(0, n - tile, step))
+        s.append(n - tile)
+        return s
+    return [(x, y, min(x + tile, w), min(y + tile, h)) for y in starts(h) for x in starts(w)]
+
+
+def clip_to_tile(boxes, rect, min_visibility):
+    """Boxes cut to `rect`, in tile coordinates.
+
+    A box is kept when at least `min_visibility` of its area falls inside the
+    tile. Returns (kept, dropped_count).
+    """
+    tx1, ty1, tx2, ty2 = rect
+    kept, dropped = [], 0
+    for b in boxes:
+        x1, y1, x2, y2 = max(b['x1'], tx1), max(b['y1'], ty1), min(b['x2'], tx2), min(b['y2'], ty2)
+        if x2 <= x1 or y2 <= y1: continue # Not in this tile at all
+        area = (b['x2'] - b['x1']) * (b['y2'] - b['y1'])
+        if area <= 0 or (x2 - x1) * (y2 - y1) / area < min_visibility:
+            dropped += 1
+            continue
+        kept.append(dict(b, x1=x1 - tx1, y1=y1 - ty1, x2=x2 - tx1, y2=y2 - ty1))
+    return kept, dropped
+
+
+# --- WORKER ---
+def slice_image(job):
+    """Cuts one image into tiles and writes them with their labels.
+
+    The image is decoded once and only tiles are held beyond that, so a
+    worker's memory is one decoded image regardless of the tile count.
+    """
+    img_path, image_root, label_path, classes, out_images, out_labels, out_format, tile, overlap, min_vis, keep_empty = job
+    res = {"tiles": 0, "boxes": 0, "dropped": 0, "unknown": 0, "error": None}
+    try:
+        with open_image(img_path) as im:
+            im.load()
+            w, h = im.size
+            boxes = []
+            if label_path and os.path.exists(label_path):
+                boxes = codecs.read_boxes(label_path, w, h, classes) # Unknown names read as -1
+                # Names the class list does not know can't get consistent IDs across workers
+                known = [b for b in boxes if 0 <= b['class_id'] < len(classes)]
+                res["unknown"] = len(boxes) - len(known)
+                boxes = known
+            stem = output_stem(img_path, image_root)
+            ext = os.path.splitext(img_path)[1].lower()
+            for rect in tile_grid(w, h, tile, overlap):
+                kept, dropped = clip_to_tile(boxes, rect, min_vis)
+                res["dropped"] += dropped
+                if not kept and not keep_empty: continue
+                name = f"{stem}_{rect[0]}_{rect[1]}{ext}"
+                tile_path = os.path.join(out_images, name)
+                crop = im.crop(rect)
+                if ext in (".jpg", ".jpeg"): crop.convert("RGB").save(tile_path, quality=JPEG_QUALITY)
+                else: crop.save(tile_path)
+                tw, th = rect[2] - rect[0], rect[3] - rect[1]
+                annot = codecs.annotation_path(tile_path, out_format, out_labels)
+                codecs.write_boxes(annot, tile_path, tw, th, kept, classes)
+                res["tiles"] += 1
+                res["boxes"] += len(kept)
+    except Exception as e:
+        res["error"] = f"{os.path.basename(img_path)}: {e}"
+    return res
+
+
+# --- EXPORT ---
+def export_tiles(image_list, label_dir, fmt, classes, out_dir, tile=640, overlap=128,
+                 min_visibility=0.5, out_format="YOLO", keep_empty=False,
+                 workers=None, progress=None, image_root=None):
+    """Slices every image into overlapping tiles under out_dir/images and
+    out_dir/labels (any supported format, plus classes.txt). Tiles are named
+    after the image's path under `image_root`, so same-stem images don't clash.
+
+    Work is streamed through a process pool with at most two jobs per
+    worker in flight, so memory stays bounded on very large datasets.
+    Returns a summary dict.
+    """
+    if out_format not in codecs.FORMAT_EXTS: raise TileError(f"Unknown output format: {out_format}")
+    if not 0 <= min_visibility <= 1: raise TileError("Minimum visibility must be between 0 and 1.")
+    classes = as_registry(classes)
+    out_images, out_labels = os.path.join(out_dir, "images"), os.path.join(out_dir, "labels")
+    os.makedirs(out_images, exist_ok=True)
+    os.makedirs(out_labels, exist_ok=True)
+
+    jobs = [(p, image_root, codecs.annotation_path(p, fmt, label_dir), classes, out_images, out_labels,
+             out_format, tile, overlap, min_visibility, keep_empty) for p in image_list]
+    total = {"images": 0, "tiles": 0, "boxes": 0, "dropped": 0, "unknown": 0}
+    errors = []
+
+    def collect(r):
+        total["images"] += 1
+        for k in ("tiles", "boxes", "dropped", "unknown"): total[k] += r[k]
+        if r["error"]: errors.append(r["error"])
+        if progress and total["images"] % 20 == 0: progress(total["images"], len(jobs))
+
+    if len(jobs) < PARALLEL_THRESHOLD:
+        for job in jobs: collect(slice_image(job))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for job in jobs:
+                pending.add(pool.submit(slice_image, job))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done: collect(f.result())
+            for f in pending: collect(f.result())
+
+    write_classes_file(os.path.join(out_labels, "classes.txt"), classes)
+    if progress: progress(len(jobs), len(jobs))
+    total["errors"] = errors
+    total["out_dir"] = out_dir
+    return total
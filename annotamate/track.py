@@ -0,0 +1,149 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .core.archive import open_image
+
+# Template side (px) boxes are downscaled to before matching: big enough to
+# lock on, small enough that a brute-force NCC over the search window is cheap
+TEMPLATE_SIZE = 40
+FINE_SIZE = 160 # Second pass, around the coarse hit only, to recover the pixels lost to downscaling
+SEARCH_MARGIN = 0.5 # Search window grows each side by this fraction of the box
+SCALES = (0.95, 1.0, 1.05)
+MIN_SCORE = 0.5 # Below this the box stays where it was
+
+
+def _np():
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("Box propagation needs numpy (pip install numpy)")
+    return np
+
+
+def load_gray(path):
+    with open_image(path) as im:
+        return im.convert("L")
+
+
+def match_template(np, search, templ):
+    """Normalized cross-correlation of `templ` over `search` -> (score, dy, dx)."""
+    th, tw = templ.shape
+    if search.shape[0] < th or search.shape[1] < tw: return -1.0, 0, 0
+    t = templ - templ.mean()
+    t_norm = np.sqrt((t * t).sum())
+    if t_norm < 1e-6: return -1.0, 0, 0 # Flat template: nothing to lock on to
+    windows = np.lib.stride_tricks.sliding_window_view(search, (th, tw))
+    # Window sums from an integral image, cross term with a single einsum
+    ii = np.pad(search, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    ii2 = np.pad(search * search, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    def box_sum(a):
+        return a[th:, tw:] - a[:-th, tw:] - a[th:, :-tw] + a[:-th, :-tw]
+    n = th * tw
+    s, s2 = box_sum(ii), box_sum(ii2)
+    var = np.maximum(s2 - s * s / n, 0)
+    cross = np.einsum("ijkl,kl->ij", windows, t)
+    ncc = cross / (np.sqrt(var) * t_norm + 1e-6)
+    dy, dx = np.unravel_index(np.argmax(ncc), ncc.shape)
+    return float(ncc[dy, dx]), int(dy), int(dx)
+
+
+def track_box(np, src, dst, box):
+    """Where did `box` (from gray image `src`) move to in `dst`? -> (box, score)."""
+    x1, y1, x2, y2 = box['x1'], box['y1'], box['x2'], box['y2']
+    bw, bh = x2 - x1, y2 - y1
+    if bw < 4 or bh < 4: return dict(box), 0.0
+    s = min(1.0, TEMPLATE_SIZE / max(bw, bh))
+    mx, my = bw * SEARCH_MARGIN + 8, bh * SEARCH_MARGIN + 8
+    sx1, sy1 = max(0, int(x1 - mx)), max(0, int(y1 - my))
+    sx2, sy2 = min(dst.width, int(x2 + mx)), min(dst.height, int(y2 + my))
+    if sx2 - sx1 < bw * 0.5 or sy2 - sy1 < bh * 0.5: return dict(box), 0.0
+
+    region = dst.crop((sx1, sy1, sx2, sy2))
+    search = np.asarray(region.resize((max(1, int(region.width * s)), max(1, int(region.height * s))), Image.Resampling.BILINEAR), dtype=np.float32)
+    patch = src.crop((int(x1), int(y1), int(x2), int(y2)))
+    best = (-1.0, 0, 0, 1.0)
+    for k in SCALES:
+        tw, th = max(2, int(bw * s * k)), max(2, int(bh * s * k))
+        templ = np.asarray(patch.resize((tw, th), Image.Resampling.BILINEAR), dtype=np.float32)
+        score, dy, dx = match_template(np, search, templ)
+        if score > best[0]: best = (score, dy, dx, k)
+    score, dy, dx, k = best
+    if score < MIN_SCORE: return dict(box, score=round(max(score, 0.0), 3)), score
+    nx1, ny1 = sx1 + dx / s, sy1 + dy / s
+
+    # Fine pass: a few coarse pixels either way at (up to) full resolution
+    f = min(1.0, FINE_SIZE / max(bw, bh))
+    rad = int(2 / s) + 2
+    fx1, fy1 = max(0, int(nx1) - rad), max(0, int(ny1) - rad)
+    fx2, fy2 = min(dst.width, int(nx1 + bw * k) + rad), min(dst.height, int(ny1 + bh * k) + rad)
+    region = dst.crop((fx1, fy1, fx2, fy2))
+    search = np.asarray(region.resize((max(1, int(region.width * f)), max(1, int(region.height * f))), Image.Resampling.BILINEAR), dtype=np.float32)
+    templ = np.asarray(patch.resize((max(2, int(bw * k * f)), max(2, int(bh * k * f))), Image.Resampling.BILINEAR), dtype=np.float32)
+    fine, fdy, fdx = match_template(np, search, templ)
+    if fine >= score: score, nx1, ny1 = fine, fx1 + fdx / f, fy1 + fdy / f
+
+    out = dict(box)
+    out.update(x1=nx1, y1=ny1, x2=min(dst.width, nx1 + bw * k), y2=min(dst.height, ny1 + bh * k), score=round(score, 3))
+    return out, score
+
+
+def track_boxes(src_path, dst_path, boxes):
+    """Carries `boxes` from one frame to the next, refining each by template matching.
+
+    Returned boxes carry the match score in 'score', like model proposals;
+    boxes that could not be matched keep their old position and a low score.
+    """
+    np = _np()
+    src, dst = load_gray(src_path), load_gray(dst_path)
+    out = []
+    for b in boxes:
+        nb, _ = track_box(np, src, dst, b)
+        out.append(nb)
+    return out
+
+
+def boxes_key(boxes):
+    return tuple((b['class_id'], round(b['x1'], 1), round(b['y1'], 1), round(b['x2'], 1), round(b['y2'], 1), b.get('visible', True)) for b in boxes)
+
+
+# --- BACKGROUND PROPAGATION ---
+class Propagator:
+    """Tracks boxes into the next frame on a background thread.
+
+    Jobs are keyed by destination image and by the exact source boxes, so
+    re-submitting unchanged boxes is free and edited boxes re-run the match.
+    """
+
+    def __init__(self):
+        _np() # Fail early if numpy is missing
+        self.pool = ThreadPoolExecutor(max_workers=1) # NumPy and Pillow release the GIL for the heavy parts
+        self.lock = threading.Lock()
+        self.jobs = {} # dst path -> (boxes key, future)
+
+    def submit(self, src_path, dst_path, boxes):
+        key = boxes_key(boxes)
+        with self.lock:
+            job = self.jobs.get(dst_path)
+            if job and job[0] == key: return
+            # Only the frame after the current one matters; drop anything older
+            for _, fut in self.jobs.values(): fut.cancel()
+            self.jobs.clear()
+            self.jobs[dst_path] = (key, self.pool.submit(track_boxes, src_path, dst_path, [dict(b) for b in boxes]))
+
+    def result(self, dst_path):
+        """-> boxes once done, None while pending or unknown; raises if tracking failed."""
+        with self.lock:
+            job = self.jobs.get(dst_path)
+        if not job or not job[1].done() or job[1].cancelled(): return None
+        with self.lock: self.jobs.pop(dst_path, None)
+        return job[1].result()
+
+    def pending(self, dst_path):
+        with self.lock:
+            job = self.jobs.get(dst_path)
+        return bool(job) and not job[1].done()
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
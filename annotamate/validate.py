@@ -0,0 +1,157 @@
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from .core import codecs
+from .core.archive import open_image
+from .core.classes import as_registry
+from .core.project import save_json
+
+# --- ISSUE CODES ---
+# code -> (severity, description)
+ISSUE_TYPES = {
+    "image_unreadable": ("error", "Image cannot be opened"),
+    "label_unreadable": ("error", "Label file cannot be parsed"),
+    "zero_area": ("error", "Box has zero area (dropped on save)"),
+    "out_of_range": ("warning", "Box extends outside the image"),
+    "unknown_class": ("error", "Class is not in the class list"),
+    "size_mismatch": ("warning", "Size stored in label differs from image"),
+    "orphan_label": ("warning", "Label file has no matching image"),
+}
+
+REPORT_VERSION = 1
+
+# Below this many images a process pool costs more than it saves
+PARALLEL_THRESHOLD = 500
+
+# Slack for float rounding in normalized / pixel coordinates
+EPS = 1e-3
+
+_classes = None # Set per worker by _init_worker
+
+
+def _init_worker(classes):
+    global _classes
+    _classes = classes
+
+
+def _issue(code, image, label, message, box=None):
+    return {"code": code, "severity": ISSUE_TYPES[code][0], "image": image, "label": label, "box": box, "message": message}
+
+
+def _check_box(issues, img_path, annot_path, i, x1, y1, x2, y2, w, h):
+    if x2 - x1 <= 0 or y2 - y1 <= 0:
+        issues.append(_issue("zero_area", img_path, annot_path, f"Box {i+1}: {x2-x1:.1f}x{y2-y1:.1f}px", i))
+    elif x1 < -EPS or y1 < -EPS or x2 > w + EPS or y2 > h + EPS:
+        issues.append(_issue("out_of_range", img_path, annot_path,
+                             f"Box {i+1}: ({x1:.1f}, {y1:.1f}, {x2:.1f}, {y2:.1f}) outside {w}x{h}", i))
+
+
+def check_image(job):
+    """Validates one image and its label file. Runs in worker processes."""
+    img_path, annot_path, deep = job
+    classes = _classes or []
+    issues = []
+
+    try:
+        with open_image(img_path) as im:
+            size = im.size
+            if deep: im.load() # Full decode catches truncated files
+            else: im.verify() # Cheap structural check
+    except Exception as e:
+        issues.append(_issue("image_unreadable", img_path, annot_path, str(e)))
+        return issues
+
+    if not annot_path: return issues
+    w, h = size
+    try:
+        ext = os.path.splitext(annot_path)[1].lower()
+        if ext == ".txt":
+            for i, (cid, ncx, ncy, nw, nh) in enumerate(codecs.parse_yolo(annot_path)):
+                if cid < 0 or cid >= len(classes):
+                    issues.append(_issue("unknown_class", img_path, annot_path, f"Box {i+1}: class id {cid} (have {len(classes)} classes)", i))
+                _check_box(issues, img_path, annot_path, i,
+                           (ncx - nw/2) * w, (ncy - nh/2) * h, (ncx + nw/2) * w, (ncy + nh/2) * h, w, h)
+        else:
+            if ext == ".xml":
+                stored, objects = codecs.parse_voc(annot_path)
+                rows = [(name, x1, y1, x2, y2) for name, x1, y1, x2, y2 in objects]
+            else:
+                stored, objects = codecs.parse_coco(annot_path)
+                rows = [(name, x, y, x + bw, y + bh) for name, x, y, bw, bh in objects]
+            if stored and tuple(stored) != (w, h):
+                issues.append(_issue("size_mismatch", img_path, annot_path, f"Label says {stored[0]}x{stored[1]}, image is {w}x{h}"))
+            for i, (name, x1, y1, x2, y2) in enumerate(rows):
+                if name not in classes: # Registry: aliases count as known
+                    issues.append(_issue("unknown_class", img_path, annot_path, f"Box {i+1}: class '{name}'", i))
+                _check_box(issues, img_path, annot_path, i, x1, y1, x2, y2, w, h)
+    except Exception as e:
+        issues.append(_issue("label_unreadable", img_path, annot_path, str(e)))
+    return issues
+
+
+def validate_dataset(image_list, image_dir, label_dir, fmt, classes, workers=None, deep=False, progress=None):
+    """Checks every image/label pair and returns a machine-readable report dict."""
+    t0 = time.time()
+    label_dir = label_dir or image_dir
+    ext = codecs.annotation_ext(fmt)
+
+    # One directory listing instead of an exists() per image
+    label_names = set()
+    try:
+        with os.scandir(label_dir) as it:
+            for de in it:
+                if de.name.endswith(ext) and de.name != "classes.txt": label_names.add(de.name)
+    except OSError:
+        pass
+
+    jobs = []
+    expected = set()
+    nested = 0
+    for img_path in image_list:
+        annot_path = codecs.annotation_path(img_path, fmt, label_dir)
+        expected.add(annot_path)
+        if os.path.dirname(annot_path) == label_dir: found = os.path.basename(annot_path) in label_names
+        else:
+            found = os.path.exists(annot_path) # Archive members in subfolders
+            nested += found
+        jobs.append((img_path, annot_path if found else None, deep))
+
+    issues = []
+    for name in sorted(label_names):
+        if os.path.join(label_dir, name) not in expected:
+            issues.append(_issue("orphan_label", None, os.path.join(label_dir, name), name))
+
+    if len(jobs) < PARALLEL_THRESHOLD:
+        _init_worker(as_registry(classes))
+        results = map(check_image, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(as_registry(classes),)) # Pickles without its index
+        results = pool.map(check_image, jobs, chunksize=256)
+
+    try:
+        for i, found in enumerate(results):
+            issues.extend(found)
+            if progress and i % 1000 == 0: progress(i, len(jobs))
+    finally:
+        if pool: pool.shutdown()
+    if progress: progress(len(jobs), len(jobs))
+
+    return {
+        "version": REPORT_VERSION,
+        "image_dir": image_dir,
+        "label_dir": label_dir,
+        "format": fmt,
+        "classes": list(classes),
+        "images_checked": len(jobs),
+        "labels_found": len(label_names) + nested,
+        "elapsed_sec": round(time.time() - t0, 3),
+        "counts": dict(Counter(i["code"] for i in issues)),
+        "issues": issues,
+    }
+
+
+def write_report(report, path):
+    save_json(path, report)
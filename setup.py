@@ -12,9 +12,13 @@ setup(
         "pillow",
         "tkfontawesome"
     ],
+    extras_require={
+        "models": ["numpy", "onnxruntime"], # Pre-annotation with an ONNX model
+        "track": ["numpy"], # Box propagation between video frames
+    },
     entry_points={
         "console_scripts": [
-            "annotamate=annotamate.main:main",
+            "annotamate=annotamate:main",
         ],
     },
 )
@@ -0,0 +1,120 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from PIL import Image
+
+from annotamate.core.remote import RemoteDataset
+from annotamate.server import AnnotationService, make_server
+
+
+class ServerCase(unittest.TestCase):
+    """A real server on localhost over the images from make_images()."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.service = AnnotationService(self.make_images())
+        self.server = make_server(self.service, port=0, quiet=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def call(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = Request(self.url + path, data=data, method=method, headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(req, timeout=10) as r: return r.status, json.loads(r.read() or b"null")
+        except HTTPError as e:
+            return e.code, json.loads(e.read() or b"null")
+
+
+class ServerRoundTripTest(ServerCase):
+    """The HTTP API against a folder of images."""
+
+    def make_images(self):
+        for name, size in (("a.jpg", (100, 80)), ("b.png", (64, 64))):
+            Image.new("RGB", size).save(os.path.join(self.dir, name))
+        return self.dir
+
+    def test_list_labels_save_conflict_stats(self):
+        status, listing = self.call("GET", "/images")
+        self.assertEqual(status, 200)
+        self.assertEqual(sorted(n for n, _, _ in listing["images"]), ["a.jpg", "b.png"])
+        self.assertFalse(any(labelled for _, labelled, _ in listing["images"]))
+
+        status, labels = self.call("GET", "/labels/a.jpg")
+        self.assertEqual((status, labels["size"], labels["stamp"], labels["boxes"]), (200, [100, 80], None, []))
+
+        box = {"class": "person", "x1": 10, "y1": 10, "x2": 50, "y2": 40}
+        status, saved = self.call("PUT", "/labels/a.jpg", {"size": [100, 80], "boxes": [box], "expect": None})
+        self.assertEqual(status, 200)
+        self.assertIsNotNone(saved["stamp"])
+
+        status, labels = self.call("GET", "/labels/a.jpg")
+        self.assertEqual(labels["stamp"], saved["stamp"])
+        self.assertEqual([(b["class"], round(b["x1"]), round(b["y2"])) for b in labels["boxes"]], [("person", 10, 40)])
+
+        # A client still holding the stamp from before the save is refused
+        status, err = self.call("PUT", "/labels/a.jpg", {"size": [100, 80], "boxes": [], "expect": None})
+        self.assertEqual(status, 409)
+        self.assertIn("error", err)
+
+        status, stats = self.call("GET", "/stats")
+        self.assertEqual(status, 200)
+        self.assertEqual((stats["images"], stats["labelled"], stats["boxes"]), (2, 1, 1))
+        self.assertEqual(stats["classes"], [["person", 1]])
+
+    def test_head_and_etag(self):
+        with urlopen(Request(self.url + "/images/b.png", method="HEAD"), timeout=10) as r:
+            etag = r.headers["ETag"]
+            self.assertEqual(int(r.headers["Content-Length"]), os.path.getsize(os.path.join(self.dir, "b.png")))
+            self.assertEqual(r.read(), b"")
+        with self.assertRaises(HTTPError) as cm:
+            urlopen(Request(self.url + "/images/b.png", headers={"If-None-Match": etag}), timeout=10)
+        self.assertEqual(cm.exception.code, 304)
+
+    def test_label_stamp_head(self):
+        remote = RemoteDataset(self.url[:-len("/api")])
+        url = next(u for u in remote.image_list if remote.name(u) == "a.jpg")
+        self.assertIsNone(remote.label_stamp(url))
+        _, saved = self.call("PUT", "/labels/a.jpg", {"size": [100, 80], "boxes": [], "expect": None})
+        self.assertEqual(remote.label_stamp(url), tuple(saved["stamp"]))
+
+
+class ArchiveServerTest(ServerCase):
+    """Same-named members in different folders of one archive."""
+
+    def make_images(self):
+        buf = io.BytesIO()
+        Image.new("RGB", (40, 30)).save(buf, "JPEG")
+        path = os.path.join(self.dir, "set.zip")
+        with zipfile.ZipFile(path, "w") as z:
+            for name in ("x/1.jpg", "y/1.jpg"): z.writestr(name, buf.getvalue())
+        return path
+
+    def test_members_get_their_own_labels(self):
+        status, listing = self.call("GET", "/images")
+        self.assertEqual(sorted(n for n, _, _ in listing["images"]), ["x/1.jpg", "y/1.jpg"])
+
+        box = {"class": "person", "x1": 5, "y1": 5, "x2": 20, "y2": 20}
+        status, _ = self.call("PUT", "/labels/" + quote("x/1.jpg", safe=""), {"size": [40, 30], "boxes": [box], "expect": None})
+        self.assertEqual(status, 200)
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "set_labels", "x", "1.txt")))
+        _, labels = self.call("GET", "/labels/" + quote("y/1.jpg", safe=""))
+        self.assertEqual((labels["stamp"], labels["boxes"]), (None, []))
+
+if __name__ == "__main__":
+    unittest.main()